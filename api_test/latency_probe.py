@@ -0,0 +1,142 @@
+"""
+End-to-end latency probe: ingest API -> OLTP commit -> Debezium -> stream -> risk flag.
+
+Every round creates a fresh probe customer and account, then posts
+--count transactions tagged with X-Probe-Id (enough to trip the velocity count
+rule) and waits for the resulting risk_flags row. The triggering transaction's
+ingest receipt (metadata.received_at), OLTP commit (risk_flags.event_committed_at)
+and flag write time (risk_flags.created_at) give the per-stage latency:
+
+  http        client send -> API response
+  ingest      API receipt -> OLTP commit
+  stream      OLTP commit -> flag written (Debezium, Kafka, stream processor)
+  visible     client send -> flag seen by this probe (polling)
+
+The stream worker's own histograms (all traffic, not only probes) are printed
+from --metrics-url at the end.
+
+Usage:
+  python api_test/latency_probe.py --rounds 5 --api http://localhost:8001 \
+      --metrics-url http://localhost:6066/metrics/summary
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+import psycopg
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+def oltp_dsn() -> str:
+    return (
+        f"host={os.getenv('OLTP_HOST', 'localhost')} port={os.getenv('OLTP_PORT', '5432')} "
+        f"dbname={os.getenv('OLTP_DB')} user={os.getenv('OLTP_USER')} password={os.getenv('OLTP_PASSWORD')}"
+    )
+
+def post(api: str, path: str, body: dict, headers: dict | None = None) -> dict:
+    req = urllib.request.Request(
+        api + path, data=json.dumps(body).encode(), method="POST",
+        headers={"Content-Type": "application/json", **(headers or {})},
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read())
+
+def probe_round(api: str, conn, count: int, timeout: float) -> dict:
+    probe_id = str(uuid.uuid4())
+    customer = post(api, "/v1/customers", {"email": f"probe+{probe_id}@example.com", "country": "VN"})
+    account = post(api, "/v1/accounts", {"customer_id": customer["id"], "currency": "VND", "country": "VN"})
+
+    sent = {}
+    http = []
+    for i in range(count):
+        t0 = datetime.now(timezone.utc)
+        tx = post(api, "/v1/transactions", {
+            "account_id": account["id"], "type": "PAYMENT", "amount": "1000.00", "currency": "VND",
+            "merchant_name": "Latency Probe", "merchant_category": "probe", "country": "VN",
+        }, {"Idempotency-Key": str(uuid.uuid4()), "X-Probe-Id": probe_id})
+        http.append((datetime.now(timezone.utc) - t0).total_seconds())
+        sent[tx["id"]] = t0
+
+    deadline = time.monotonic() + timeout
+    flag = None
+    while flag is None and time.monotonic() < deadline:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT f.trigger_tx_id::text, f.event_committed_at, f.created_at,
+                       (t.metadata->>'received_at')::timestamptz
+                FROM risk_flags f
+                LEFT JOIN transactions t ON t.id = f.trigger_tx_id
+                WHERE f.account_id = %s
+                ORDER BY f.created_at
+                LIMIT 1
+                """,
+                (account["id"],),
+            )
+            flag = cur.fetchone()
+        if flag is None:
+            time.sleep(0.1)
+    seen = datetime.now(timezone.utc)
+    if flag is None:
+        return {"probe_id": probe_id, "error": f"no flag within {timeout}s"}
+
+    trigger, committed, flagged, received = flag
+    def secs(a, b):
+        return (a - b).total_seconds() if a and b else None
+    return {
+        "probe_id": probe_id,
+        "http": max(http),
+        "ingest": secs(committed, received),
+        "stream": secs(flagged, committed),
+        "visible": secs(seen, sent.get(trigger)),
+    }
+
+def fmt(v) -> str:
+    return f"{v:9.3f}" if isinstance(v, (int, float)) else f"{'-':>9}"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api", default="http://localhost:8001")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--count", type=int, default=int(os.getenv("VELOCITY_COUNT_THRESHOLD", "5")),
+                    help="transactions per round; must reach the velocity count threshold")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--metrics-url", default="http://localhost:6066/metrics/summary")
+    args = ap.parse_args()
+
+    stages = ("http", "ingest", "stream", "visible")
+    results = []
+    with psycopg.connect(oltp_dsn(), autocommit=True) as conn:
+        print(f"{'probe':<36} " + " ".join(f"{s:>9}" for s in stages))
+        for _ in range(args.rounds):
+            r = probe_round(args.api, conn, args.count, args.timeout)
+            results.append(r)
+            if "error" in r:
+                print(f"{r['probe_id']:<36} {r['error']}")
+            else:
+                print(f"{r['probe_id']:<36} " + " ".join(fmt(r[s]) for s in stages))
+
+    ok = [r for r in results if "error" not in r]
+    if ok:
+        values = {s: [r[s] for r in ok if r[s] is not None] for s in stages}
+        print(f"{'p50':<36} " + " ".join(fmt(statistics.median(values[s]) if values[s] else None) for s in stages))
+        print(f"{'max':<36} " + " ".join(fmt(max(values[s], default=None)) for s in stages))
+
+    if args.metrics_url:
+        try:
+            with urllib.request.urlopen(args.metrics_url, timeout=5) as resp:
+                summary = json.loads(resp.read())
+            print("\nstream histograms (seconds, bucket upper bounds):")
+            for stage, s in summary.items():
+                print(f"  {stage:<18} n={s['count']:<8} p50<={s['p50']} p95<={s['p95']} p99<={s['p99']}")
+        except OSError as e:
+            print(f"\nstream metrics unavailable: {e}")
+
+if __name__ == "__main__":
+    main()
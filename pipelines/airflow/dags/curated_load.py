@@ -1,9 +1,12 @@
 from __future__ import annotations
+import os
+from datetime import timedelta
 import pendulum
 from airflow import DAG
+from airflow.configuration import conf
+from airflow.decorators import task
 from airflow.operators.python import PythonOperator
 from airflow.providers.postgres.hooks.postgres import PostgresHook
-from airflow.providers.postgres.operators.postgres import PostgresOperator
 
 DAG_ID = "curated_load"
 
@@ -13,13 +16,21 @@ TABLE_STATES = {
     "dim_merchant": "cur.dim_merchant",
     "fact_transactions": "cur.fact_transactions",
 }
+# "set": one cur.merge_dim_* call per dimension (set-based SCD2)
+# "row": legacy cur.upsert_dim_* call per staging row
+SCD2_MODE = os.getenv("CURATED_SCD2_MODE", "set")
+
+# "single": one fact load transaction per run
+# "chunked": one mapped task per created_date, checkpointed in cur.fact_load_chunks
+FACT_LOAD_MODE = os.getenv("CURATED_FACT_LOAD_MODE", "single")
+FACT_LOAD_WORKERS = int(os.getenv("CURATED_FACT_LOAD_WORKERS", "4"))
 
 def ensure_funcs_and_partitions(**_):
     dwh = PostgresHook(postgres_conn_id="dwh_postgres")
     sql = open("/opt/airflow/sql/dwh_curated_functions.sql", "r", encoding="utf-8").read()
     dwh.run(sql)
-    # ensure current month partitions exist (safety)
-    dwh.run("SELECT cur.ensure_fact_partition(CURRENT_DATE);")
+    # ensure today's and the pre-made partitions exist (safety; fact_partition_maintenance owns this)
+    dwh.run("SELECT cur.premake_fact_partitions();")
 
 # ----- watermark helpers shared with staging -----
 def _get_last_ts(dwh, table: str):
@@ -39,24 +50,27 @@ def _set_last_ts(dwh, table: str, ts):
 def upsert_dim_customer(**_):
     dwh = PostgresHook(postgres_conn_id="dwh_postgres")
     last_ts = _get_last_ts(dwh, "cur.dim_customer")
-    # Use the latest of created/updated as the "as_of" time
-    sql = """
-    WITH s AS (
-      SELECT id, email, country, kyc_level, risk_band, GREATEST(created_at, updated_at) AS as_of
-      FROM stg.customers
-      WHERE GREATEST(created_at, updated_at) > %s
-      ORDER BY 5
-    )
-    SELECT cur.upsert_dim_customer(id, email, country, kyc_level, risk_band, as_of) FROM s;
-    SELECT COALESCE(MAX(GREATEST(created_at, updated_at)), %s) FROM stg.customers;
-    """
-    # run and capture the max ts
-    with dwh.get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(sql, (last_ts, last_ts))
-            # the second SELECT returns one row
-            for _ in range(0): pass  # consume first SELECT's result set (ignored)
-            conn.commit()
+    if SCD2_MODE == "set":
+        dwh.run("SELECT cur.merge_dim_customer(%s)", parameters=(last_ts,))
+    else:
+        # Use the latest of created/updated as the "as_of" time
+        sql = """
+        WITH s AS (
+          SELECT id, email, country, kyc_level, risk_band, GREATEST(created_at, updated_at) AS as_of
+          FROM stg.customers
+          WHERE GREATEST(created_at, updated_at) > %s
+          ORDER BY 5
+        )
+        SELECT cur.upsert_dim_customer(id, email, country, kyc_level, risk_band, as_of) FROM s;
+        SELECT COALESCE(MAX(GREATEST(created_at, updated_at)), %s) FROM stg.customers;
+        """
+        # run and capture the max ts
+        with dwh.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (last_ts, last_ts))
+                # the second SELECT returns one row
+                for _ in range(0): pass  # consume first SELECT's result set (ignored)
+                conn.commit()
     # Fetch max ts separately (simplify)
     max_ts = dwh.get_first("SELECT COALESCE(MAX(GREATEST(created_at, updated_at)), %s) FROM stg.customers", parameters=(last_ts,))[0]
     if max_ts:
@@ -65,16 +79,19 @@ def upsert_dim_customer(**_):
 def upsert_dim_account(**_):
     dwh = PostgresHook(postgres_conn_id="dwh_postgres")
     last_ts = _get_last_ts(dwh, "cur.dim_account")
-    sql = """
-    WITH s AS (
-      SELECT id, customer_id, currency, country, status, GREATEST(created_at, updated_at) AS as_of
-      FROM stg.accounts
-      WHERE GREATEST(created_at, updated_at) > %s
-      ORDER BY 6
-    )
-    SELECT cur.upsert_dim_account(id, customer_id, currency, country, status, as_of) FROM s;
-    """
-    dwh.run(sql, parameters=(last_ts,))
+    if SCD2_MODE == "set":
+        dwh.run("SELECT cur.merge_dim_account(%s)", parameters=(last_ts,))
+    else:
+        sql = """
+        WITH s AS (
+          SELECT id, customer_id, currency, country, status, GREATEST(created_at, updated_at) AS as_of
+          FROM stg.accounts
+          WHERE GREATEST(created_at, updated_at) > %s
+          ORDER BY 6
+        )
+        SELECT cur.upsert_dim_account(id, customer_id, currency, country, status, as_of) FROM s;
+        """
+        dwh.run(sql, parameters=(last_ts,))
     max_ts = dwh.get_first("SELECT COALESCE(MAX(GREATEST(created_at, updated_at)), %s) FROM stg.accounts", parameters=(last_ts,))[0]
     if max_ts:
         _set_last_ts(dwh, "cur.dim_account", max_ts)
@@ -82,111 +99,411 @@ def upsert_dim_account(**_):
 def upsert_dim_merchant(**_):
     dwh = PostgresHook(postgres_conn_id="dwh_postgres")
     last_ts = _get_last_ts(dwh, "cur.dim_merchant")
-    # derive distinct (name, category, country) from new transactions
-    sql = """
-    WITH src AS (
-      SELECT merchant_name, merchant_category, country, MIN(created_at) AS as_of
-      FROM stg.transactions
-      WHERE created_at > %s
-      GROUP BY merchant_name, merchant_category, country
-    )
-    SELECT cur.upsert_dim_merchant(merchant_name, merchant_category, country, as_of) FROM src;
-    """
-    dwh.run(sql, parameters=(last_ts,))
+    if SCD2_MODE == "set":
+        dwh.run("SELECT cur.merge_dim_merchant(%s)", parameters=(last_ts,))
+    else:
+        # derive distinct (name, category, country) from new transactions
+        sql = """
+        WITH src AS (
+          SELECT merchant_name, merchant_category, country, MIN(created_at) AS as_of
+          FROM stg.transactions
+          WHERE created_at > %s
+          GROUP BY merchant_name, merchant_category, country
+          ORDER BY as_of
+        )
+        SELECT cur.upsert_dim_merchant(merchant_name, merchant_category, country, as_of) FROM src;
+        """
+        dwh.run(sql, parameters=(last_ts,))
     max_ts = dwh.get_first("SELECT COALESCE(MAX(created_at), %s) FROM stg.transactions", parameters=(last_ts,))[0]
     if max_ts:
         _set_last_ts(dwh, "cur.dim_merchant", max_ts)
 
-# ----- load fact (incremental, idempotent) -----
-def load_fact_transactions(**_):
-    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
-    last_ts = _get_last_ts(dwh, "cur.fact_transactions")
+# ----- fact load SQL -----
+# Rows inserted by the current fact load (dropped at commit)
+CREATE_NEW_FACTS_SQL = """
+CREATE TEMP TABLE tmp_new_facts (
+  transaction_bk UUID,
+  merchant_sk    BIGINT,
+  amount         NUMERIC(20,6),
+  currency       CHAR(3),
+  country        CHAR(2),
+  created_at     TIMESTAMPTZ,
+  created_date   DATE
+) ON COMMIT DROP;
+"""
 
-    # Ensure needed monthly partitions exist for the incoming dates
-    dwh.run("""
-    DO $$
-    DECLARE d date;
-    BEGIN
-      FOR d IN
-        SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date
-        FROM stg.transactions
-        WHERE created_at > %s
-      LOOP
-        PERFORM cur.ensure_fact_partition(d);
-      END LOOP;
-    END$$;
-    """, parameters=(last_ts,))
-
-    # Insert facts with SCD2-as-of joins, ON CONFLICT to be idempotent
-    dwh.run("""
+# SK resolution stage: the batch (new staging rows plus the pending facts being
+# retried) and, per dimension, only the versions of keys it references, as
+# [valid_from, valid_to) ranges with a GiST (bk, range) index. Each fact then
+# needs one index probe per dimension instead of five correlated ORDER BY ...
+# LIMIT 1 subqueries. Ranges closed before they opened (late merchant rows) can
+# never match and are left out.
+# `until` / `day` narrow the batch to one created_date chunk (chunked mode);
+# both are NULL for the single-batch load.
+STAGE_FACT_BATCH_SQL = """
+CREATE TEMP TABLE tmp_fact_batch ON COMMIT DROP AS
+SELECT t.id, t.account_id, lower(btrim(t.merchant_name)) AS merchant_name_norm,
+       t.type, t.status, t.amount, t.currency, t.country, t.created_at, t.settled_at
+FROM stg.transactions t
+WHERE t.created_at > %(since)s
+  AND (%(until)s::timestamptz IS NULL OR t.created_at <= %(until)s::timestamptz)
+  AND (%(day)s::date IS NULL OR (t.created_at >= %(day)s::date::timestamp AT TIME ZONE 'UTC'
+                                 AND t.created_at < (%(day)s::date + 1)::timestamp AT TIME ZONE 'UTC'))
+UNION ALL
+SELECT t.id, t.account_id, lower(btrim(t.merchant_name)) AS merchant_name_norm,
+       t.type, t.status, t.amount, t.currency, t.country, t.created_at, t.settled_at
+FROM cur.pending_facts p
+JOIN stg.transactions t ON t.id = p.transaction_bk
+WHERE t.created_at <= %(since)s
+  AND (%(day)s::date IS NULL OR (p.created_at AT TIME ZONE 'UTC')::date = %(day)s::date);
+
+CREATE TEMP TABLE tmp_account_ranges ON COMMIT DROP AS
+SELECT a.account_bk, a.customer_bk, a.account_sk, a.valid_from, tstzrange(a.valid_from, a.valid_to) AS valid
+FROM cur.dim_account a
+WHERE a.account_bk IN (SELECT DISTINCT account_id FROM tmp_fact_batch)
+  AND (a.valid_to IS NULL OR a.valid_to > a.valid_from);
+CREATE INDEX ON tmp_account_ranges USING gist (account_bk, valid);
+
+CREATE TEMP TABLE tmp_customer_ranges ON COMMIT DROP AS
+SELECT c.customer_bk, c.customer_sk, c.valid_from, tstzrange(c.valid_from, c.valid_to) AS valid
+FROM cur.dim_customer c
+WHERE c.customer_bk IN (SELECT DISTINCT customer_bk FROM tmp_account_ranges)
+  AND (c.valid_to IS NULL OR c.valid_to > c.valid_from);
+CREATE INDEX ON tmp_customer_ranges USING gist (customer_bk, valid);
+
+CREATE TEMP TABLE tmp_merchant_ranges ON COMMIT DROP AS
+SELECT m.merchant_name_norm, m.merchant_sk, m.valid_from, tstzrange(m.valid_from, m.valid_to) AS valid
+FROM cur.dim_merchant m
+WHERE m.merchant_name_norm IN (SELECT DISTINCT merchant_name_norm FROM tmp_fact_batch)
+  AND (m.valid_to IS NULL OR m.valid_to > m.valid_from);
+CREATE INDEX ON tmp_merchant_ranges USING gist (merchant_name_norm, valid);
+
+-- temp tables are never auto-analyzed
+ANALYZE tmp_fact_batch;
+ANALYZE tmp_account_ranges;
+ANALYZE tmp_customer_ranges;
+ANALYZE tmp_merchant_ranges;
+"""
+
+# Resolve every batch row's keys in one join pass per dimension. DISTINCT ON
+# keeps the previous tie rule (latest valid_from wins when versions overlap).
+RESOLVE_FACT_KEYS_SQL = """
+CREATE TEMP TABLE tmp_fact_keys ON COMMIT DROP AS
+WITH acct AS (
+  SELECT DISTINCT ON (b.id) b.id, a.account_sk, a.customer_bk
+  FROM tmp_fact_batch b
+  JOIN tmp_account_ranges a ON a.account_bk = b.account_id AND a.valid @> b.created_at
+  ORDER BY b.id, a.valid_from DESC
+),
+cust AS (
+  SELECT DISTINCT ON (b.id) b.id, c.customer_sk
+  FROM tmp_fact_batch b
+  JOIN acct ON acct.id = b.id
+  JOIN tmp_customer_ranges c ON c.customer_bk = acct.customer_bk AND c.valid @> b.created_at
+  ORDER BY b.id, c.valid_from DESC
+),
+merch AS (
+  SELECT DISTINCT ON (b.id) b.id, m.merchant_sk
+  FROM tmp_fact_batch b
+  JOIN tmp_merchant_ranges m ON m.merchant_name_norm = b.merchant_name_norm AND m.valid @> b.created_at
+  ORDER BY b.id, m.valid_from DESC
+)
+SELECT b.id, acct.account_sk, cust.customer_sk, merch.merchant_sk
+FROM tmp_fact_batch b
+LEFT JOIN acct ON acct.id = b.id
+LEFT JOIN cust ON cust.id = b.id
+LEFT JOIN merch ON merch.id = b.id;
+"""
+
+# Insert the fully resolved rows; the rest go to cur.pending_facts below.
+INSERT_FACTS_SQL = """
+    WITH ins AS (
     INSERT INTO cur.fact_transactions
       (transaction_bk, customer_sk, account_sk, merchant_sk,
        type, status, amount, currency, country, created_at, settled_at, created_date)
     SELECT
-      t.id AS transaction_bk,
-      -- account_sk as of created_at
-      (
-        SELECT account_sk FROM cur.dim_account a
-        WHERE a.account_bk = t.account_id
-          AND a.valid_from <= t.created_at
-          AND (a.valid_to IS NULL OR t.created_at < a.valid_to)
-        ORDER BY a.valid_from DESC
-        LIMIT 1
-      ) AS account_sk,
-      -- customer_sk as of created_at (via account's customer_bk)
-      (
-        SELECT c.customer_sk FROM cur.dim_customer c
-        WHERE c.customer_bk = (
-          SELECT a.customer_bk FROM cur.dim_account a
-          WHERE a.account_bk = t.account_id
-            AND a.valid_from <= t.created_at
-            AND (a.valid_to IS NULL OR t.created_at < a.valid_to)
-          ORDER BY a.valid_from DESC
-          LIMIT 1
-        )
-          AND c.valid_from <= t.created_at
-          AND (c.valid_to IS NULL OR t.created_at < c.valid_to)
-        ORDER BY c.valid_from DESC
-        LIMIT 1
-      ) AS customer_sk,
-      -- merchant_sk as of created_at
-      (
-        SELECT m.merchant_sk FROM cur.dim_merchant m
-        WHERE m.merchant_name_norm = lower(btrim(t.merchant_name))
-          AND m.valid_from <= t.created_at
-          AND (m.valid_to IS NULL OR t.created_at < m.valid_to)
-        ORDER BY m.valid_from DESC
-        LIMIT 1
-      ) AS merchant_sk,
-      t.type, t.status, t.amount, t.currency, t.country, t.created_at, t.settled_at,
-      (t.created_at AT TIME ZONE 'UTC')::date AS created_date
-    FROM stg.transactions t
-    WHERE t.created_at > %s
-    -- only rows that resolved all keys:
-    AND EXISTS (
-      SELECT 1 FROM cur.dim_account a
-      WHERE a.account_bk = t.account_id
-        AND a.valid_from <= t.created_at
-        AND (a.valid_to IS NULL OR t.created_at < a.valid_to)
+      b.id, k.customer_sk, k.account_sk, k.merchant_sk,
+      b.type, b.status, b.amount, b.currency, b.country, b.created_at, b.settled_at,
+      (b.created_at AT TIME ZONE 'UTC')::date AS created_date
+    FROM tmp_fact_batch b
+    JOIN tmp_fact_keys k ON k.id = b.id
+    WHERE k.account_sk IS NOT NULL AND k.customer_sk IS NOT NULL AND k.merchant_sk IS NOT NULL
+    -- physical order follows time, which keeps the partitions' BRIN ranges tight
+    ORDER BY b.created_at
+    ON CONFLICT (transaction_bk, created_date) DO NOTHING
+    RETURNING transaction_bk, merchant_sk, amount, currency, country, created_at, created_date
     )
-    AND EXISTS (
-      SELECT 1 FROM cur.dim_merchant m
-      WHERE m.merchant_name_norm = lower(btrim(t.merchant_name))
-        AND m.valid_from <= t.created_at
-        AND (m.valid_to IS NULL OR t.created_at < m.valid_to)
+    INSERT INTO tmp_new_facts SELECT * FROM ins;
+"""
+
+# Resolved rows leave the pending queue; unresolved ones are (re)queued with
+# what is still missing and one more attempt.
+PENDING_FACTS_SQL = """
+DELETE FROM cur.pending_facts p
+USING tmp_fact_keys k
+WHERE p.transaction_bk = k.id
+  AND k.account_sk IS NOT NULL AND k.customer_sk IS NOT NULL AND k.merchant_sk IS NOT NULL;
+
+INSERT INTO cur.pending_facts AS p (transaction_bk, created_at, missing)
+SELECT k.id, b.created_at,
+       array_remove(ARRAY[
+         CASE WHEN k.account_sk IS NULL THEN 'account' END,
+         CASE WHEN k.account_sk IS NOT NULL AND k.customer_sk IS NULL THEN 'customer' END,
+         CASE WHEN k.merchant_sk IS NULL THEN 'merchant' END
+       ], NULL)
+FROM tmp_fact_keys k
+JOIN tmp_fact_batch b ON b.id = k.id
+WHERE k.account_sk IS NULL OR k.customer_sk IS NULL OR k.merchant_sk IS NULL
+ORDER BY k.id
+ON CONFLICT (transaction_bk) DO UPDATE
+  SET missing = EXCLUDED.missing,
+      attempts = p.attempts + 1,
+      last_attempt_at = NOW();
+"""
+
+# Add this run's delta to the hourly / daily / monthly GMV rollups.
+# ORDER BY keeps lock order stable when loads overlap; the advisory lock
+# serialises it with a concurrent cur.rebuild_gmv_rollups() repair.
+GMV_ROLLUPS_SQL = """
+SELECT pg_advisory_xact_lock(hashtext('cur.gmv_rollups'));
+
+INSERT INTO cur.gmv_hourly AS g (bucket_start, currency, tx_count, total_amount)
+SELECT date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+FROM tmp_new_facts GROUP BY 1, 2 ORDER BY 1, 2
+ON CONFLICT (bucket_start, currency) DO UPDATE
+  SET tx_count = g.tx_count + EXCLUDED.tx_count,
+      total_amount = g.total_amount + EXCLUDED.total_amount,
+      updated_at = NOW();
+
+INSERT INTO cur.gmv_daily AS g (bucket_start, currency, tx_count, total_amount)
+SELECT created_date::timestamp AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+FROM tmp_new_facts GROUP BY 1, 2 ORDER BY 1, 2
+ON CONFLICT (bucket_start, currency) DO UPDATE
+  SET tx_count = g.tx_count + EXCLUDED.tx_count,
+      total_amount = g.total_amount + EXCLUDED.total_amount,
+      updated_at = NOW();
+
+INSERT INTO cur.gmv_monthly AS g (bucket_start, currency, tx_count, total_amount)
+SELECT date_trunc('month', created_date::timestamp) AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+FROM tmp_new_facts GROUP BY 1, 2 ORDER BY 1, 2
+ON CONFLICT (bucket_start, currency) DO UPDATE
+  SET tx_count = g.tx_count + EXCLUDED.tx_count,
+      total_amount = g.total_amount + EXCLUDED.total_amount,
+      updated_at = NOW();
+"""
+
+# Add this run's delta to the merchant rollups. The advisory lock serialises it
+# with a concurrent cur.rebuild_merchant_rollups() repair.
+MERCHANT_ROLLUPS_SQL = """
+SELECT pg_advisory_xact_lock(hashtext('cur.merchant_gmv'));
+
+CREATE TEMP TABLE tmp_merchant_delta ON COMMIT DROP AS
+SELECT f.created_date AS day_utc, m.merchant_name_norm, f.country, f.currency,
+       COUNT(*) AS tx_count, SUM(f.amount) AS total_amount
+FROM tmp_new_facts f
+JOIN cur.dim_merchant m ON m.merchant_sk = f.merchant_sk
+GROUP BY 1, 2, 3, 4;
+
+INSERT INTO cur.merchant_gmv_daily AS g (day_utc, merchant_name_norm, country, currency, tx_count, total_amount)
+SELECT day_utc, merchant_name_norm, country, currency, tx_count, total_amount
+FROM tmp_merchant_delta ORDER BY 1, 2, 3, 4
+ON CONFLICT (day_utc, merchant_name_norm, country, currency) DO UPDATE
+  SET tx_count = g.tx_count + EXCLUDED.tx_count,
+      total_amount = g.total_amount + EXCLUDED.total_amount,
+      updated_at = NOW();
+
+INSERT INTO cur.merchant_gmv_monthly AS g (month_start, merchant_name_norm, country, currency, tx_count, total_amount)
+SELECT date_trunc('month', day_utc)::date, merchant_name_norm, country, currency, SUM(tx_count), SUM(total_amount)
+FROM tmp_merchant_delta GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+ON CONFLICT (month_start, merchant_name_norm, country, currency) DO UPDATE
+  SET tx_count = g.tx_count + EXCLUDED.tx_count,
+      total_amount = g.total_amount + EXCLUDED.total_amount,
+      updated_at = NOW();
+"""
+
+# ----- load fact (incremental, idempotent) -----
+def _load_fact_batch(cur, since, until=None, day=None) -> None:
+    """
+    Stage, resolve and insert one batch and apply its delta to the summaries.
+    Newly inserted rows are captured in tmp_new_facts so the GMV and merchant
+    rollups are maintained from exactly this batch, in the caller's
+    transaction.
+    """
+    params = {"since": since, "until": until, "day": day}
+    cur.execute(CREATE_NEW_FACTS_SQL)
+    cur.execute(STAGE_FACT_BATCH_SQL, params)
+    cur.execute(RESOLVE_FACT_KEYS_SQL)
+    cur.execute(INSERT_FACTS_SQL)
+    cur.execute(PENDING_FACTS_SQL)
+    cur.execute(GMV_ROLLUPS_SQL)
+    cur.execute(MERCHANT_ROLLUPS_SQL)
+
+def _pending_metrics(dwh) -> str:
+    pending, oldest, max_attempts = dwh.get_first(
+        "SELECT pending, oldest_created_at, max_attempts FROM cur.v_pending_facts_metrics"
     )
-    ON CONFLICT (transaction_bk, created_date) DO NOTHING;
-    """, parameters=(last_ts,))
+    return f"pending_facts={pending}, oldest={oldest}, max_attempts={max_attempts}"
 
-    max_ts = dwh.get_first("SELECT COALESCE(MAX(created_at), %s) FROM stg.transactions", parameters=(last_ts,))[0]
-    if max_ts:
-        _set_last_ts(dwh, "cur.fact_transactions", max_ts)
+def load_fact_transactions(**_):
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    last_ts = _get_last_ts(dwh, "cur.fact_transactions")
+    # fix the upper bound before staging, as the chunked path does: rows staged
+    # while this load runs are left above the watermark for the next run
+    until = dwh.get_first(
+        "SELECT MAX(created_at) FROM stg.transactions WHERE created_at > %s", parameters=(last_ts,)
+    )[0]
+
+    # Ensure partitions cover the incoming dates (usually pre-made already): one
+    # MIN/MAX over the new rows, one check per partition in that span
+    if until is not None:
+        dwh.run("""
+        SELECT cur.ensure_fact_partitions(MIN((created_at AT TIME ZONE 'UTC')::date), MAX((created_at AT TIME ZONE 'UTC')::date))
+        FROM stg.transactions
+        WHERE created_at > %s AND created_at <= %s;
+        """, parameters=(last_ts, until))
+
+    # Insert facts with SCD2-as-of joins, ON CONFLICT to be idempotent.
+    with dwh.get_conn() as conn:
+        with conn.cursor() as cur:
+            _load_fact_batch(cur, last_ts, until or last_ts)
+        conn.commit()
+
+    # unresolved rows are queued above, so the watermark can move past them
+    if until is not None:
+        _set_last_ts(dwh, "cur.fact_transactions", until)
+    return _pending_metrics(dwh)
+
+# ----- chunked fact load (one mapped task per created_date) -----
+# The staging rows between the watermark and MAX(created_at) at planning time
+# are split by UTC created_date, so each chunk lands in a single partition.
+# Chunks run in parallel (FACT_LOAD_WORKERS at a time); each one commits its
+# facts, pending-queue changes, summary deltas and its DONE checkpoint together
+# in cur.fact_load_chunks. A failed chunk rolls back alone: a retry (or clearing
+# the run, which reuses the same load_id) resumes with the chunks not DONE, and
+# the watermark only advances once all of them are.
+
+def plan_fact_chunks(run_id: str) -> list[dict]:
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    with dwh.get_conn() as conn:
+        with conn.cursor() as cur:
+            # a cleared run keeps the bounds it was planned with
+            cur.execute(
+                "SELECT MIN(since), MIN(until) FROM cur.fact_load_chunks WHERE load_id = %s", (run_id,)
+            )
+            since, until = cur.fetchone()
+            if since is None:
+                since = _get_last_ts(dwh, "cur.fact_transactions")
+                cur.execute("SELECT MAX(created_at) FROM stg.transactions WHERE created_at > %s", (since,))
+                until = cur.fetchone()[0] or since
+                cur.execute(
+                    """
+                    INSERT INTO cur.fact_load_chunks (load_id, chunk_date, since, until)
+                    SELECT %(load_id)s, d, %(since)s, %(until)s
+                    FROM (
+                      SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date AS d
+                      FROM stg.transactions
+                      WHERE created_at > %(since)s AND created_at <= %(until)s
+                      UNION
+                      SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date
+                      FROM cur.pending_facts
+                      WHERE created_at <= %(since)s
+                    ) days
+                    ON CONFLICT DO NOTHING
+                    """,
+                    {"load_id": run_id, "since": since, "until": until}
+                )
+            cur.execute(
+                """
+                SELECT chunk_date FROM cur.fact_load_chunks
+                WHERE load_id = %s AND status <> 'DONE'
+                ORDER BY chunk_date
+                """,
+                (run_id,)
+            )
+            todo = [r[0] for r in cur.fetchall()]
+            if todo:
+                # partition DDL once, up front, instead of from parallel chunks
+                cur.execute("SELECT cur.ensure_fact_partitions(%s, %s)", (todo[0], todo[-1]))
+        conn.commit()
+    return [{"load_id": run_id, "chunk_date": d.isoformat()} for d in todo]
+
+def load_fact_chunk(chunk: dict) -> str:
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    key = (chunk["load_id"], chunk["chunk_date"])
+    conn = dwh.get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE cur.fact_load_chunks
+                SET status = 'RUNNING', attempts = attempts + 1, updated_at = NOW()
+                WHERE load_id = %s AND chunk_date = %s AND status <> 'DONE'
+                RETURNING since, until
+                """,
+                key
+            )
+            row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            return f"{chunk['chunk_date']}: already done"
+
+        since, until = row
+        with conn.cursor() as cur:
+            _load_fact_batch(cur, since, until, chunk["chunk_date"])
+            # checkpoint commits atomically with the chunk's facts and summaries
+            cur.execute(
+                """
+                UPDATE cur.fact_load_chunks
+                SET status = 'DONE', updated_at = NOW(),
+                    rows_loaded = (SELECT COUNT(*) FROM tmp_new_facts),
+                    rows_pending = (SELECT COUNT(*) FROM tmp_fact_keys
+                                    WHERE account_sk IS NULL OR customer_sk IS NULL OR merchant_sk IS NULL)
+                WHERE load_id = %s AND chunk_date = %s
+                RETURNING rows_loaded, rows_pending
+                """,
+                key
+            )
+            loaded, pending = cur.fetchone()
+        conn.commit()
+        return f"{chunk['chunk_date']}: rows={loaded}, pending={pending}"
+    except Exception:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE cur.fact_load_chunks SET status = 'FAILED', updated_at = NOW()
+                WHERE load_id = %s AND chunk_date = %s
+                """,
+                key
+            )
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+def finalize_fact_load(run_id: str) -> str:
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    until, not_done, loaded = dwh.get_first(
+        """
+        SELECT MIN(until), COUNT(*) FILTER (WHERE status <> 'DONE'), COALESCE(SUM(rows_loaded), 0)
+        FROM cur.fact_load_chunks WHERE load_id = %s
+        """,
+        parameters=(run_id,)
+    )
+    if not_done:
+        raise ValueError(f"{not_done} fact chunks of {run_id} are not DONE; watermark unchanged")
+    if until is not None:
+        _set_last_ts(dwh, "cur.fact_transactions", until)
+    return f"rows={loaded}, " + _pending_metrics(dwh)
 
 with DAG(
     dag_id=DAG_ID,
     schedule="@hourly",
     start_date=pendulum.now("UTC").subtract(days=1),
     catchup=False,
+    # a long chunked catch-up must not overlap the next run, which would plan
+    # the same chunks again from the unchanged watermark
+    max_active_runs=1,
     default_args={"owner": "data", "retries": 0},
     tags=["curated","dwh","scd2"],
 ) as dag:
@@ -194,13 +511,27 @@ with DAG(
     d1 = PythonOperator(task_id="upsert_dim_customer", python_callable=upsert_dim_customer)
     d2 = PythonOperator(task_id="upsert_dim_account",  python_callable=upsert_dim_account)
     d3 = PythonOperator(task_id="upsert_dim_merchant", python_callable=upsert_dim_merchant)
-    f1 = PythonOperator(task_id="load_fact_transactions", python_callable=load_fact_transactions)
-    refresh_mvs = PostgresOperator(
-    task_id="refresh_materialized_views",
-    postgres_conn_id="dwh_postgres",
-    sql="""
-      REFRESH MATERIALIZED VIEW cur.mv_gmv_daily_currency;
-      REFRESH MATERIALIZED VIEW cur.mv_top_merchants_7d;
-    """,
-    )
-    t0 >> [d1, d2, d3] >> f1 >> refresh_mvs
+    if FACT_LOAD_MODE == "chunked":
+        @task
+        def plan_fact_load(**context) -> list[dict]:
+            chunks = plan_fact_chunks(context["run_id"])
+            max_map = conf.getint("core", "max_map_length")
+            if len(chunks) > max_map:
+                raise ValueError(f"{len(chunks)} chunks exceed core.max_map_length={max_map}")
+            return chunks
+
+        @task(retries=2, retry_delay=timedelta(seconds=30), max_active_tis_per_dagrun=FACT_LOAD_WORKERS)
+        def load_fact_chunk_task(chunk: dict) -> str:
+            return load_fact_chunk(chunk)
+
+        @task
+        def finalize_fact_load_task(**context) -> str:
+            return finalize_fact_load(context["run_id"])
+
+        chunks = plan_fact_load()
+        fact_start, fact_end = chunks, finalize_fact_load_task()
+        chunks >> load_fact_chunk_task.expand(chunk=chunks) >> fact_end
+    else:
+        fact_start = fact_end = PythonOperator(task_id="load_fact_transactions", python_callable=load_fact_transactions)
+    # GMV and merchant rollups are maintained inside the fact load itself
+    t0 >> [d1, d2, d3] >> fact_start
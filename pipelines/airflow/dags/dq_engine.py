@@ -0,0 +1,122 @@
+"""
+Single-scan data-quality checks for staging tables.
+
+Column expectations of one table are compiled into a single aggregate query,
+one COUNT(*) FILTER (...) per expectation, so validating a table (or a
+loaded_at window of it) is one pass regardless of how many expectations it
+has. The summary mirrors GX's ExpectationSuiteValidationResult.to_json_dict()
+(success / statistics / results[].expectation_config / results[].result), so
+callers and logs treat both engines alike.
+
+Supported: expect_column_values_to_not_be_null, _to_be_unique,
+_to_match_regex, _to_be_in_set and _to_be_between (with GX's strict_min /
+strict_max), each with an optional `mostly`. As in GX, non-null expectations only count non-null
+values and use them as the denominator.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+@dataclass(frozen=True)
+class Expectation:
+    type: str
+    column: str
+    kwargs: dict = field(default_factory=dict)
+
+    def config(self) -> dict:
+        return {"type": self.type, "kwargs": {"column": self.column, **self.kwargs}}
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _condition(e: Expectation, params: list) -> str:
+    """SQL predicate that is true for an unexpected row."""
+    col = _ident(e.column)
+    if e.type == "expect_column_values_to_not_be_null":
+        return f"{col} IS NULL"
+    if e.type == "expect_column_values_to_match_regex":
+        params.append(e.kwargs["regex"])
+        return f"{col} IS NOT NULL AND {col}::text !~ %s"
+    if e.type == "expect_column_values_to_be_in_set":
+        params.append([str(v) for v in e.kwargs["value_set"]])
+        return f"{col} IS NOT NULL AND NOT ({col}::text = ANY(%s))"
+    if e.type == "expect_column_values_to_be_between":
+        parts = []
+        if e.kwargs.get("min_value") is not None:
+            params.append(e.kwargs["min_value"])
+            parts.append(f"{col} <= %s" if e.kwargs.get("strict_min") else f"{col} < %s")
+        if e.kwargs.get("max_value") is not None:
+            params.append(e.kwargs["max_value"])
+            parts.append(f"{col} >= %s" if e.kwargs.get("strict_max") else f"{col} > %s")
+        if not parts:
+            raise ValueError(f"{e.type} on {e.column} needs min_value or max_value")
+        return f"{col} IS NOT NULL AND ({' OR '.join(parts)})"
+    raise ValueError(f"unsupported expectation {e.type}")
+
+def compile_sql(table: str, expectations: list[Expectation], where: Optional[str] = None,
+                where_params: tuple = ()) -> tuple[str, list]:
+    """
+    One SELECT returning COUNT(*), then COUNT(column) per referenced column,
+    then one unexpected count per expectation, in that order.
+    Uniqueness is counted as COUNT(col) - COUNT(DISTINCT col): the rows beyond
+    the first of each duplicated value.
+    """
+    columns = list(dict.fromkeys(e.column for e in expectations))
+    select = ["COUNT(*)"] + [f"COUNT({_ident(c)})" for c in columns]
+    params: list = []
+    for e in expectations:
+        if e.type == "expect_column_values_to_be_unique":
+            col = _ident(e.column)
+            select.append(f"COUNT({col}) - COUNT(DISTINCT {col})")
+        else:
+            select.append(f"COUNT(*) FILTER (WHERE {_condition(e, params)})")
+    sql = "SELECT " + ",\n       ".join(select) + f"\nFROM {table}"
+    if where:
+        sql += f"\nWHERE {where}"
+        params.extend(where_params)
+    return sql, params
+
+def summarize(expectations: list[Expectation], row: tuple, meta: Optional[dict] = None) -> dict:
+    """GX-style result dict from the row returned by compile_sql's query."""
+    columns = list(dict.fromkeys(e.column for e in expectations))
+    element_count = row[0]
+    nonnull = dict(zip(columns, row[1:1 + len(columns)]))
+    results = []
+    for e, unexpected in zip(expectations, row[1 + len(columns):]):
+        if e.type == "expect_column_values_to_not_be_null":
+            denominator = element_count
+        else:
+            denominator = nonnull[e.column]
+        ratio = unexpected / denominator if denominator else 0.0
+        mostly = e.kwargs.get("mostly", 1.0)
+        results.append({
+            "success": (1.0 - ratio) >= mostly,
+            "expectation_config": e.config(),
+            "result": {
+                "element_count": element_count,
+                "missing_count": element_count - nonnull[e.column],
+                "unexpected_count": unexpected,
+                "unexpected_percent": round(ratio * 100, 4),
+            },
+        })
+    ok = sum(r["success"] for r in results)
+    return {
+        "success": ok == len(results),
+        "statistics": {
+            "evaluated_expectations": len(results),
+            "successful_expectations": ok,
+            "unsuccessful_expectations": len(results) - ok,
+            "success_percent": round(100.0 * ok / len(results), 2) if results else 100.0,
+        },
+        "results": results,
+        "meta": {"engine": "dq_engine", **(meta or {})},
+    }
+
+def validate(conn: Any, table: str, expectations: list[Expectation], where: Optional[str] = None,
+             where_params: tuple = ()) -> dict:
+    """Run all expectations of `table` in one scan on a DB-API connection."""
+    sql, params = compile_sql(table, expectations, where, where_params)
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    return summarize(expectations, row, {"table": table})
@@ -0,0 +1,207 @@
+from __future__ import annotations
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pendulum
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+# Cold tier for cur.fact_transactions.
+# Partitions detached by the retention policy (cur.apply_fact_retention with
+# archive_detached = TRUE) are exported to FACT_ARCHIVE_DIR as one Parquet file
+# each, verified against the table (row count and amount total), recorded in
+# manifest.json with per-file min/max statistics, and only then dropped. A
+# partition detached again later (late facts re-created it) gets a new file
+# next to the earlier one.
+# The Read API (services/read_api/archive.py) reads the same manifest to skip
+# files outside a query's range.
+
+DAG_ID = "fact_archive"
+ARCHIVE_DIR = os.getenv("FACT_ARCHIVE_DIR", "/opt/airflow/archive")
+MANIFEST = "manifest.json"
+FETCH_ROWS = int(os.getenv("FACT_ARCHIVE_FETCH_ROWS", "100000"))
+log = logging.getLogger(__name__)
+
+FACT_SCHEMA = pa.schema([
+    ("transaction_bk", pa.string()),
+    ("customer_sk", pa.int64()),
+    ("account_sk", pa.int64()),
+    ("merchant_sk", pa.int64()),
+    ("type", pa.string()),
+    ("status", pa.string()),
+    ("amount", pa.decimal128(20, 6)),
+    ("currency", pa.string()),
+    ("country", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("settled_at", pa.timestamp("us", tz="UTC")),
+    ("created_date", pa.date32()),
+])
+SELECT_COLUMNS = ", ".join(
+    f"{f.name}::text" if f.name in ("transaction_bk", "currency", "country") else f.name for f in FACT_SCHEMA
+)
+
+def read_manifest() -> dict:
+    path = os.path.join(ARCHIVE_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return {"version": 1, "files": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_manifest(manifest: dict) -> None:
+    """Atomic replace, so readers never see a half-written manifest."""
+    path = os.path.join(ARCHIVE_DIR, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def export_partition(dwh: PostgresHook, partition: str, path: str) -> None:
+    """Stream the table through a server-side cursor into Parquet, one row group per fetch."""
+    tmp = path + ".tmp"
+    with dwh.get_conn() as conn:
+        with conn.cursor(name=f"archive_{partition}") as cur, pq.ParquetWriter(tmp, FACT_SCHEMA, compression="zstd") as writer:
+            cur.itersize = FETCH_ROWS
+            cur.execute(f"SELECT {SELECT_COLUMNS} FROM cur.{partition} ORDER BY created_at")
+            while True:
+                rows = cur.fetchmany(FETCH_ROWS)
+                if not rows:
+                    break
+                cols = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(c, type=f.type) for c, f in zip(cols, FACT_SCHEMA)], schema=FACT_SCHEMA
+                ))
+        conn.commit()
+    os.replace(tmp, path)
+
+def _footer_range(meta: pq.FileMetaData, column: str):
+    """Min / max of a column from the row group statistics in the Parquet footer."""
+    idx = meta.schema.names.index(column)
+    lo = hi = None
+    for i in range(meta.num_row_groups):
+        st = meta.row_group(i).column(idx).statistics
+        if st is None or not st.has_min_max:
+            continue
+        lo = st.min if lo is None else min(lo, st.min)
+        hi = st.max if hi is None else max(hi, st.max)
+    return lo, hi
+
+def file_stats(path: str) -> dict:
+    """
+    File-level statistics used to skip files at query time. Row count and
+    min/max come from the footer; the currency set and the amount total (also
+    the export check) need the two columns themselves.
+    """
+    meta = pq.ParquetFile(path).metadata
+    def iso(v):
+        if v is None:
+            return None
+        if isinstance(v, datetime) and v.tzinfo is None:
+            v = v.replace(tzinfo=timezone.utc)
+        return v.isoformat()
+    min_at, max_at = _footer_range(meta, "created_at")
+    min_date, max_date = _footer_range(meta, "created_date")
+    t = pq.read_table(path, columns=["currency", "amount"])
+    return {
+        "rows": meta.num_rows,
+        "min_created_at": iso(min_at),
+        "max_created_at": iso(max_at),
+        "min_created_date": iso(min_date),
+        "max_created_date": iso(max_date),
+        "currencies": sorted(pc.unique(t["currency"]).to_pylist()),
+        "sum_amount": str(pc.sum(t["amount"]).as_py() or Decimal(0)),
+    }
+
+def _matches(stats: dict, rows: int, total: Decimal) -> bool:
+    return stats["rows"] == rows and Decimal(stats["sum_amount"]) == total
+
+def _new_path(partition: str) -> str:
+    """Relative path for a fresh export; never one an earlier export used."""
+    rel = f"fact_transactions/{partition}.parquet"
+    if os.path.exists(os.path.join(ARCHIVE_DIR, rel)):
+        rel = f"fact_transactions/{partition}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.parquet"
+    return rel
+
+def archive_partitions(**_):
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    os.makedirs(os.path.join(ARCHIVE_DIR, "fact_transactions"), exist_ok=True)
+    todo = dwh.get_records(
+        """
+        SELECT partition_name, range_start, range_end, archive_path
+        FROM cur.detached_fact_partitions
+        WHERE dropped_at IS NULL
+        ORDER BY range_start
+        """
+    )
+    manifest = read_manifest()
+    # keyed by path: a partition detached again after an earlier archive keeps
+    # that file and gets a second one
+    by_path = {f["path"]: f for f in manifest["files"]}
+    done = []
+    for partition, lo, hi, archived_path in todo:
+        rows, total = dwh.get_first(f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM cur.{partition}")
+
+        # reuse an existing file only if it holds exactly this table (a run that
+        # died after exporting); anything else is exported next to it
+        rel, stats = None, None
+        known = [f["path"] for f in manifest["files"] if f["partition"] == partition]
+        for candidate in dict.fromkeys([archived_path, *known, f"fact_transactions/{partition}.parquet"]):
+            path = os.path.join(ARCHIVE_DIR, candidate) if candidate else None
+            if path and os.path.exists(path):
+                candidate_stats = file_stats(path)
+                if _matches(candidate_stats, rows, total):
+                    rel, stats = candidate, candidate_stats
+                    break
+        if rel is None:
+            rel = _new_path(partition)
+            export_partition(dwh, partition, os.path.join(ARCHIVE_DIR, rel))
+            # verify against the table before anything is dropped
+            stats = file_stats(os.path.join(ARCHIVE_DIR, rel))
+            if not _matches(stats, rows, total):
+                raise ValueError(
+                    f"{partition}: archive mismatch rows {stats['rows']} vs {rows}, amount {stats['sum_amount']} vs {total}"
+                )
+
+        by_path[rel] = {
+            "partition": partition,
+            "path": rel,
+            "range_start": lo.isoformat(),
+            "range_end": hi.isoformat(),
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+            **stats,
+        }
+        manifest["files"] = sorted(by_path.values(), key=lambda f: (f["range_start"], f["archived_at"]))
+        write_manifest(manifest)
+
+        with dwh.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE cur.detached_fact_partitions
+                    SET archive_path = %s, archived_at = NOW(), archived_rows = %s, dropped_at = NOW()
+                    WHERE partition_name = %s
+                    """,
+                    (rel, rows, partition)
+                )
+                cur.execute(f"DROP TABLE IF EXISTS cur.{partition}")
+            conn.commit()
+        log.info("archived %s -> %s (%s rows)", partition, rel, rows)
+        done.append(partition)
+    return f"archived={len(done)}"
+
+with DAG(
+    dag_id=DAG_ID,
+    schedule="@daily",
+    start_date=pendulum.now("UTC").subtract(days=1),
+    catchup=False,
+    max_active_runs=1,
+    default_args={"owner": "data", "retries": 0},
+    tags=["curated", "dwh", "archive"],
+) as dag:
+    PythonOperator(task_id="archive_partitions", python_callable=archive_partitions)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+import pendulum
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+# Partition lifecycle for cur.fact_transactions, driven by cur.fact_partition_config:
+# pre-create the partitions ahead of today, apply the retention window
+# (detach, then drop unless archive_detached) and log the size report.
+
+DAG_ID = "fact_partition_maintenance"
+log = logging.getLogger(__name__)
+
+def premake_partitions(**_):
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    dwh.run("SELECT cur.premake_fact_partitions();")
+
+def apply_retention(**_):
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    with dwh.get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT part_name, action FROM cur.apply_fact_retention()")
+            rows = cur.fetchall()
+        conn.commit()
+    for name, action in rows:
+        log.info("%s %s", action, name)
+    return f"retention: {len(rows)} actions"
+
+def report_sizes(**_):
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    rows = dwh.get_records(
+        "SELECT partition_name, range_start, range_end, est_rows, total_bytes, total_pretty FROM cur.v_fact_partition_sizes"
+    )
+    for name, lo, hi, est_rows, _, pretty in rows:
+        log.info("%-32s [%s, %s) rows~%s size=%s", name, lo, hi, est_rows, pretty)
+    total = sum(r[4] for r in rows)
+    return f"partitions={len(rows)}, total_bytes={total}"
+
+with DAG(
+    dag_id=DAG_ID,
+    schedule="@daily",
+    start_date=pendulum.now("UTC").subtract(days=1),
+    catchup=False,
+    default_args={"owner": "data", "retries": 0},
+    tags=["curated", "dwh", "partitions"],
+) as dag:
+    premake = PythonOperator(task_id="premake_partitions", python_callable=premake_partitions)
+    retention = PythonOperator(task_id="apply_retention", python_callable=apply_retention)
+    report = PythonOperator(task_id="report_sizes", python_callable=report_sizes)
+    premake >> retention >> report
@@ -1,35 +1,113 @@
 import os
+from functools import lru_cache
 import pendulum
 from typing import Literal
 from airflow.providers.postgres.hooks.postgres import PostgresHook
 
-# Great Expectations (GX 0.18.x)
+# Great Expectations (GX 1.x API, pinned in requirements.txt)
 import great_expectations as gx
 from great_expectations.core.expectation_validation_result import ExpectationSuiteValidationResult
 
+from dq_engine import Expectation
+import dq_engine
+
 DWH_GE_URL = os.getenv("DWH_GE_URL")
+# "sql": all expectations of a table in one aggregate scan (dq_engine)
+# "gx": one GX validator per table, one query per expectation
+DQ_ENGINE = os.getenv("STG_DQ_ENGINE", "sql")
+
+# Incremental validation: every check validates only the staging rows whose
+# loaded_at falls in [last validated, upper) and keeps its own watermark in
+# stg.validation_watermarks. Merges set loaded_at = NOW(), so updated rows are
+# re-validated too. The upper bound stops at the start of the oldest open
+# transaction, whether or not it has written (and so has an xid) yet, so rows
+# still being loaded (their loaded_at is earlier than their commit) always land
+# in a later window. A failing window is not
+# advanced and is checked again on the next run.
+VALIDATION_WINDOW_SQL = """
+SELECT COALESCE((SELECT last_validated_at FROM stg.validation_watermarks WHERE check_name = %s),
+                TIMESTAMPTZ 'epoch'),
+       LEAST(NOW(), COALESCE((SELECT MIN(xact_start) FROM pg_stat_activity
+                              WHERE datname = current_database()
+                                AND backend_type = 'client backend'
+                                AND xact_start IS NOT NULL
+                                AND pid <> pg_backend_pid()), NOW()))
+"""
+
+# Expectation specs per table (shared by both engines) --------------------------
+
+def stg_expectations(table: str) -> list[Expectation]:
+    if table == "customers":
+        return [
+            Expectation("expect_column_values_to_not_be_null", "id"),
+            Expectation("expect_column_values_to_be_unique", "id"),
+            Expectation("expect_column_values_to_not_be_null", "email"),
+            Expectation("expect_column_values_to_match_regex", "country", {"regex": r"^[A-Z]{2}$"}),
+            Expectation("expect_column_values_to_be_between", "kyc_level", {"min_value": 0, "max_value": 3, "mostly": 1.0}),
+            Expectation("expect_column_values_to_be_in_set", "risk_band", {"value_set": ["LOW","MEDIUM","HIGH"]}),
+            Expectation("expect_column_values_to_not_be_null", "created_at"),
+            Expectation("expect_column_values_to_not_be_null", "updated_at"),
+        ]
+    if table == "accounts":
+        return [
+            Expectation("expect_column_values_to_not_be_null", "id"),
+            Expectation("expect_column_values_to_be_unique", "id"),
+            Expectation("expect_column_values_to_not_be_null", "customer_id"),
+            Expectation("expect_column_values_to_match_regex", "currency", {"regex": r"^[A-Z]{3}$"}),
+            Expectation("expect_column_values_to_match_regex", "country", {"regex": r"^[A-Z]{2}$"}),
+            Expectation("expect_column_values_to_be_in_set", "status", {"value_set": ["ACTIVE","SUSPENDED","CLOSED"]}),
+            Expectation("expect_column_values_to_not_be_null", "created_at"),
+            Expectation("expect_column_values_to_not_be_null", "updated_at"),
+        ]
+    if table == "transactions":
+        # created_at should not be in the future (allow tiny clock skew of 2 minutes)
+        now_plus = pendulum.now("UTC").add(minutes=2)
+        return [
+            Expectation("expect_column_values_to_not_be_null", "id"),
+            Expectation("expect_column_values_to_be_unique", "id"),
+            Expectation("expect_column_values_to_not_be_null", "account_id"),
+            Expectation("expect_column_values_to_be_in_set", "type", {"value_set": ["PAYMENT","TRANSFER_IN","TRANSFER_OUT","REFUND","FEE"]}),
+            Expectation("expect_column_values_to_be_in_set", "status", {"value_set": ["PENDING","SETTLED","DECLINED","REVERSED","CHARGEBACK"]}),
+            Expectation("expect_column_values_to_match_regex", "currency", {"regex": r"^[A-Z]{3}$"}),
+            Expectation("expect_column_values_to_match_regex", "country", {"regex": r"^[A-Z]{2}$"}),
+            Expectation("expect_column_values_to_be_between", "amount", {"min_value": 0, "strict_min": True}),
+            Expectation("expect_column_values_to_not_be_null", "created_at"),
+            Expectation("expect_column_values_to_be_between", "created_at", {"max_value": now_plus}),
+        ]
+    raise ValueError(f"no expectations for stg.{table}")
 
 # Reusable helpers -------------------------------------------------------------
 
-def _get_validator(schema: str, table: str):
-    """
-    Create a GX context and a validator bound to stg.<table>.
-    Ensures the ExpectationSuite exists, otherwise creates it.
-    """
+@lru_cache(maxsize=None)
+def _gx_context():
+    """GX context and the DWH datasource, built once per worker process."""
     ctx = gx.get_context(context_root_dir="/opt/airflow/dags/great_expectations")
-
-    # Add or get datasource
-    ds = ctx.data_sources.add_sql(
+    ds = ctx.data_sources.add_or_update_sql(
         name="dwh_pg",
         connection_string=DWH_GE_URL,
     )
+    return ctx, ds
 
-    # Register a table asset
-    asset = ds.add_table_asset(
-        name=f"{schema}_{table}",
-        table_name=table,
-        schema_name=schema,
-    )
+def _get_validator(schema: str, table: str, query: str | None = None):
+    """
+    Validator bound to stg.<table>, or to `query` (a window of it) when given,
+    on the cached context. Ensures the ExpectationSuite exists, otherwise
+    creates it.
+    """
+    ctx, ds = _gx_context()
+
+    # Register a table asset once; a window asset is replaced every call
+    if query is None:
+        name = f"{schema}_{table}"
+        if name in ds.get_asset_names():
+            asset = ds.get_asset(name)
+        else:
+            asset = ds.add_table_asset(name=name, table_name=table, schema_name=schema)
+    else:
+        name = f"{schema}_{table}_window"
+        if name in ds.get_asset_names():
+            ds.delete_asset(name)
+        asset = ds.add_query_asset(name=name, query=query)
 
     # Build a batch request
     batch_req = asset.build_batch_request()
@@ -48,74 +126,90 @@ def _get_validator(schema: str, table: str):
         expectation_suite_name=suite_name
     )
 
-# Expectation sets per table ---------------------------------------------------
+def _raise_if_failed(res: ExpectationSuiteValidationResult | dict, name: str) -> None:
+    summary = res if isinstance(res, dict) else res.to_json_dict()
+    if not summary["success"]:
+        failed = [
+            f"{r['expectation_config']['type']}({r['expectation_config']['kwargs'].get('column')})"
+            for r in summary["results"] if not r["success"]
+        ]
+        raise AssertionError(f"{name}: {len(failed)} expectation(s) failed: {failed}")
+
+def _window(dwh: PostgresHook, check: str, table: str) -> tuple:
+    """(lower, upper, rows) of the next loaded_at window of `table` for `check`."""
+    lower, upper = dwh.get_first(VALIDATION_WINDOW_SQL, parameters=(check,))
+    rows = dwh.get_first(
+        f"SELECT COUNT(*) FROM {table} WHERE loaded_at >= %s AND loaded_at < %s", parameters=(lower, upper)
+    )[0]
+    return lower, upper, rows
+
+def _window_query(table: str, lower, upper) -> str:
+    return (
+        f"SELECT * FROM {table} "
+        f"WHERE loaded_at >= '{lower.isoformat()}'::timestamptz AND loaded_at < '{upper.isoformat()}'::timestamptz"
+    )
+
+def _advance(dwh: PostgresHook, check: str, upper, rows: int) -> None:
+    dwh.run("""
+        INSERT INTO stg.validation_watermarks (check_name, last_validated_at, rows_validated, validated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (check_name) DO UPDATE
+        SET last_validated_at = EXCLUDED.last_validated_at,
+            rows_validated = EXCLUDED.rows_validated,
+            validated_at = EXCLUDED.validated_at
+    """, parameters=(check, upper, rows))
+
+# Validation per table ---------------------------------------------------------
+
+def _validate_window(dwh: PostgresHook, table: str, lower, upper) -> dict:
+    expectations = stg_expectations(table)
+    if DQ_ENGINE == "sql":
+        with dwh.get_conn() as conn:
+            res = dq_engine.validate(
+                conn, f"stg.{table}", expectations,
+                where="loaded_at >= %s AND loaded_at < %s", where_params=(lower, upper),
+            )
+            conn.commit()
+    else:
+        ctx, v = _get_validator("stg", table, _window_query(f"stg.{table}", lower, upper))
+        for e in expectations:
+            getattr(v, e.type)(e.column, **e.kwargs)
+        # Save suite updates
+        ctx.add_or_update_expectation_suite(v.expectation_suite)
+        res = v.validate().to_json_dict()
+    _raise_if_failed(res, f"stg.{table}")
+    return res["statistics"]
+
+def _validate_stg(table: str) -> str:
+    dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    lower, upper, rows = _window(dwh, f"stg.{table}", f"stg.{table}")
+    stats = _validate_window(dwh, table, lower, upper) if rows else {}
+    _advance(dwh, f"stg.{table}", upper, rows)
+    return f"stg.{table}: rows={rows} window=[{lower}, {upper}) {stats}"
 
 def validate_stg_customers():
-    ctx, v = _get_validator("stg", "customers")
-    # Basic columns
-    v.expect_column_values_to_not_be_null("id")
-    v.expect_column_values_to_be_unique("id")
-    v.expect_column_values_to_not_be_null("email")
-    v.expect_column_values_to_match_regex("country", r"^[A-Z]{2}$")
-    v.expect_column_values_to_be_between("kyc_level", min_value=0, max_value=3, mostly=1.0)
-    v.expect_column_values_to_be_in_set("risk_band", ["LOW","MEDIUM","HIGH"])
-    v.expect_column_values_to_not_be_null("created_at")
-    v.expect_column_values_to_not_be_null("updated_at")
-    # Save suite updates
-    ctx.add_or_update_expectation_suite(v.expectation_suite)
-    # Evaluate
-    res = v.validate()
-    _raise_if_failed(res, "stg.customers")
-    return True
+    return _validate_stg("customers")
 
 def validate_stg_accounts():
-    ctx, v = _get_validator("stg", "accounts")
-    v.expect_column_values_to_not_be_null("id")
-    v.expect_column_values_to_be_unique("id")
-    v.expect_column_values_to_not_be_null("customer_id")
-    v.expect_column_values_to_match_regex("currency", r"^[A-Z]{3}$")
-    v.expect_column_values_to_match_regex("country", r"^[A-Z]{2}$")
-    v.expect_column_values_to_be_in_set("status", ["ACTIVE","SUSPENDED","CLOSED"])
-    v.expect_column_values_to_not_be_null("created_at")
-    v.expect_column_values_to_not_be_null("updated_at")
-    # Save suite updates
-    ctx.add_or_update_expectation_suite(v.expectation_suite)
-    res = v.validate()
-    _raise_if_failed(res, "stg.accounts")
-    return True
+    return _validate_stg("accounts")
 
 def validate_stg_transactions():
-    ctx, v = _get_validator("stg", "transactions")
-    v.expect_column_values_to_not_be_null("id")
-    v.expect_column_values_to_be_unique("id")
-    v.expect_column_values_to_not_be_null("account_id")
-    v.expect_column_values_to_be_in_set("type", ["PAYMENT","TRANSFER_IN","TRANSFER_OUT","REFUND","FEE"])
-    v.expect_column_values_to_be_in_set("status", ["PENDING","SETTLED","DECLINED","REVERSED","CHARGEBACK"])
-    v.expect_column_values_to_match_regex("currency", r"^[A-Z]{3}$")
-    v.expect_column_values_to_match_regex("country", r"^[A-Z]{2}$")
-    v.expect_column_values_to_be_greater_than("amount", 0)
-    v.expect_column_values_to_not_be_null("created_at")
-    # created_at should not be in the future (allow tiny clock skew of 2 minutes)
-    # We'll approximate by requiring created_at <= now()+120s
-    now_plus = pendulum.now("UTC").add(minutes=2)
-    v.expect_column_values_to_be_between("created_at", max_value=now_plus)
-    # Save suite updates
-    ctx.add_or_update_expectation_suite(v.expectation_suite)
-    res = v.validate()
-    _raise_if_failed(res, "stg.transactions")
-    return True
+    return _validate_stg("transactions")
 
 def check_fk_transactions_accounts():
     """
     Simple FK check using SQL (faster & clearer than forcing GX to do it):
-    count rows in transactions whose account_id doesn't exist in stg.accounts → must be zero.
+    transactions loaded in this window whose account_id doesn't exist in
+    stg.accounts → must be zero. Probes stg.accounts by primary key per new row.
     """
     dwh = PostgresHook(postgres_conn_id="dwh_postgres")
+    lower, upper, rows = _window(dwh, "fk.transactions_accounts", "stg.transactions")
     cnt = dwh.get_first("""
         SELECT COUNT(*) FROM stg.transactions t
-        LEFT JOIN stg.accounts a ON a.id = t.account_id
-        WHERE a.id IS NULL
-    """)[0]
+        WHERE t.loaded_at >= %s AND t.loaded_at < %s
+          AND NOT EXISTS (SELECT 1 FROM stg.accounts a WHERE a.id = t.account_id)
+    """, parameters=(lower, upper))[0] if rows else 0
     if cnt and cnt > 0:
         raise AssertionError(f"FK check failed: {cnt} transactions reference missing accounts")
+    _advance(dwh, "fk.transactions_accounts", upper, rows)
     return True
@@ -0,0 +1,43 @@
+from __future__ import annotations
+import logging
+import pendulum
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+# Partitions of the OLTP transactions table: keep the current month and the
+# next PREMAKE months attached ahead of time, and report rows that fell into
+# the default partition (they are moved out when their month is created).
+
+DAG_ID = "oltp_partition_maintenance"
+PREMAKE = 2
+log = logging.getLogger(__name__)
+
+def premake_partitions(**_):
+    oltp = PostgresHook(postgres_conn_id="oltp_postgres")
+    oltp.run("SELECT premake_transactions_partitions(%s);", parameters=(PREMAKE,))
+
+def report_partitions(**_):
+    oltp = PostgresHook(postgres_conn_id="oltp_postgres")
+    rows = oltp.get_records(
+        "SELECT partition_name, range_start, range_end, pg_total_relation_size(partition_name::regclass) "
+        "FROM v_transactions_partitions ORDER BY range_start NULLS FIRST"
+    )
+    for name, lo, hi, size in rows:
+        log.info("%-32s [%s, %s) bytes=%s", name, lo, hi, size)
+    (default_rows,) = oltp.get_first("SELECT COUNT(*) FROM transactions_default")
+    if default_rows:
+        log.warning("transactions_default holds %s rows outside the premade months", default_rows)
+    return f"partitions={len(rows)}, default_rows={default_rows}"
+
+with DAG(
+    dag_id=DAG_ID,
+    schedule="@daily",
+    start_date=pendulum.now("UTC").subtract(days=1),
+    catchup=False,
+    default_args={"owner": "data", "retries": 0},
+    tags=["oltp", "partitions"],
+) as dag:
+    premake = PythonOperator(task_id="premake_partitions", python_callable=premake_partitions)
+    report = PythonOperator(task_id="report_partitions", python_callable=report_partitions)
+    premake >> report
@@ -1,3 +1,5 @@
+import os
+import threading
 from datetime import datetime, timedelta
 from typing import Optional, Iterable
 from airflow import DAG
@@ -24,6 +26,29 @@ TABLES = [
     ("outbox",       "id", "created_at"),
 ]
 BATCH_SIZE = 5000
+# "copy": binary COPY streamed OLTP -> DWH temp table -> single merge (default)
+# "rows": legacy fetchall + execute_values path
+TRANSFER_MODE = os.getenv("STG_TRANSFER_MODE", "copy")
+COPY_BATCH_SIZE = int(os.getenv("STG_COPY_BATCH_SIZE", "100000"))
+# Columns filled by the loader itself, never copied from OLTP
+LOADER_COLUMNS = ("loaded_at", "row_hash")
+# "merge": also capture updates (keyed on CHANGE_COLUMNS, upsert when the row hash
+# changed); "append": created_at only, existing rows are never rewritten.
+# Merge runs on the COPY transfer path.
+LOAD_MODE = os.getenv("STG_LOAD_MODE", "merge")
+CHANGE_COLUMNS = {
+    # table_name -> change timestamp (outbox is append-only)
+    "customers":    "updated_at",
+    "accounts":     "updated_at",
+    # updated_at is the write time (settled_at is the acquirer's event time);
+    # NULL on rows older than the column
+    "transactions": "COALESCE(updated_at, settled_at, created_at)",
+}
+# Columns left out of the row hash: bumping them alone is not a change
+HASH_EXCLUDE = ("updated_at",)
+# Rows whose change timestamp is this recent are left for the next run, so
+# transactions still in flight when the scan starts are not stepped over.
+MERGE_SAFETY_SECONDS = int(os.getenv("STG_MERGE_SAFETY_SECONDS", "60"))
 
 def get_hooks():
     src = PostgresHook.get_hook("oltp_postgres")   # OLTP
@@ -50,6 +75,10 @@ def set_watermark(dst: PostgresHook, table: str, value: datetime):
         parameters=(value, table)
     )
 
+def adapt_row(row: tuple) -> tuple:
+    # transform dict → Json() for psycopg2
+    return tuple(Json(v) if isinstance(v, dict) else v for v in row)
+
 def copy_batch(src: PostgresHook, dst: PostgresHook, table: str, pk: str, created_col: str, since: datetime) -> Optional[datetime]:
     conn = src.get_conn()
     cursor = conn.cursor()
@@ -70,10 +99,6 @@ def copy_batch(src: PostgresHook, dst: PostgresHook, table: str, pk: str, create
     cols = [desc[0] for desc in cursor.description]
     cursor.close()
 
-    # transform dict → Json() for psycopg2
-    def adapt_row(row):
-        return tuple(Json(v) if isinstance(v, dict) else v for v in row)
-
     adapted_rows = [adapt_row(r) for r in rows]
 
     collist = ",".join(cols)
@@ -92,6 +117,218 @@ def copy_batch(src: PostgresHook, dst: PostgresHook, table: str, pk: str, create
     created_idx = cols.index(created_col)
     max_created = max(r[created_idx] for r in rows)
     return max_created
+
+# ----- COPY transfer mode -----
+def staging_columns(dst_conn, table: str) -> list[tuple[str, str]]:
+    """(column, type) pairs of stg.<table> that are copied from the OLTP table."""
+    with dst_conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+            """,
+            (f"stg.{table}",)
+        )
+        return [(c, t) for c, t in cur.fetchall() if c not in LOADER_COLUMNS]
+
+def pipe_copy(src_conn, dst_conn, copy_out_sql: str, copy_in_sql: str) -> None:
+    """
+    Stream `COPY ... TO STDOUT` on src straight into `COPY ... FROM STDIN` on dst
+    through an OS pipe, so rows never accumulate in Python memory.
+    """
+    r_fd, w_fd = os.pipe()
+    errors: list[Exception] = []
+
+    def produce():
+        try:
+            with os.fdopen(w_fd, "wb") as w, src_conn.cursor() as cur:
+                cur.copy_expert(copy_out_sql, w)
+        except Exception as e:  # surfaced in the calling thread
+            errors.append(e)
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    try:
+        # closing the read end on failure unblocks the producer (BrokenPipeError)
+        with os.fdopen(r_fd, "rb") as r, dst_conn.cursor() as cur:
+            cur.copy_expert(copy_in_sql, r)
+    except Exception:
+        t.join()
+        if errors:
+            raise errors[0]
+        raise
+    t.join()
+    if errors:
+        raise errors[0]
+
+def row_hash_sql(alias: str, cols: list[str]) -> str:
+    """md5 over the row's text form (session TimeZone must be fixed, see load_incremental_merge)."""
+    fields = ", ".join(f"{alias}.{c}" for c in cols if c not in HASH_EXCLUDE)
+    return f"decode(md5(ROW({fields})::text), 'hex')"
+
+def merge_sql(table: str, pk: str, cols: list[str], tmp: str) -> str:
+    """
+    Upsert that only rewrites rows whose hash changed. Rows staged before the
+    row_hash column existed are hashed on the fly, so they are not rewritten
+    just to backfill the hash.
+    """
+    names = ", ".join(cols)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c != pk)
+    return f"""
+        INSERT INTO stg.{table} AS s ({names}, row_hash)
+        SELECT {names}, {row_hash_sql("t", cols)} FROM {tmp} t
+        ON CONFLICT ({pk}) DO UPDATE
+        SET {updates}, row_hash = EXCLUDED.row_hash, loaded_at = NOW()
+        WHERE COALESCE(s.row_hash, {row_hash_sql("s", cols)}) IS DISTINCT FROM EXCLUDED.row_hash
+    """
+
+def copy_keyset_batch(src_conn, dst_conn, table: str, pk: str, created_col: str,
+                      after: Optional[tuple[datetime, str]],
+                      lower: Optional[datetime] = None,
+                      upper: Optional[datetime] = None,
+                      merge: bool = False) -> Optional[tuple[int, datetime, str]]:
+    """
+    COPY (binary) the next COPY_BATCH_SIZE rows strictly after the (created_col, pk)
+    keyset `after`, optionally bounded to [lower, upper), into a DWH temp table and
+    merge them into stg.<table> with a single INSERT ... ON CONFLICT. created_col
+    may be an expression over the table's columns (see CHANGE_COLUMNS).
+
+    Ordering and paging on the composite key means rows sharing a timestamp across
+    a batch boundary are never skipped. With merge=False existing rows are left
+    alone; with merge=True they are updated when their row hash changed. Returns
+    (rows, last created, last pk), or None when there is nothing left. The DWH
+    transaction is left open so the caller can record its checkpoint atomically
+    with the merge before committing.
+    """
+    cols = staging_columns(dst_conn, table)
+    names = ", ".join(c for c, _ in cols)
+    # cast to the staging types so binary representations match (enums -> text, ...)
+    select = ", ".join(f"{c}::{t}" for c, t in cols)
+    tmp = f"tmp_stg_{table}"
+
+    where, params = ["TRUE"], []
+    if after:
+        where.append(f"({created_col}, {pk}) > (%s, %s)")
+        params += list(after)
+    if lower:
+        where.append(f"{created_col} >= %s")
+        params.append(lower)
+    if upper:
+        where.append(f"{created_col} < %s")
+        params.append(upper)
+
+    with dst_conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {tmp} (LIKE stg.{table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+    with src_conn.cursor() as cur:
+        copy_out = cur.mogrify(
+            f"""
+            COPY (
+              SELECT {select} FROM {table}
+              WHERE {" AND ".join(where)}
+              ORDER BY {created_col}, {pk}
+              LIMIT {COPY_BATCH_SIZE}
+            ) TO STDOUT (FORMAT binary)
+            """,
+            params
+        ).decode()
+
+    pipe_copy(src_conn, dst_conn, copy_out, f"COPY {tmp} ({names}) FROM STDIN (FORMAT binary)")
+    src_conn.commit()  # end the read transaction on the OLTP side
+
+    with dst_conn.cursor() as cur:
+        cur.execute(f"SELECT {created_col}, {pk} FROM {tmp} ORDER BY {created_col} DESC, {pk} DESC LIMIT 1")
+        last = cur.fetchone()
+        if not last:
+            return None
+        if merge:
+            cur.execute(merge_sql(table, pk, [c for c, _ in cols], tmp))
+        else:
+            cur.execute(
+                f"""
+                INSERT INTO stg.{table} ({names})
+                SELECT {names} FROM {tmp}
+                ON CONFLICT ({pk}) DO NOTHING
+                """
+            )
+        cur.execute(f"SELECT COUNT(*) FROM {tmp}")
+        copied = cur.fetchone()[0]
+    return copied, last[0], str(last[1])
+
+def get_keyset_watermark(dst_conn, table: str) -> tuple[datetime, str]:
+    with dst_conn.cursor() as cur:
+        cur.execute(
+            "SELECT last_loaded_at, last_loaded_id FROM stg.etl_watermarks WHERE table_name=%s",
+            (table,)
+        )
+        ts, last_id = cur.fetchone()
+    # rows loaded before the id column existed: resume from the timestamp alone
+    return (ts, str(last_id) if last_id else "00000000-0000-0000-0000-000000000000")
+
+def set_keyset_watermark(dst_conn, table: str, ts: datetime, last_id: str):
+    """Advance (never rewind) the watermark; runs inside the caller's transaction."""
+    with dst_conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE stg.etl_watermarks
+            SET last_loaded_at=%s, last_loaded_id=%s
+            WHERE table_name=%s
+              AND (last_loaded_at, COALESCE(last_loaded_id, '00000000-0000-0000-0000-000000000000'::uuid))
+                  < (%s, %s::uuid)
+            """,
+            (ts, last_id, table, ts, last_id)
+        )
+
+def load_incremental_copy(src_conn, dst_conn, table: str, pk: str, created_col: str) -> tuple[int, Optional[datetime]]:
+    """Drain everything after the keyset watermark, committing batch by batch."""
+    after = get_keyset_watermark(dst_conn, table)
+    batches = 0
+    while True:
+        res = copy_keyset_batch(src_conn, dst_conn, table, pk, created_col, after)
+        if not res:
+            dst_conn.commit()
+            break
+        _, ts, last_id = res
+        set_keyset_watermark(dst_conn, table, ts, last_id)
+        dst_conn.commit()
+        batches += 1
+        after = (ts, last_id)
+    return batches, after[0]
+
+def load_incremental_merge(src_conn, dst_conn, table: str, pk: str) -> tuple[int, Optional[datetime]]:
+    """
+    Capture inserts and updates: page through the OLTP on the (change timestamp, pk)
+    keyset after the table's own "<table>:changes" watermark, so every row version
+    is read once, and upsert only rows whose hash changed.
+    """
+    change_col = CHANGE_COLUMNS[table]
+    key = f"{table}:changes"
+    with dst_conn.cursor() as cur:
+        # ROW(...)::text renders timestamptz in the session zone; pin it for stable hashes
+        cur.execute("SET TIME ZONE 'UTC'")
+        cur.execute(
+            "INSERT INTO stg.etl_watermarks(table_name) VALUES (%s) ON CONFLICT (table_name) DO NOTHING",
+            (key,)
+        )
+    with src_conn.cursor() as cur:
+        cur.execute("SELECT NOW() - make_interval(secs => %s)", (MERGE_SAFETY_SECONDS,))
+        upper = cur.fetchone()[0]
+    src_conn.commit()
+    after = get_keyset_watermark(dst_conn, key)
+    batches = 0
+    while True:
+        res = copy_keyset_batch(src_conn, dst_conn, table, pk, change_col, after, upper=upper, merge=True)
+        if not res:
+            dst_conn.commit()
+            break
+        _, ts, last_id = res
+        set_keyset_watermark(dst_conn, key, ts, last_id)
+        dst_conn.commit()
+        batches += 1
+        after = (ts, last_id)
+    return batches, after[0]
+
 with DAG(
     dag_id="oltp_to_stg",
     default_args=DEFAULT_ARGS,
@@ -116,13 +353,25 @@ with DAG(
 
         moved = 0
         last = since
-        while True:
-            new_last = copy_batch(src, dst, table, pk, created_col, last)
-            if not new_last:
-                break
-            moved += 1
-            last = new_last
-            set_watermark(dst, table, last)
+        if TRANSFER_MODE == "copy":
+            # one connection per side for the whole task
+            src_conn, dst_conn = src.get_conn(), dst.get_conn()
+            try:
+                if LOAD_MODE == "merge" and table in CHANGE_COLUMNS:
+                    moved, last = load_incremental_merge(src_conn, dst_conn, table, pk)
+                else:
+                    moved, last = load_incremental_copy(src_conn, dst_conn, table, pk, created_col)
+            finally:
+                src_conn.close()
+                dst_conn.close()
+        else:
+            while True:
+                new_last = copy_batch(src, dst, table, pk, created_col, last)
+                if not new_last:
+                    break
+                moved += 1
+                last = new_last
+                set_watermark(dst, table, last)
 
         return f"{table}: batches={moved}, new_watermark={last.isoformat()}"
 
@@ -134,29 +383,32 @@ with DAG(
         ensure >> t
         logs.append(t)
     
-    # validate_customers = PythonOperator(
-    #     task_id="validate_stg_customers",
-    #     python_callable=validate_stg_customers,
-    #     dag=dag,
-    #     )
-
-    # validate_accounts = PythonOperator(
-    #     task_id="validate_stg_accounts",
-    #     python_callable=validate_stg_accounts,
-    #     dag=dag,
-    # )
-
-    # validate_transactions = PythonOperator(
-    #     task_id="validate_stg_transactions",
-    #     python_callable=validate_stg_transactions,
-    #     dag=dag,
-    # )
-
-    # check_fk_tx_accounts = PythonOperator(
-    #     task_id="check_fk_transactions_accounts",
-    #     python_callable=check_fk_transactions_accounts,
-    #     dag=dag,
-    # )
-    # logs[0] >> validate_customers
-    # logs[1] >> validate_accounts
-    # logs[2] >> validate_transactions >> check_fk_tx_accounts
+    # Validation covers each run's delta only (see gx_validate), so it stays
+    # cheap as staging grows.
+    validate_customers = PythonOperator(
+        task_id="validate_stg_customers",
+        python_callable=validate_stg_customers,
+        dag=dag,
+    )
+
+    validate_accounts = PythonOperator(
+        task_id="validate_stg_accounts",
+        python_callable=validate_stg_accounts,
+        dag=dag,
+    )
+
+    validate_transactions = PythonOperator(
+        task_id="validate_stg_transactions",
+        python_callable=validate_stg_transactions,
+        dag=dag,
+    )
+
+    check_fk_tx_accounts = PythonOperator(
+        task_id="check_fk_transactions_accounts",
+        python_callable=check_fk_transactions_accounts,
+        dag=dag,
+    )
+    logs[0] >> validate_customers
+    logs[1] >> validate_accounts
+    logs[2] >> validate_transactions >> check_fk_tx_accounts
+    logs[1] >> check_fk_tx_accounts
@@ -0,0 +1,285 @@
+import os
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from airflow import DAG
+from airflow.configuration import conf
+from airflow.decorators import task
+from airflow.models.param import Param
+from psycopg2.extras import execute_values
+from oltp_to_stg import (
+    TABLES,
+    DEFAULT_ARGS,
+    CHANGE_COLUMNS,
+    get_hooks,
+    copy_keyset_batch,
+    get_keyset_watermark,
+    set_keyset_watermark,
+)
+
+# Parallel, resumable backfill of staging.
+# The source range is split into time chunks; every chunk is a mapped task that
+# pages through its slice on the (created_at, id) keyset and checkpoints after
+# each COPY batch in stg.etl_backfill_chunks. Retrying a failed chunk (or
+# re-triggering with the same backfill_id) resumes from that checkpoint, and
+# chunks already DONE are skipped.
+
+BACKFILL_WORKERS = int(os.getenv("STG_BACKFILL_WORKERS", "4"))
+TABLE_KEYS = {name: (pk, created_col) for name, pk, created_col in TABLES}
+
+def _utc(value: str) -> datetime:
+    ts = datetime.fromisoformat(value)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+def plan_time_chunks(lo: datetime, hi: datetime, hours: int) -> list[tuple[datetime, datetime]]:
+    """Half-open [start, end) slices of `hours` covering [lo, hi)."""
+    step = timedelta(hours=hours)
+    lo = lo.replace(minute=0, second=0, microsecond=0)
+    out = []
+    while lo < hi:
+        out.append((lo, min(lo + step, hi)))
+        lo += step
+    return out
+
+def _backfill_id(context) -> str:
+    return context["params"]["backfill_id"] or context["run_id"]
+
+def hand_off_changes(src_conn, dst_conn, table: str, pk: str, created_col: str,
+                     first_start: datetime, last: tuple) -> str:
+    """
+    Seed the merge loader's "<table>:changes" watermark (see load_incremental_merge)
+    with the backfill's last (created_at, id). Every row up to that key was copied
+    in its current version, and any later write to it carries a change timestamp
+    at or after the copy, so nothing after the seed is missed. Skipped when a
+    change to a row created before the backfill start sits between the current
+    changes watermark and the seed: the merge loader still has to read it.
+    """
+    key = f"{table}:changes"
+    change_col = CHANGE_COLUMNS[table]
+    with dst_conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO stg.etl_watermarks(table_name) VALUES (%s) ON CONFLICT (table_name) DO NOTHING",
+            (key,)
+        )
+    wm_ts, wm_id = get_keyset_watermark(dst_conn, key)
+    with src_conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT 1 FROM {table}
+            WHERE ({change_col}, {pk}) > (%s, %s::uuid) AND {change_col} <= %s AND {created_col} < %s
+            LIMIT 1
+            """,
+            (wm_ts, wm_id, last[0], first_start)
+        )
+        gap = cur.fetchone() is not None
+    src_conn.commit()
+    if gap:
+        dst_conn.commit()
+        return f"{key}: pending changes before backfill start, watermark unchanged"
+    set_keyset_watermark(dst_conn, key, last[0], str(last[1]))
+    dst_conn.commit()
+    return f"{key}: watermark -> {last[0].isoformat()}"
+
+with DAG(
+    dag_id="oltp_to_stg_backfill",
+    default_args=DEFAULT_ARGS,
+    start_date=datetime(2025, 1, 1),
+    schedule=None,
+    catchup=False,
+    tags=["staging", "postgres", "backfill"],
+    params={
+        "tables": Param([t[0] for t in TABLES], type="array"),
+        "start": Param(None, type=["null", "string"], description="ISO timestamp; default MIN(created_at)"),
+        "end": Param(None, type=["null", "string"], description="ISO timestamp (exclusive); default MAX(created_at)"),
+        "chunk_hours": Param(72, type="integer", minimum=1),
+        "backfill_id": Param(None, type=["null", "string"], description="reuse to resume a previous backfill"),
+    },
+) as dag:
+
+    @task
+    def plan_chunks(**context) -> list[dict]:
+        p = context["params"]
+        backfill_id = _backfill_id(context)
+        src, dst = get_hooks()
+
+        rows = []
+        for table in p["tables"]:
+            pk, created_col = TABLE_KEYS[table]
+            lo = _utc(p["start"]) if p["start"] else None
+            hi = _utc(p["end"]) if p["end"] else None
+            if lo is None or hi is None:
+                mn, mx = src.get_first(f"SELECT MIN({created_col}), MAX({created_col}) FROM {table}")
+                if mn is None:
+                    continue
+                lo = lo or mn
+                hi = hi or mx + timedelta(microseconds=1)
+            for a, b in plan_time_chunks(lo, hi, p["chunk_hours"]):
+                rows.append((backfill_id, table, a, b))
+
+        with closing(dst.get_conn()) as conn:
+            with conn.cursor() as cur:
+                if rows:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO stg.etl_backfill_chunks (backfill_id, table_name, chunk_start, chunk_end)
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                        """,
+                        rows,
+                    )
+                cur.execute(
+                    """
+                    SELECT table_name, chunk_start, chunk_end FROM stg.etl_backfill_chunks
+                    WHERE backfill_id = %s AND status <> 'DONE'
+                    ORDER BY chunk_start, table_name
+                    """,
+                    (backfill_id,)
+                )
+                todo = cur.fetchall()
+            conn.commit()
+
+        max_map = conf.getint("core", "max_map_length")
+        if len(todo) > max_map:
+            raise ValueError(f"{len(todo)} chunks exceed core.max_map_length={max_map}; raise chunk_hours")
+        return [
+            {"backfill_id": backfill_id, "table": t, "chunk_start": a.isoformat(), "chunk_end": b.isoformat()}
+            for t, a, b in todo
+        ]
+
+    @task(retries=2, retry_delay=timedelta(seconds=30), max_active_tis_per_dagrun=BACKFILL_WORKERS)
+    def load_chunk(chunk: dict) -> str:
+        table = chunk["table"]
+        pk, created_col = TABLE_KEYS[table]
+        key = (chunk["backfill_id"], table, chunk["chunk_start"])
+        lower, upper = _utc(chunk["chunk_start"]), _utc(chunk["chunk_end"])
+
+        src, dst = get_hooks()
+        src_conn, dst_conn = src.get_conn(), dst.get_conn()
+        try:
+            with dst_conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE stg.etl_backfill_chunks SET status = 'RUNNING', updated_at = NOW()
+                    WHERE backfill_id = %s AND table_name = %s AND chunk_start = %s AND status <> 'DONE'
+                    RETURNING last_created_at, last_id, rows_loaded
+                    """,
+                    key
+                )
+                row = cur.fetchone()
+            dst_conn.commit()
+            if row is None:
+                return f"{table}@{chunk['chunk_start']}: already done"
+
+            last_ts, last_id, loaded = row
+            after = (last_ts, str(last_id)) if last_ts else None
+            while True:
+                res = copy_keyset_batch(src_conn, dst_conn, table, pk, created_col, after, lower, upper)
+                if not res:
+                    break
+                n, ts, last = res
+                loaded += n
+                with dst_conn.cursor() as cur:
+                    # checkpoint commits atomically with the merged batch
+                    cur.execute(
+                        """
+                        UPDATE stg.etl_backfill_chunks
+                        SET rows_loaded = rows_loaded + %s, last_created_at = %s, last_id = %s, updated_at = NOW()
+                        WHERE backfill_id = %s AND table_name = %s AND chunk_start = %s
+                        """,
+                        (n, ts, last) + key
+                    )
+                dst_conn.commit()
+                after = (ts, last)
+
+            with dst_conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE stg.etl_backfill_chunks SET status = 'DONE', updated_at = NOW()
+                    WHERE backfill_id = %s AND table_name = %s AND chunk_start = %s
+                    """,
+                    key
+                )
+            dst_conn.commit()
+            return f"{table}@{chunk['chunk_start']}: rows={loaded}"
+        except Exception:
+            dst_conn.rollback()
+            with dst_conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE stg.etl_backfill_chunks SET status = 'FAILED', updated_at = NOW()
+                    WHERE backfill_id = %s AND table_name = %s AND chunk_start = %s
+                    """,
+                    key
+                )
+            dst_conn.commit()
+            raise
+        finally:
+            src_conn.close()
+            dst_conn.close()
+
+    @task
+    def finalize(**context) -> list[str]:
+        """
+        Once every chunk is DONE, hand over to the hourly loader: advance the
+        incremental watermark to the backfill's last key, but only when no source
+        rows sit between the current watermark and the backfill start. Tables the
+        merge loader tracks also get their "<table>:changes" watermark seeded.
+        """
+        backfill_id = _backfill_id(context)
+        src, dst = get_hooks()
+        out = []
+        with closing(src.get_conn()) as src_conn, closing(dst.get_conn()) as dst_conn:
+            for table in context["params"]["tables"]:
+                pk, created_col = TABLE_KEYS[table]
+                with dst_conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT MIN(chunk_start), COUNT(*) FILTER (WHERE status <> 'DONE')
+                        FROM stg.etl_backfill_chunks WHERE backfill_id = %s AND table_name = %s
+                        """,
+                        (backfill_id, table)
+                    )
+                    first_start, not_done = cur.fetchone()
+                    cur.execute(
+                        """
+                        SELECT last_created_at, last_id FROM stg.etl_backfill_chunks
+                        WHERE backfill_id = %s AND table_name = %s AND last_created_at IS NOT NULL
+                        ORDER BY last_created_at DESC, last_id DESC LIMIT 1
+                        """,
+                        (backfill_id, table)
+                    )
+                    last = cur.fetchone()
+                if first_start is None or not_done or last is None:
+                    out.append(f"{table}: watermark unchanged")
+                    continue
+
+                with dst_conn.cursor() as cur:
+                    cur.execute(
+                        "INSERT INTO stg.etl_watermarks(table_name) VALUES (%s) ON CONFLICT (table_name) DO NOTHING",
+                        (table,)
+                    )
+                wm_ts, wm_id = get_keyset_watermark(dst_conn, table)
+                with src_conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        SELECT 1 FROM {table}
+                        WHERE ({created_col}, {pk}) > (%s, %s::uuid) AND {created_col} < %s
+                        LIMIT 1
+                        """,
+                        (wm_ts, wm_id, first_start)
+                    )
+                    gap = cur.fetchone() is not None
+                src_conn.commit()
+                if gap:
+                    dst_conn.commit()
+                    out.append(f"{table}: gap before backfill start, watermark unchanged")
+                    continue
+                set_keyset_watermark(dst_conn, table, last[0], str(last[1]))
+                dst_conn.commit()
+                out.append(f"{table}: watermark -> {last[0].isoformat()}")
+                if table in CHANGE_COLUMNS:
+                    out.append(hand_off_changes(src_conn, dst_conn, table, pk, created_col, first_start, last))
+        return out
+
+    chunks = plan_chunks()
+    chunks >> load_chunk.expand(chunk=chunks) >> finalize()
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dags"))
+from dq_engine import Expectation, compile_sql, summarize  # noqa: E402
+
+EXPECTATIONS = [
+    Expectation("expect_column_values_to_not_be_null", "id"),
+    Expectation("expect_column_values_to_be_unique", "id"),
+    Expectation("expect_column_values_to_be_in_set", "status", {"value_set": ["PENDING", "SETTLED"]}),
+    Expectation("expect_column_values_to_match_regex", "currency", {"regex": r"^[A-Z]{3}$", "mostly": 0.5}),
+    Expectation("expect_column_values_to_be_between", "amount", {"min_value": 0, "strict_min": True}),
+]
+
+def test_one_aggregate_per_expectation():
+    sql, params = compile_sql("stg.transactions", EXPECTATIONS, "loaded_at >= %s", ("t0",))
+    select = sql.split("\nFROM ")[0]
+    # COUNT(*), one COUNT(col) per distinct column, one count per expectation
+    assert select.count("\n") + 1 == 1 + 4 + len(EXPECTATIONS)
+    assert select.count("COUNT(*) FILTER (WHERE") == len(EXPECTATIONS) - 1
+    assert 'COUNT("id") - COUNT(DISTINCT "id")' in select
+    assert '"id" IS NULL' in select
+    assert '"amount" IS NOT NULL AND ("amount" <= %s)' in select
+    assert sql.endswith("FROM stg.transactions\nWHERE loaded_at >= %s")
+    # expectation params in column order, the window params last
+    assert params == [["PENDING", "SETTLED"], r"^[A-Z]{3}$", 0, "t0"]
+
+def test_between_bounds():
+    e = Expectation("expect_column_values_to_be_between", "kyc_level", {"min_value": 0, "max_value": 3})
+    sql, params = compile_sql("stg.customers", [e])
+    assert '"kyc_level" IS NOT NULL AND ("kyc_level" < %s OR "kyc_level" > %s)' in sql
+    assert params == [0, 3]
+    with pytest.raises(ValueError):
+        compile_sql("stg.customers", [Expectation("expect_column_values_to_be_between", "kyc_level")])
+
+def test_unsupported_expectation():
+    with pytest.raises(ValueError):
+        compile_sql("stg.transactions", [Expectation("expect_column_values_to_be_greater_than", "amount")])
+
+def test_summarize_shape():
+    # 10 rows; id: 10 non-null, status: 8, currency: 10, amount: 9
+    row = (10, 10, 8, 10, 9, 0, 2, 1, 4, 0)
+    out = summarize(EXPECTATIONS, row, {"table": "stg.transactions"})
+    assert out["meta"] == {"engine": "dq_engine", "table": "stg.transactions"}
+    assert out["statistics"] == {
+        "evaluated_expectations": 5,
+        "successful_expectations": 3,
+        "unsuccessful_expectations": 2,
+        "success_percent": 60.0,
+    }
+    assert out["success"] is False
+    [not_null, unique, in_set, regex, between] = out["results"]
+    assert not_null["success"] and between["success"]
+    assert unique["expectation_config"] == {"type": "expect_column_values_to_be_unique", "kwargs": {"column": "id"}}
+    assert not unique["success"] and unique["result"]["unexpected_count"] == 2
+    # non-null expectations use the non-null count as the denominator
+    assert in_set["result"] == {
+        "element_count": 10, "missing_count": 2, "unexpected_count": 1, "unexpected_percent": 12.5,
+    }
+    assert not in_set["success"]
+    # 40% unexpected passes with mostly=0.5
+    assert regex["success"] and regex["result"]["unexpected_percent"] == 40.0
+    assert between["result"]["missing_count"] == 1
+
+def test_summarize_empty_window():
+    out = summarize(EXPECTATIONS, (0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+    assert out["success"] is True
+    assert all(r["result"]["unexpected_percent"] == 0.0 for r in out["results"])
@@ -1,5 +1,34 @@
-import os, random, string, argparse
-from datetime import datetime, timedelta
+"""
+Synthetic OLTP dataset generator.
+
+Customers are split into shards of --shard-size; every shard (its customers,
+their accounts, their share of --transactions and their SCD updates) is
+generated by a worker process from RNGs seeded with (seed, shard, kind), so
+the output depends only on the arguments, not on the number of workers or the
+order shards finish in. Each shard is loaded with COPY in one transaction, or
+written as CSV files under --out-dir.
+
+Skew:
+  merchants   Zipf(--zipf-s) popularity over a fixed catalogue of --merchants
+  accounts    --hot-fraction of accounts are --hot-weight times more active
+  bursts      --burst-fraction of transactions arrive as 5-20 payments from one
+              account within a few minutes (velocity rule fodder)
+  updates     --update-fraction of customers change risk band / KYC level and
+              a tenth as many accounts get suspended (new SCD2 versions)
+
+Updates are a separate phase so the pipelines can load the initial versions
+first:
+  python seed/generator.py --customers 1000000 --transactions 10000000 --phase load
+  # run oltp_to_stg / curated_load
+  python seed/generator.py --customers 1000000 --transactions 10000000 --phase updates
+"""
+import os, random, argparse, csv, json, uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import Pool
+from typing import Iterator, Optional
 from faker import Faker
 from dotenv import load_dotenv
 import psycopg
@@ -11,63 +40,271 @@ OLTP_USER = os.getenv('OLTP_USER')
 OLTP_PASSWORD = os.getenv('OLTP_PASSWORD')
 OLTP_PORT = int(os.getenv('OLTP_PORT', '5432'))
 
+CUSTOMER_COLUMNS = ("id", "email", "country", "kyc_level", "risk_band", "created_at", "updated_at")
+ACCOUNT_COLUMNS = ("id", "customer_id", "currency", "country", "status", "created_at", "updated_at")
+TRANSACTION_COLUMNS = ("id", "account_id", "type", "status", "amount", "currency", "merchant_name",
+                       "merchant_category", "description", "country", "metadata", "created_at", "settled_at")
+
+COUNTRIES = ["VN", "SG", "US", "JP"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "example.com"]
+CURRENCIES = ["VND", "USD"]
+# (mu, sigma) of log(amount) per currency
+AMOUNT_LOGNORMAL = {"VND": (12.0, 1.2), "USD": (3.0, 1.1)}
+TYPES, TYPE_WEIGHTS = ["PAYMENT", "TRANSFER_OUT", "TRANSFER_IN", "REFUND", "FEE"], [80, 8, 7, 3, 2]
+STATUSES, STATUS_WEIGHTS = ["SETTLED", "PENDING", "DECLINED", "REVERSED", "CHARGEBACK"], [85, 8, 5, 1.5, 0.5]
+CATEGORIES = ["grocery", "food", "transport", "ecommerce", "travel", "utilities", "entertainment", "health"]
+CHANNELS = ["card", "qr", "wallet", "bank_transfer"]
+
+@dataclass(frozen=True)
+class Config:
+    seed: int = 42
+    customers: int = 200
+    max_accounts_per_customer: int = 2
+    transactions: int = 0
+    shard_size: int = 50_000
+    start: datetime = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    days: int = 90
+    merchants: int = 5_000
+    zipf_s: float = 1.1
+    hot_fraction: float = 0.01
+    hot_weight: float = 50.0
+    burst_fraction: float = 0.02
+    update_fraction: float = 0.05
+    phase: str = "all"           # load | updates | all
+    out_dir: Optional[str] = None
+
+    @property
+    def shards(self) -> int:
+        return max(1, -(-self.customers // self.shard_size))
+
 def conn():
     return psycopg.connect(
         host="localhost", port=OLTP_PORT, dbname=OLTP_DB,
         user=OLTP_USER, password=OLTP_PASSWORD
     )
 
-def gen_email(fake):
-    # realistic unique email domain mix
-    base = fake.user_name()
-    domain = random.choice(["gmail.com","yahoo.com","outlook.com","example.com"])
-    return f"{base}{random.randint(1,9999)}@{domain}"
+def _rng(cfg: Config, shard: int, kind: str) -> random.Random:
+    return random.Random(f"{cfg.seed}:{shard}:{kind}")
 
-def random_currency():
-    return random.choice(["VND","USD"])
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
 
-def main(n_customers=200, max_accounts_per_customer=2):
+@lru_cache(maxsize=4)
+def user_names(seed: int, n: int = 2_000) -> tuple:
+    """Small deterministic pool of realistic user names; the customer index keeps emails unique."""
     fake = Faker()
-    Faker.seed(42); random.seed(42)
-
-    with conn() as c, c.cursor() as cur:
-        print(f"Seeding {n_customers} customers...")
-        customers = []
-        for _ in range(n_customers):
-            email = gen_email(fake)
-            country = random.choice(["VN","SG","US","JP"])
-            kyc_level = random.choice([0,1,2,3])
-            risk = random.choice(["LOW","LOW","MEDIUM"])  # skew low
-            cur.execute(
-                """
-                INSERT INTO customers (email, country, kyc_level, risk_band)
-                VALUES (%s,%s,%s,%s)
-                RETURNING id
-                """,
-                (email, country, kyc_level, risk)
-            )
-            customers.append(cur.fetchone()[0])
-
-        print("Seeding accounts...")
-        for cust_id in customers:
-            for _ in range(random.randint(1, max_accounts_per_customer)):
-                cur.execute(
-                   """
-                    INSERT INTO accounts (customer_id, currency, country, status)
-                    VALUES (%s, %s, %s, 'ACTIVE')
-                    ON CONFLICT (customer_id, currency)
-                    WHERE status <> 'CLOSED'
-                    DO NOTHING
-                    """, (cust_id, random_currency(), "VN")
-                )
-
-        c.commit()
-        print("Done.")
+    fake.seed_instance(seed)
+    return tuple(fake.user_name() for _ in range(n))
+
+@lru_cache(maxsize=4)
+def merchant_catalogue(seed: int, n: int, s: float) -> tuple[tuple, list]:
+    """(name, category, country) per popularity rank and the Zipf cumulative weights."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(f"{seed}:merchants")
+    merchants = tuple(
+        (f"{fake.company()} #{rank}", rng.choice(CATEGORIES), rng.choice(COUNTRIES))
+        for rank in range(1, n + 1)
+    )
+    return merchants, list(accumulate(1.0 / rank ** s for rank in range(1, n + 1)))
+
+def gen_email(names: tuple, rng: random.Random, index: int) -> str:
+    # realistic unique email domain mix
+    return f"{rng.choice(names)}{index}@{rng.choice(DOMAINS)}"
+
+# ----- shard generation -----
+
+def gen_customers(cfg: Config, shard: int) -> list[tuple]:
+    rng = _rng(cfg, shard, "customers")
+    names = user_names(cfg.seed)
+    lo, hi = shard * cfg.shard_size, min((shard + 1) * cfg.shard_size, cfg.customers)
+    out = []
+    for i in range(lo, hi):
+        created = cfg.start - timedelta(seconds=rng.uniform(86_400, 730 * 86_400))
+        out.append((
+            _uuid(rng), gen_email(names, rng, i), rng.choice(COUNTRIES),
+            rng.choice([0, 1, 2, 3]),
+            rng.choice(["LOW", "LOW", "MEDIUM"]),  # skew low
+            created, created,
+        ))
+    return out
+
+def gen_accounts(cfg: Config, shard: int, customers: list[tuple]) -> list[tuple]:
+    rng = _rng(cfg, shard, "accounts")
+    out = []
+    for cust_id, _, country, _, _, cust_created, _ in customers:
+        # one open account per (customer, currency): uix_accounts_customer_currency_open
+        k = min(rng.randint(1, cfg.max_accounts_per_customer), len(CURRENCIES))
+        for currency in rng.sample(CURRENCIES, k):
+            created = cust_created + (cfg.start - cust_created) * rng.random()
+            out.append((_uuid(rng), cust_id, currency, country, "ACTIVE", created, created))
+    return out
+
+def shard_transactions(cfg: Config, shard: int) -> int:
+    """This shard's share of cfg.transactions (exact total across shards)."""
+    lo, hi = shard * cfg.shard_size, min((shard + 1) * cfg.shard_size, cfg.customers)
+    return cfg.transactions * hi // cfg.customers - cfg.transactions * lo // cfg.customers
+
+def gen_transactions(cfg: Config, shard: int, accounts: list[tuple]) -> Iterator[tuple]:
+    n = shard_transactions(cfg, shard)
+    if not n or not accounts:
+        return
+    rng = _rng(cfg, shard, "transactions")
+    merchants, merchant_cum = merchant_catalogue(cfg.seed, cfg.merchants, cfg.zipf_s)
+    account_cum = list(accumulate(
+        cfg.hot_weight if rng.random() < cfg.hot_fraction else 1.0 for _ in accounts
+    ))
+    span = cfg.days * 86_400
+    type_cum = list(accumulate(TYPE_WEIGHTS))
+    status_cum = list(accumulate(STATUS_WEIGHTS))
+
+    def txn(account: tuple, created: datetime, type_: str) -> tuple:
+        acct_id, _, currency, country, _, _, _ = account
+        name, category, _ = rng.choices(merchants, cum_weights=merchant_cum)[0]
+        status = rng.choices(STATUSES, cum_weights=status_cum)[0]
+        mu, sigma = AMOUNT_LOGNORMAL[currency]
+        settled = created + timedelta(seconds=rng.uniform(60, 2 * 86_400)) if status in ("SETTLED", "REVERSED", "CHARGEBACK") else None
+        return (
+            _uuid(rng), acct_id, type_, status, round(rng.lognormvariate(mu, sigma), 2), currency,
+            name, category, None, country, json.dumps({"channel": rng.choice(CHANNELS)}), created, settled,
+        )
+
+    emitted = 0
+    while emitted < n:
+        account = rng.choices(accounts, cum_weights=account_cum)[0]
+        created = cfg.start + timedelta(seconds=rng.random() * span)
+        if rng.random() < cfg.burst_fraction / 12:     # bursts average 12.5 rows
+            size = min(rng.randint(5, 20), n - emitted)
+            window = rng.uniform(30, 300)
+            for offset in sorted(rng.uniform(0, window) for _ in range(size)):
+                yield txn(account, created + timedelta(seconds=offset), "PAYMENT")
+            emitted += size
+        else:
+            yield txn(account, created, rng.choices(TYPES, cum_weights=type_cum)[0])
+            emitted += 1
+
+def gen_updates(cfg: Config, shard: int, customers: list[tuple], accounts: list[tuple]) -> tuple[list, list]:
+    """(customer id, kyc_level, risk_band) and (account id, status) changes."""
+    rng = _rng(cfg, shard, "updates")
+    cust = [
+        (c[0], min(c[3] + 1, 3), rng.choice(["LOW", "MEDIUM", "HIGH"]))
+        for c in customers if rng.random() < cfg.update_fraction
+    ]
+    acct = [(a[0], "SUSPENDED") for a in accounts if rng.random() < cfg.update_fraction / 10]
+    return cust, acct
+
+# ----- sinks -----
+
+def _copy(cur, table: str, columns: tuple, rows) -> int:
+    n = 0
+    with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            n += 1
+    return n
+
+def load_shard(cfg: Config, shard: int) -> dict:
+    customers = gen_customers(cfg, shard)
+    accounts = gen_accounts(cfg, shard, customers)
+    counts = {"shard": shard}
+    with conn() as c:
+        if cfg.phase in ("load", "all"):
+            with c.cursor() as cur:
+                counts["customers"] = _copy(cur, "customers", CUSTOMER_COLUMNS, customers)
+                counts["accounts"] = _copy(cur, "accounts", ACCOUNT_COLUMNS, accounts)
+                counts["transactions"] = _copy(cur, "transactions", TRANSACTION_COLUMNS,
+                                               gen_transactions(cfg, shard, accounts))
+            c.commit()
+        if cfg.phase in ("updates", "all"):
+            cust, acct = gen_updates(cfg, shard, customers, accounts)
+            with c.cursor() as cur:
+                # set-based: COPY the changes, one UPDATE per table (trigger bumps updated_at)
+                cur.execute("CREATE TEMP TABLE tmp_cust_upd (id UUID, kyc_level SMALLINT, risk_band TEXT) ON COMMIT DROP")
+                cur.execute("CREATE TEMP TABLE tmp_acct_upd (id UUID, status account_status) ON COMMIT DROP")
+                _copy(cur, "tmp_cust_upd", ("id", "kyc_level", "risk_band"), cust)
+                _copy(cur, "tmp_acct_upd", ("id", "status"), acct)
+                cur.execute("""
+                    UPDATE customers c SET kyc_level = u.kyc_level, risk_band = u.risk_band
+                    FROM tmp_cust_upd u WHERE c.id = u.id
+                """)
+                counts["customer_updates"] = cur.rowcount
+                cur.execute("UPDATE accounts a SET status = u.status FROM tmp_acct_upd u WHERE a.id = u.id")
+                counts["account_updates"] = cur.rowcount
+            c.commit()
+    return counts
+
+def write_shard(cfg: Config, shard: int) -> dict:
+    customers = gen_customers(cfg, shard)
+    accounts = gen_accounts(cfg, shard, customers)
+    outputs = {}
+    if cfg.phase in ("load", "all"):
+        outputs["customers"] = (CUSTOMER_COLUMNS, customers)
+        outputs["accounts"] = (ACCOUNT_COLUMNS, accounts)
+        outputs["transactions"] = (TRANSACTION_COLUMNS, gen_transactions(cfg, shard, accounts))
+    if cfg.phase in ("updates", "all"):
+        cust, acct = gen_updates(cfg, shard, customers, accounts)
+        outputs["customer_updates"] = (("id", "kyc_level", "risk_band"), cust)
+        outputs["account_updates"] = (("id", "status"), acct)
+
+    counts = {"shard": shard}
+    for name, (columns, rows) in outputs.items():
+        path = os.path.join(cfg.out_dir, name, f"part-{shard:05d}.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        n = 0
+        with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(columns)
+            for row in rows:
+                w.writerow(row)
+                n += 1
+        os.replace(path + ".tmp", path)
+        counts[name] = n
+    return counts
+
+def run_shard(args: tuple[Config, int]) -> dict:
+    cfg, shard = args
+    return write_shard(cfg, shard) if cfg.out_dir else load_shard(cfg, shard)
+
+def main(n_customers=200, max_accounts_per_customer=2, workers=1, **options):
+    cfg = Config(customers=n_customers, max_accounts_per_customer=max_accounts_per_customer, **options)
+    target = cfg.out_dir or "OLTP"
+    print(f"Seeding {cfg.customers} customers, {cfg.transactions} transactions "
+          f"in {cfg.shards} shards x {workers} workers -> {target} (phase={cfg.phase})")
+    totals: dict = {}
+    tasks = [(cfg, shard) for shard in range(cfg.shards)]
+    with Pool(workers) as pool:
+        for counts in pool.imap_unordered(run_shard, tasks):
+            for k, v in counts.items():
+                if k != "shard":
+                    totals[k] = totals.get(k, 0) + v
+            print(f"  shard {counts['shard']}: {counts}")
+    print(f"Done. {totals}")
+    return totals
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--customers", type=int, default=200)
     ap.add_argument("--max-accounts-per-customer", type=int, default=2)
+    ap.add_argument("--transactions", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--shard-size", type=int, default=50_000, help="customers per shard")
+    ap.add_argument("--start", type=lambda v: datetime.fromisoformat(v).replace(tzinfo=timezone.utc),
+                    default=datetime(2025, 1, 1, tzinfo=timezone.utc), help="first transaction day (UTC)")
+    ap.add_argument("--days", type=int, default=90, help="days of transactions from --start")
+    ap.add_argument("--merchants", type=int, default=5_000)
+    ap.add_argument("--zipf-s", type=float, default=1.1)
+    ap.add_argument("--hot-fraction", type=float, default=0.01)
+    ap.add_argument("--hot-weight", type=float, default=50.0)
+    ap.add_argument("--burst-fraction", type=float, default=0.02)
+    ap.add_argument("--update-fraction", type=float, default=0.05)
+    ap.add_argument("--phase", choices=["load", "updates", "all"], default="all")
+    ap.add_argument("--out-dir", default=None, help="write CSV shards here instead of loading the OLTP")
     args = ap.parse_args()
-    print(args.customers,args.max_accounts_per_customer)
-    main(args.customers, args.max_accounts_per_customer)
+    main(
+        args.customers, args.max_accounts_per_customer, workers=args.workers,
+        transactions=args.transactions, seed=args.seed, shard_size=args.shard_size,
+        start=args.start, days=args.days, merchants=args.merchants, zipf_s=args.zipf_s,
+        hot_fraction=args.hot_fraction, hot_weight=args.hot_weight, burst_fraction=args.burst_fraction,
+        update_fraction=args.update_fraction, phase=args.phase, out_dir=args.out_dir,
+    )
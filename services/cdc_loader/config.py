@@ -0,0 +1,23 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+CDC_GROUP_ID = os.getenv("CDC_GROUP_ID", "lc-cdc-stg-loader")
+# Debezium topic.prefix + schema (see infra/kafka-connect/debezium-postgres-source.json)
+CDC_TOPIC_PREFIX = os.getenv("CDC_TOPIC_PREFIX", "txn.public")
+CDC_TABLES = os.getenv("CDC_TABLES", "customers,accounts,transactions,outbox").split(",")
+
+# Micro-batch bounds: flush when either is reached
+CDC_BATCH_MAX_RECORDS = int(os.getenv("CDC_BATCH_MAX_RECORDS", "5000"))
+CDC_BATCH_MAX_WAIT_SECONDS = float(os.getenv("CDC_BATCH_MAX_WAIT_SECONDS", "1.0"))
+
+# DWH Postgres
+DWH_USER = os.getenv("DWH_USER", "warehouse")
+DWH_PASSWORD = os.getenv("DWH_PASSWORD", "warehouse_password")
+DWH_DB = os.getenv("DWH_DB", "ledgercraft_dwh")
+DWH_PORT = int(os.getenv("DWH_PORT", "5432"))
+DWH_HOST = os.getenv("DWH_HOST", "dwh-postgres")
+
+DWH_DSN = f"postgresql://{DWH_USER}:{DWH_PASSWORD}@{DWH_HOST}:{DWH_PORT}/{DWH_DB}"
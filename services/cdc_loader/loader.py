@@ -0,0 +1,110 @@
+"""
+CDC micro-batch loader: Debezium topics -> stg.*.
+
+Each loop polls up to CDC_BATCH_MAX_RECORDS messages (or waits at most
+CDC_BATCH_MAX_WAIT_SECONDS), collapses them to the latest image per primary key
+and hands the batch to the sink, which upserts it together with the offsets and
+watermarks in a single DWH transaction. On any sink error the process exits;
+on restart the source seeks back to the stored offsets, so nothing is skipped
+and re-applied events are harmless upserts.
+
+Run: python loader.py
+"""
+import logging
+import signal
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional, Protocol
+
+from events import Record, parse_record, parse_ts
+from sources import Offsets, Source
+
+log = logging.getLogger("cdc_loader")
+
+@dataclass
+class Batch:
+    rows: dict[str, list[dict]] = field(default_factory=dict)
+    offsets: Offsets = field(default_factory=dict)
+    watermarks: dict[str, tuple[datetime, str]] = field(default_factory=dict)
+    records: int = 0
+
+class Sink(Protocol):
+    def apply(self, rows: dict[str, list[dict]], offsets: Offsets,
+              watermarks: dict[str, tuple[datetime, str]]) -> None: ...
+
+def build_batch(records: list[Record], prefix: str) -> Batch:
+    """Latest row image per (table, id); records are in per-partition offset order."""
+    latest: dict[str, dict[str, dict]] = {}
+    batch = Batch(records=len(records))
+    for rec in records:
+        key = (rec.topic, rec.partition)
+        batch.offsets[key] = max(batch.offsets.get(key, 0), rec.offset + 1)
+        change = parse_record(rec, prefix)
+        if change is None or change.op == "d":
+            # staging keeps history rows; deletes are not propagated
+            continue
+        latest.setdefault(change.table, {})[change.row["id"]] = change.row
+
+    for table, by_id in latest.items():
+        rows = list(by_id.values())
+        batch.rows[table] = rows
+        top = max((parse_ts(r["created_at"]), r["id"]) for r in rows)
+        batch.watermarks[table] = top
+    return batch
+
+class CdcLoader:
+    def __init__(self, source: Source, sink: Sink, topic_prefix: str,
+                 max_records: int, max_wait_s: float):
+        self.source = source
+        self.sink = sink
+        self.topic_prefix = topic_prefix
+        self.max_records = max_records
+        self.max_wait_s = max_wait_s
+
+    def run_once(self) -> Optional[Batch]:
+        records = self.source.poll_batch(self.max_records, self.max_wait_s)
+        if not records:
+            return None
+        batch = build_batch(records, self.topic_prefix)
+        self.sink.apply(batch.rows, batch.offsets, batch.watermarks)
+        self.source.commit(batch.offsets)
+        return batch
+
+    def run_forever(self, should_stop: Callable[[], bool] = lambda: False) -> None:
+        while not should_stop():
+            batch = self.run_once()
+            if batch is not None:
+                log.info(
+                    "applied %d records: %s", batch.records,
+                    ", ".join(f"{t}={len(r)}" for t, r in sorted(batch.rows.items())) or "no rows",
+                )
+
+def main():
+    from config import (
+        CDC_BATCH_MAX_RECORDS, CDC_BATCH_MAX_WAIT_SECONDS, CDC_GROUP_ID, CDC_TABLES,
+        CDC_TOPIC_PREFIX, DWH_DSN, KAFKA_BOOTSTRAP_SERVERS,
+    )
+    from sink import StagingSink
+    from sources import KafkaSource
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    sink = StagingSink(DWH_DSN, CDC_GROUP_ID)
+    topics = [f"{CDC_TOPIC_PREFIX}.{t.strip()}" for t in CDC_TABLES if t.strip()]
+    source = KafkaSource(KAFKA_BOOTSTRAP_SERVERS, CDC_GROUP_ID, topics, sink.stored_offsets)
+
+    stopping = False
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        CdcLoader(source, sink, CDC_TOPIC_PREFIX, CDC_BATCH_MAX_RECORDS, CDC_BATCH_MAX_WAIT_SECONDS) \
+            .run_forever(lambda: stopping)
+    finally:
+        source.close()
+        sink.close()
+
+if __name__ == "__main__":
+    main()
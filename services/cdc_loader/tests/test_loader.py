@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from loader import CdcLoader  # noqa: E402
+from sources import MemoryBroker, MemorySource  # noqa: E402
+
+PREFIX = "txn.public"
+TOPIC = f"{PREFIX}.transactions"
+
+class FakeSink:
+    """Stands in for the DWH: rows, offsets and watermarks change atomically."""
+    def __init__(self):
+        self.tables: dict[str, dict[str, dict]] = {}
+        self.offsets = {}
+        self.watermarks = {}
+        self.fail_next = False
+
+    def stored_offsets(self):
+        return dict(self.offsets)
+
+    def apply(self, rows, offsets, watermarks):
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("dwh unavailable")
+        for table, batch in rows.items():
+            for r in batch:
+                self.tables.setdefault(table, {})[r["id"]] = r
+        self.offsets.update(offsets)
+        for table, wm in watermarks.items():
+            self.watermarks[table] = max(self.watermarks.get(table, wm), wm)
+
+def txn(i, status="PENDING", settled_at=None):
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "account_id": "11111111-1111-1111-1111-111111111111",
+        "type": "PAYMENT",
+        "status": status,
+        "amount": "10.500000",
+        "currency": "USD",
+        "merchant_name": "Shop",
+        "merchant_category": None,
+        "description": None,
+        "country": "US",
+        "metadata": '{"channel": "web"}',
+        "created_at": f"2025-01-01T00:00:{i:02d}.000000Z",
+        "settled_at": settled_at,
+    }
+
+def produce(broker, row, op="c"):
+    value = json.dumps({"schema": {}, "payload": row}).encode()
+    broker.produce(TOPIC, value, key=row["id"].encode(), headers=[("__op", op.encode())])
+
+def make_loader(broker, sink, max_records=100):
+    source = MemorySource(broker, [TOPIC], sink.stored_offsets)
+    return CdcLoader(source, sink, PREFIX, max_records=max_records, max_wait_s=0)
+
+def test_updates_collapse_to_latest_image():
+    broker, sink = MemoryBroker(), FakeSink()
+    broker.create_topic(TOPIC, partitions=3)
+    for i in range(5):
+        produce(broker, txn(i))
+    produce(broker, txn(2, status="SETTLED", settled_at="2025-01-01T01:00:00.000000Z"), op="u")
+
+    batch = make_loader(broker, sink).run_once()
+
+    assert batch.records == 6
+    assert len(batch.rows["transactions"]) == 5
+    row = sink.tables["transactions"]["00000000-0000-0000-0000-000000000002"]
+    assert row["status"] == "SETTLED"
+    assert row["metadata"] == '{"channel": "web"}'
+    ts, last_id = sink.watermarks["transactions"]
+    assert ts.isoformat() == "2025-01-01T00:00:04+00:00"
+    assert last_id.endswith("000000000004")
+    assert sum(sink.offsets.values()) == 6
+    assert broker.committed == sink.offsets
+
+def test_failed_batch_is_replayed_after_restart():
+    broker, sink = MemoryBroker(), FakeSink()
+    broker.create_topic(TOPIC, partitions=2)
+    for i in range(4):
+        produce(broker, txn(i))
+    make_loader(broker, sink, max_records=2).run_once()
+    applied = dict(sink.offsets)
+
+    for i in range(4, 8):
+        produce(broker, txn(i))
+    sink.fail_next = True
+    with pytest.raises(RuntimeError):
+        make_loader(broker, sink).run_once()
+    assert sink.offsets == applied
+
+    # a fresh process resumes from the offsets stored with the staging rows
+    loader = make_loader(broker, sink)
+    while loader.run_once():
+        pass
+    assert len(sink.tables["transactions"]) == 8
+    assert sum(sink.offsets.values()) == 8
+
+def test_tombstones_and_deletes_only_advance_offsets():
+    broker, sink = MemoryBroker(), FakeSink()
+    produce(broker, txn(1))
+    broker.produce(TOPIC, None, key=b"x")
+    produce(broker, {**txn(2), "__deleted": "true"}, op="d")
+
+    batch = make_loader(broker, sink).run_once()
+
+    assert list(sink.tables["transactions"]) == ["00000000-0000-0000-0000-000000000001"]
+    assert batch.offsets == {(TOPIC, 0): 3}
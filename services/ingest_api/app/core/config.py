@@ -13,6 +13,11 @@ class Setting(BaseModel):
     oltp_db: str = os.getenv("OLTP_DB", "ledgercraft_oltp")
     oltp_port: int = int(os.getenv("OLTP_PORT", "5432"))
     oltp_host: str = os.getenv("OLTP_HOST", "localhost")
+
+    # Immutable transaction fields cached per process for GET /v1/transactions/{id}
+    # (0 disables the cache); status and settled_at are always read from the DB
+    txn_cache_ttl_seconds: float = float(os.getenv("TXN_CACHE_TTL_SECONDS", "0"))
+    txn_cache_max_entries: int = int(os.getenv("TXN_CACHE_MAX_ENTRIES", "10000"))
     
     @property
     def database_url(self) -> str:
@@ -0,0 +1,35 @@
+import hashlib
+import json
+from datetime import datetime
+from enum import Enum
+from fastapi import Response, status
+
+def _default(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, Enum):
+        return v.value
+    return str(v)   # UUID, Decimal
+
+def dumps(body: dict) -> bytes:
+    return json.dumps(body, default=_default, separators=(",", ":")).encode("utf-8")
+
+def make_etag(content: bytes) -> str:
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as RFC 9110 prescribes for If-None-Match
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+def conditional_response(body: dict, if_none_match: str | None) -> Response:
+    """JSON response with a content ETag; 304 without a body when the client's copy is current."""
+    content = dumps(body)
+    etag = make_etag(content)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -60,6 +60,8 @@ class Account(Base):
     transactions: Mapped[list["Transaction"]] = relationship(back_populates="account", cascade="all,delete")
 
 class Transaction(Base):
+    # Partitioned by created_at; the table's primary key is (id, created_at),
+    # id alone identifies a row for the ORM (kept unique by transaction_ids)
     __tablename__ = "transactions"
 
     id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
@@ -78,9 +80,18 @@ class Transaction(Base):
 
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
     settled_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    updated_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
 
     account: Mapped[Account] = relationship(back_populates="transactions")
 
+class AccountBalance(Base):
+    # Maintained by the trg_txns_balance_* triggers; read-only from the API
+    __tablename__ = "account_balances"
+    account_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    balance: Mapped[Decimal] = mapped_column(Numeric(20,6), nullable=False, server_default=text("0"))
+    settled_count: Mapped[int] = mapped_column(nullable=False, server_default=text("0"))
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("NOW()"))
+
 class Outbox(Base):
     __tablename__ = "outbox"
     id = mapped_column(PG_UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
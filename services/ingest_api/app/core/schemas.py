@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, field_validator
+from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
@@ -40,6 +41,10 @@ class CustomerOut(BaseModel):
     kyc_level: int
     risk_band: str
 
+class CustomerDetail(CustomerOut):
+    created_at: datetime
+    updated_at: datetime
+
 class AccountCreate(BaseModel):
     customer_id: UUID
     currency: str
@@ -66,6 +71,17 @@ class AccountOut(BaseModel):
     country: str
     status: AccountStatus
 
+class AccountDetail(AccountOut):
+    created_at: datetime
+    updated_at: datetime
+
+class BalanceOut(BaseModel):
+    account_id: UUID
+    currency: str
+    balance: Decimal
+    settled_count: int
+    updated_at: Optional[datetime] = None
+
 class TransactionCreate(BaseModel):
     account_id: UUID
     type: TransactionType
@@ -93,3 +109,17 @@ class TransactionCreate(BaseModel):
 class TransactionOut(BaseModel):
     id: UUID
     status: str
+
+class TransactionDetail(BaseModel):
+    id: UUID
+    account_id: UUID
+    type: TransactionType
+    status: str
+    amount: Decimal
+    currency: str
+    merchant_name: str
+    merchant_category: Optional[str] = None
+    description: Optional[str] = None
+    country: str
+    created_at: datetime
+    settled_at: Optional[datetime] = None
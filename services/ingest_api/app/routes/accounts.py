@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from decimal import Decimal
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from ..core.db import get_session
 from ..core import schemas
-from ..core.models import Account, Customer, AccountStatus
+from ..core.models import Account, AccountBalance, Customer, AccountStatus
 from ..core.errors import handle_integrity_error
+from ..core.etag import conditional_response
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
@@ -25,3 +29,29 @@ def create_account(payload: schemas.AccountCreate, session: Session = Depends(ge
         handle_integrity_error(e)
 
     return schemas.AccountOut(id=acc.id, customer_id=acc.customer_id, currency=acc.currency, country=acc.country, status=acc.status)
+
+@router.get("/{account_id}", response_model=schemas.AccountDetail)
+def get_account(
+    account_id: UUID,
+    session: Session = Depends(get_session),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+):
+    row = session.execute(
+        select(Account.id, Account.customer_id, Account.currency, Account.country, Account.status,
+               Account.created_at, Account.updated_at).where(Account.id == account_id)
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="account not found")
+    return conditional_response(row._asdict(), if_none_match)
+
+@router.get("/{account_id}/balance", response_model=schemas.BalanceOut)
+def get_balance(account_id: UUID, session: Session = Depends(get_session)):
+    acc = session.get(Account, account_id)
+    if not acc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="account not found")
+    # no row yet: nothing has settled on this account
+    bal = session.get(AccountBalance, account_id)
+    if not bal:
+        return schemas.BalanceOut(account_id=acc.id, currency=acc.currency, balance=Decimal("0"), settled_count=0)
+    return schemas.BalanceOut(account_id=acc.id, currency=acc.currency, balance=bal.balance,
+                              settled_count=bal.settled_count, updated_at=bal.updated_at)
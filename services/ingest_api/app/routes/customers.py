@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from ..core.db import get_session
 from ..core import schemas
 from ..core.models import Customer
 from ..core.errors import handle_integrity_error
+from ..core.etag import conditional_response
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(prefix="/v1/customers", tags=["customers"])
@@ -17,3 +20,17 @@ def create_customer(payload: schemas.CustomerCreate, session: Session = Depends(
     except IntegrityError as e:
         handle_integrity_error(e)
     return schemas.CustomerOut(id=c.id, email=c.email, country=c.country, kyc_level=c.kyc_level, risk_band=c.risk_band)
+
+@router.get("/{customer_id}", response_model=schemas.CustomerDetail)
+def get_customer(
+    customer_id: UUID,
+    session: Session = Depends(get_session),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+):
+    row = session.execute(
+        select(Customer.id, Customer.email, Customer.country, Customer.kyc_level, Customer.risk_band,
+               Customer.created_at, Customer.updated_at).where(Customer.id == customer_id)
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="customer not found")
+    return conditional_response(row._asdict(), if_none_match)
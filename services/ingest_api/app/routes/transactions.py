@@ -1,24 +1,40 @@
+from datetime import datetime, timezone
+from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Header
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import select
+from ..core.cache import TTLCache
+from ..core.config import settings
 from ..core.db import get_session
 from ..core import schemas
 from ..core.models import Transaction, Account, TransactionStatus, Outbox, Idempotency
 from ..core.errors import handle_integrity_error
+from ..core.etag import conditional_response
 from ..core.idem import canonical_request_hash
 
 router = APIRouter(prefix="/v1/transactions", tags=["transactions"])
 
 ENDPOINT_NAME = "POST /v1/transactions"
 
+# Fields fixed at creation; status and settled_at change on settlement
+IMMUTABLE_COLUMNS = (
+    Transaction.id, Transaction.account_id, Transaction.type, Transaction.amount, Transaction.currency,
+    Transaction.merchant_name, Transaction.merchant_category, Transaction.description, Transaction.country,
+    Transaction.created_at,
+)
+immutable_cache = TTLCache(settings.txn_cache_ttl_seconds, settings.txn_cache_max_entries)
+
 @router.post("", response_model=schemas.TransactionOut, status_code=201)
 def create_transaction(
     payload: schemas.TransactionCreate,
     session: Session = Depends(get_session),
-    idem_key: str | None = Header(default=None, alias="Idempotency-Key")
+    idem_key: str | None = Header(default=None, alias="Idempotency-Key"),
+    probe_id: str | None = Header(default=None, alias="X-Probe-Id", max_length=64),
 ):
+    # receipt time travels with the event (metadata and outbox) for latency tracing
+    received_at = datetime.now(timezone.utc)
     print("[TRANSACTION] _ POST PAYLOAD:" , payload)
     # --- Idempotency: require a key for write operations ---
     if not idem_key:
@@ -75,6 +91,9 @@ def create_transaction(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="currency mismatch with account")
 
     # --- Create Transaction ---
+    trace = {"received_at": received_at.isoformat()}
+    if probe_id:
+        trace["probe_id"] = probe_id
     txn = Transaction(
         account_id=payload.account_id,
         type=payload.type,
@@ -85,7 +104,7 @@ def create_transaction(
         merchant_category=payload.merchant_category,
         description=payload.description,
         country=payload.country,
-        metadata={}
+        extra_metadata=trace
     )
     session.add(txn)
     try:
@@ -109,7 +128,8 @@ def create_transaction(
             "merchant_name": txn.merchant_name,
             "merchant_category": txn.merchant_category,
             "country": txn.country,
-            "created_at": txn.created_at.isoformat()
+            "created_at": txn.created_at.isoformat(),
+            **trace
         }
     )
     session.add(evt)
@@ -124,3 +144,31 @@ def create_transaction(
     # The session context manager will commit here
     return response_body
 
+@router.get("/{transaction_id}", response_model=schemas.TransactionDetail)
+def get_transaction(
+    transaction_id: UUID,
+    session: Session = Depends(get_session),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+):
+    fixed = immutable_cache.get(transaction_id)
+    if fixed is None:
+        row = session.execute(
+            select(*IMMUTABLE_COLUMNS, Transaction.status, Transaction.settled_at)
+            .where(Transaction.id == transaction_id)
+        ).one_or_none()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="transaction not found")
+        *values, txn_status, settled_at = row
+        fixed = dict(zip((c.key for c in IMMUTABLE_COLUMNS), values))
+        immutable_cache.set(transaction_id, fixed)
+    else:
+        # created_at pins the partition: one index probe instead of one per partition
+        row = session.execute(
+            select(Transaction.status, Transaction.settled_at)
+            .where(Transaction.id == transaction_id, Transaction.created_at == fixed["created_at"])
+        ).one_or_none()
+        if row is None:
+            immutable_cache.pop(transaction_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="transaction not found")
+        txn_status, settled_at = row
+    return conditional_response({**fixed, "status": txn_status, "settled_at": settled_at}, if_none_match)
@@ -0,0 +1,53 @@
+from decimal import Decimal
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from services.ingest_api.app.main import app
+from services.ingest_api.app.core.db import SessionLocal
+
+client = TestClient(app)
+
+def set_status(tx_id: str, status: str):
+    with SessionLocal() as s:
+        s.execute(text("UPDATE transactions SET status = CAST(:st AS transaction_status), settled_at = NOW() WHERE id = :id"),
+                  {"st": status, "id": tx_id})
+        s.commit()
+
+def balance(acc_id: str) -> dict:
+    r = client.get(f"/v1/accounts/{acc_id}/balance")
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_balance_follows_settlement_and_reversal():
+    rc = client.post("/v1/customers", json={"email": f"balance+{uuid4()}@example.com", "country": "VN", "kyc_level": 1})
+    cust_id = rc.json()["id"]
+    ra = client.post("/v1/accounts", json={"customer_id": cust_id, "currency": "VND", "country": "VN"})
+    acc_id = ra.json()["id"]
+
+    def txn(type_: str, amount: str) -> str:
+        r = client.post("/v1/transactions", headers={"Idempotency-Key": str(uuid4())}, json={
+            "account_id": acc_id, "type": type_, "amount": amount, "currency": "VND",
+            "merchant_name": "Balance Test", "country": "VN",
+        })
+        assert r.status_code == 201, r.text
+        return r.json()["id"]
+
+    payment = txn("PAYMENT", "1000.00")
+    refund = txn("REFUND", "250.00")
+    # PENDING does not count
+    assert Decimal(balance(acc_id)["balance"]) == 0
+
+    set_status(payment, "SETTLED")
+    set_status(refund, "SETTLED")
+    body = balance(acc_id)
+    assert Decimal(body["balance"]) == Decimal("-750.00")
+    assert body["settled_count"] == 2
+
+    set_status(payment, "REVERSED")
+    body = balance(acc_id)
+    assert Decimal(body["balance"]) == Decimal("250.00")
+    assert body["settled_count"] == 1
+
+def test_balance_unknown_account():
+    r = client.get(f"/v1/accounts/{uuid4()}/balance")
+    assert r.status_code == 404
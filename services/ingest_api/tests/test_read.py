@@ -0,0 +1,47 @@
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from services.ingest_api.app.main import app
+from services.ingest_api.app.core.db import SessionLocal
+
+client = TestClient(app)
+
+def test_read_your_writes_with_etag():
+    rc = client.post("/v1/customers", json={"email": f"reader+{uuid4()}@example.com", "country": "VN", "kyc_level": 1})
+    cust_id = rc.json()["id"]
+    ra = client.post("/v1/accounts", json={"customer_id": cust_id, "currency": "VND", "country": "VN"})
+    acc_id = ra.json()["id"]
+    rt = client.post("/v1/transactions", headers={"Idempotency-Key": str(uuid4())}, json={
+        "account_id": acc_id, "type": "PAYMENT", "amount": "1000.00", "currency": "VND",
+        "merchant_name": "Reader", "country": "VN",
+    })
+    tx_id = rt.json()["id"]
+
+    r = client.get(f"/v1/customers/{cust_id}")
+    assert r.status_code == 200, r.text
+    assert r.json()["id"] == cust_id and r.json()["country"] == "VN"
+    r = client.get(f"/v1/accounts/{acc_id}")
+    assert r.status_code == 200, r.text
+    assert r.json()["customer_id"] == cust_id and r.json()["status"] == "ACTIVE"
+
+    r = client.get(f"/v1/transactions/{tx_id}")
+    assert r.status_code == 200, r.text
+    body, etag = r.json(), r.headers["ETag"]
+    assert body["account_id"] == acc_id and body["status"] == "PENDING" and body["settled_at"] is None
+
+    # unchanged: 304 without a body
+    r = client.get(f"/v1/transactions/{tx_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag and r.content == b""
+
+    # settled: new representation, new ETag
+    with SessionLocal() as s:
+        s.execute(text("UPDATE transactions SET status = 'SETTLED', settled_at = NOW() WHERE id = :id"), {"id": tx_id})
+        s.commit()
+    r = client.get(f"/v1/transactions/{tx_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["status"] == "SETTLED" and r.headers["ETag"] != etag
+
+def test_read_unknown_ids():
+    for path in ("customers", "accounts", "transactions"):
+        assert client.get(f"/v1/{path}/{uuid4()}").status_code == 404
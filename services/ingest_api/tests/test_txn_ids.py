@@ -0,0 +1,42 @@
+from uuid import uuid4
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from services.ingest_api.app.main import app
+from services.ingest_api.app.core.db import SessionLocal
+
+client = TestClient(app)
+
+def new_transaction() -> str:
+    rc = client.post("/v1/customers", json={"email": f"ids+{uuid4()}@example.com", "country": "VN", "kyc_level": 1})
+    ra = client.post("/v1/accounts", json={"customer_id": rc.json()["id"], "currency": "VND", "country": "VN"})
+    rt = client.post("/v1/transactions", headers={"Idempotency-Key": str(uuid4())}, json={
+        "account_id": ra.json()["id"], "type": "PAYMENT", "amount": "1000.00", "currency": "VND",
+        "merchant_name": "Ids", "country": "VN",
+    })
+    assert rt.status_code == 201, rt.text
+    return rt.json()["id"]
+
+def test_id_is_unique_across_partitions():
+    tx_id = new_transaction()
+    with SessionLocal() as s:
+        # same id, created_at months earlier: another partition, distinct (id, created_at)
+        with pytest.raises(IntegrityError):
+            s.execute(text("""
+                INSERT INTO transactions (id, account_id, type, status, amount, currency, merchant_name, country, created_at)
+                SELECT id, account_id, type, status, amount, currency, merchant_name, country, created_at - INTERVAL '3 months'
+                FROM transactions WHERE id = :id
+            """), {"id": tx_id})
+        s.rollback()
+        assert s.execute(text("SELECT COUNT(*) FROM transactions WHERE id = :id"), {"id": tx_id}).scalar() == 1
+
+def test_id_is_immutable_and_released_on_delete():
+    tx_id = new_transaction()
+    with SessionLocal() as s:
+        with pytest.raises(IntegrityError):
+            s.execute(text("UPDATE transactions SET id = :new WHERE id = :id"), {"new": str(uuid4()), "id": tx_id})
+        s.rollback()
+        s.execute(text("DELETE FROM transactions WHERE id = :id"), {"id": tx_id})
+        assert s.execute(text("SELECT COUNT(*) FROM transaction_ids WHERE id = :id"), {"id": tx_id}).scalar() == 0
+        s.rollback()
@@ -0,0 +1,63 @@
+"""
+Cold-tier reads over the Parquet archive of cur.fact_transactions.
+
+The fact_archive DAG writes one file per detached partition (a second one if
+the partition is detached again later) and lists it in manifest.json with
+min/max created_date and the currencies present. Queries
+first drop files by those statistics, then read only the needed columns with
+row-group filters, so a long-range aggregate touches just the overlapping
+files and row groups.
+"""
+import json
+import os
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+import pyarrow.parquet as pq
+
+ARCHIVE_DIR = os.getenv("FACT_ARCHIVE_DIR", "/app/warehouse/archive")
+
+def load_manifest(archive_dir: str = ARCHIVE_DIR) -> list[dict]:
+    path = os.path.join(archive_dir, "manifest.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+def files_for_range(files: list[dict], start: date, end: date,
+                    currencies: Optional[list[str]] = None) -> list[dict]:
+    """Files that can hold rows with created_date in [start, end) (and one of `currencies`)."""
+    out = []
+    for f in files:
+        if not f["rows"]:
+            continue
+        if date.fromisoformat(f["max_created_date"]) < start or date.fromisoformat(f["min_created_date"]) >= end:
+            continue
+        if currencies and not set(currencies) & set(f["currencies"]):
+            continue
+        out.append(f)
+    return out
+
+def daily_gmv(files: list[dict], start: date, end: date, currencies: Optional[list[str]] = None,
+              archive_dir: str = ARCHIVE_DIR) -> dict[tuple[date, str], tuple[int, Decimal]]:
+    """(created_date, currency) -> (tx_count, total_amount) over the given files."""
+    filters = [("created_date", ">=", start), ("created_date", "<", end)]
+    if currencies:
+        filters.append(("currency", "in", list(currencies)))
+    out: dict[tuple[date, str], list] = defaultdict(lambda: [0, Decimal(0)])
+    for f in files:
+        t = pq.read_table(
+            os.path.join(archive_dir, f["path"]),
+            columns=["created_date", "currency", "amount"],
+            filters=filters,
+        )
+        if not t.num_rows:
+            continue
+        agg = t.group_by(["created_date", "currency"]).aggregate([("amount", "count"), ("amount", "sum")])
+        for d, cur, n, total in zip(*(agg[c].to_pylist() for c in ("created_date", "currency", "amount_count", "amount_sum"))):
+            acc = out[(d, cur)]
+            acc[0] += n
+            acc[1] += total
+    return {k: (v[0], v[1]) for k, v in out.items()}
@@ -0,0 +1,22 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+# OLTP Postgres
+OLTP_USER = os.getenv("OLTP_USER", "app")
+OLTP_PASSWORD = os.getenv("OLTP_PASSWORD", "app_password")
+OLTP_DB = os.getenv("OLTP_DB", "ledgercraft_oltp")
+OLTP_PORT = int(os.getenv("OLTP_PORT", "5432"))
+OLTP_HOST = os.getenv("OLTP_HOST", "localhost")
+
+DATABASE_URL = f"postgresql://{OLTP_USER}:{OLTP_PASSWORD}@{OLTP_HOST}:{OLTP_PORT}/{OLTP_DB}"
+
+# Rows updated per transaction; each batch commits on its own so row locks are
+# held for one batch only
+SETTLE_BATCH_SIZE = int(os.getenv("SETTLE_BATCH_SIZE", "5000"))
+# A batch that waits longer than this for a lock gives up and is retried
+SETTLE_LOCK_TIMEOUT_MS = int(os.getenv("SETTLE_LOCK_TIMEOUT_MS", "2000"))
+SETTLE_MAX_RETRIES = int(os.getenv("SETTLE_MAX_RETRIES", "5"))
+# Pause between batches, leaves room for ingest on a busy primary
+SETTLE_BATCH_PAUSE_SECONDS = float(os.getenv("SETTLE_BATCH_PAUSE_SECONDS", "0"))
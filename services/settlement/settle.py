@@ -0,0 +1,343 @@
+"""
+Bulk settlement: apply an acquirer settlement file to OLTP transactions.
+
+The file is a CSV with a header; columns may come in any order:
+  transaction_id   required, UUID of the OLTP transaction
+  status           required, SETTLED | DECLINED | REVERSED | CHARGEBACK
+  event_at         required, timestamp of the settlement event
+  amount           optional, checked against the transaction when present
+  currency         optional, checked against the transaction when present
+Gzipped files (*.gz) are read as-is.
+
+Steps:
+  1. The file is streamed into a temp table with COPY, one text value per
+     line, then split into fields, typed and checked in SQL. A line that is
+     not well-formed CSV, has a different number of fields than the header or
+     holds a bad value is reported as invalid instead of aborting the load.
+     Quoted fields may not span lines.
+  2. Rows are classified against the current transaction in one join:
+     unmatched, mismatch (amount / currency), noop (already in that status),
+     invalid_transition, or apply. Valid transitions:
+       PENDING -> SETTLED | DECLINED
+       SETTLED -> REVERSED | CHARGEBACK
+  3. Rows to apply are updated in id order, SETTLE_BATCH_SIZE per
+     transaction, under lock_timeout: one UPDATE ... FROM plus the matching
+     TransactionStatusChanged outbox rows in the same statement. An UPDATE only
+     touches rows still in the status they were classified from; rows changed
+     in between are reported as conflict. A batch that times out on a lock is
+     rolled back and retried with backoff.
+  4. Every line that was not applied (or already applied) is written to the
+     exceptions report.
+
+A transaction listed more than once is applied in event_at order, one round
+per occurrence, so SETTLED then REVERSED in the same file works. settled_at is
+set to the event time of the last status applied. Event times are usually
+behind the staging merge load's watermark; the load picks the change up
+through transactions.updated_at, which the trg_txns_updated_at trigger sets to
+the time of the write. Re-running a file is harmless: rows already applied
+come out as noop. One run at a time (advisory lock).
+
+Run: python settle.py settlement_2025-03-01.csv [--report exceptions.csv]
+"""
+import argparse
+import csv
+import gzip
+import logging
+import time
+from typing import IO, Optional
+
+import psycopg
+from psycopg import errors
+
+import config
+
+log = logging.getLogger("settlement")
+
+COLUMNS = ("transaction_id", "status", "event_at", "amount", "currency")
+REQUIRED = ("transaction_id", "status", "event_at")
+TARGET_STATUSES = ("SETTLED", "DECLINED", "REVERSED", "CHARGEBACK")
+ADVISORY_LOCK_KEY = 0x5e771e   # one settlement run at a time
+COPY_CHUNK = 1 << 20
+
+SETUP_SQL = """
+CREATE TEMP TABLE settle_lines (
+  line_no         BIGINT GENERATED ALWAYS AS IDENTITY,
+  line            TEXT
+);
+CREATE TEMP TABLE settle_raw (
+  line_no         BIGINT PRIMARY KEY,
+  malformed       BOOLEAN NOT NULL,
+  transaction_id  TEXT,
+  status          TEXT,
+  event_at        TEXT,
+  amount          TEXT,
+  currency        TEXT
+);
+CREATE TEMP TABLE settle_rows (
+  line_no      BIGINT PRIMARY KEY,
+  tx_id        UUID,
+  status       transaction_status,
+  event_at     TIMESTAMPTZ,
+  amount       NUMERIC,
+  currency     TEXT,
+  round        INT,
+  from_status  transaction_status,
+  outcome      TEXT
+);
+CREATE TEMP TABLE settle_plan (
+  seq          BIGINT PRIMARY KEY,
+  line_no      BIGINT NOT NULL,
+  tx_id        UUID NOT NULL,
+  from_status  transaction_status NOT NULL,
+  status       transaction_status NOT NULL,
+  event_at     TIMESTAMPTZ NOT NULL
+);
+"""
+
+# Lines are copied whole: delimiter and quote are control characters that do
+# not occur in a settlement file. They are split here with the CSV field
+# grammar; a line that does not match it, or whose field count differs from
+# the header's, is kept as malformed. Blank lines are skipped.
+CSV_LINE_RE = r'^("([^"]|"")*"|[^,"]*)(,("([^"]|"")*"|[^,"]*))*$'
+CSV_FIELD_RE = r'(?:^|,)("(?:[^"]|"")*"|[^,"]*)'
+COPY_LINES_SQL = "COPY settle_lines (line) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\x1f', QUOTE E'\\x1e')"
+
+SPLIT_SQL = """
+INSERT INTO settle_raw (line_no, malformed, transaction_id, status, event_at, amount, currency)
+SELECT l.line_no, f.v IS NULL OR cardinality(f.v) <> %(width)s,
+       f.v[%(transaction_id)s::int], f.v[%(status)s::int], f.v[%(event_at)s::int],
+       f.v[%(amount)s::int], f.v[%(currency)s::int]
+FROM settle_lines l
+CROSS JOIN LATERAL (
+  SELECT array_agg(CASE WHEN left(m[1], 1) = '"' THEN replace(substr(m[1], 2, length(m[1]) - 2), '""', '"')
+                        ELSE m[1] END ORDER BY n) AS v
+  FROM regexp_matches(l.line, %(field_re)s, 'g') WITH ORDINALITY AS r(m, n)
+  WHERE l.line ~ %(line_re)s
+) f
+WHERE l.line IS NOT NULL AND l.line <> ''
+"""
+
+# Typed copy of the raw lines; anything malformed or that does not parse is
+# 'invalid'.
+# Valid rows get their round: the position of the line among the lines for the
+# same transaction, in event order.
+TYPE_SQL = """
+WITH checked AS (
+  SELECT line_no,
+         NOT malformed
+           AND pg_input_is_valid(trim(transaction_id), 'uuid')
+           AND upper(trim(status)) = ANY(%(statuses)s)
+           AND pg_input_is_valid(trim(event_at), 'timestamptz')
+           AND (NULLIF(trim(amount), '') IS NULL OR pg_input_is_valid(trim(amount), 'numeric'))
+           AS ok,
+         trim(transaction_id) AS transaction_id, upper(trim(status)) AS status, trim(event_at) AS event_at,
+         NULLIF(trim(amount), '') AS amount, NULLIF(upper(trim(currency)), '') AS currency
+  FROM settle_raw
+)
+INSERT INTO settle_rows (line_no, tx_id, status, event_at, amount, currency, round, outcome)
+SELECT line_no, tx_id, status, event_at, amount, currency,
+       CASE WHEN ok THEN row_number() OVER (PARTITION BY ok, tx_id ORDER BY event_at, line_no) END,
+       CASE WHEN ok THEN NULL ELSE 'invalid' END
+FROM (
+  SELECT line_no, ok,
+         CASE WHEN ok THEN transaction_id::uuid END AS tx_id,
+         CASE WHEN ok THEN status::transaction_status END AS status,
+         CASE WHEN ok THEN event_at::timestamptz END AS event_at,
+         CASE WHEN ok THEN amount::numeric END AS amount,
+         currency
+  FROM checked
+) t
+"""
+
+CLASSIFY_SQL = """
+UPDATE settle_rows r
+SET from_status = c.from_status, outcome = c.outcome
+FROM (
+  SELECT r.line_no, t.status AS from_status,
+         CASE
+           WHEN t.id IS NULL THEN 'unmatched'
+           WHEN (r.amount IS NOT NULL AND r.amount <> t.amount)
+             OR (r.currency IS NOT NULL AND r.currency <> t.currency) THEN 'mismatch'
+           WHEN t.status = r.status THEN 'noop'
+           WHEN (t.status = 'PENDING' AND r.status IN ('SETTLED','DECLINED'))
+             OR (t.status = 'SETTLED' AND r.status IN ('REVERSED','CHARGEBACK')) THEN 'apply'
+           ELSE 'invalid_transition'
+         END AS outcome
+  FROM settle_rows r
+  LEFT JOIN transactions t ON t.id = r.tx_id
+  WHERE r.round = %(round)s AND r.outcome IS NULL
+) c
+WHERE r.line_no = c.line_no
+"""
+
+PLAN_SQL = """
+INSERT INTO settle_plan (seq, line_no, tx_id, from_status, status, event_at)
+SELECT row_number() OVER (ORDER BY tx_id), line_no, tx_id, from_status, status, event_at
+FROM settle_rows
+WHERE round = %(round)s AND outcome = 'apply'
+"""
+
+# One statement per batch: status update, outbox events, bookkeeping
+APPLY_BATCH_SQL = """
+WITH upd AS (
+  UPDATE transactions t
+  SET status = p.status, settled_at = p.event_at
+  FROM settle_plan p
+  WHERE p.seq > %(lo)s AND p.seq <= %(hi)s
+    AND t.id = p.tx_id
+    AND t.status = p.from_status
+  RETURNING t.id, t.account_id, t.type, t.status, t.amount, t.currency, t.settled_at,
+            p.from_status, p.line_no
+), evt AS (
+  INSERT INTO outbox (aggregate_type, aggregate_id, event_type, payload_json)
+  SELECT 'transaction', id, 'TransactionStatusChanged',
+         jsonb_build_object(
+           'id', id, 'account_id', account_id, 'type', type,
+           'from_status', from_status, 'status', status,
+           'amount', amount::text, 'currency', currency, 'settled_at', settled_at,
+           'source', 'settlement_file', 'file', %(file)s::text
+         )
+  FROM upd
+)
+UPDATE settle_rows r SET outcome = 'applied'
+FROM upd
+WHERE r.line_no = upd.line_no
+"""
+
+EXCEPTIONS_SQL = """
+SELECT s.line_no, w.transaction_id, w.status, w.event_at, w.amount, w.currency,
+       s.outcome, s.from_status::text, t.status::text
+FROM settle_rows s
+JOIN settle_raw w USING (line_no)
+LEFT JOIN transactions t ON t.id = s.tx_id
+WHERE s.outcome NOT IN ('applied', 'noop')
+ORDER BY s.line_no
+"""
+
+def open_file(path: str) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def parse_header(line: bytes) -> list[str]:
+    """Column list for COPY from the file's header line."""
+    header = [c.strip().lower() for c in next(csv.reader([line.decode("utf-8-sig")]))]
+    unknown = [c for c in header if c not in COLUMNS]
+    missing = [c for c in REQUIRED if c not in header]
+    if unknown or missing or len(set(header)) != len(header):
+        raise ValueError(f"bad settlement header {header}: unknown={unknown} missing={missing}")
+    return header
+
+def batch_bounds(total: int, size: int) -> list[tuple[int, int]]:
+    """(lo, hi] ranges over plan seq 1..total."""
+    return [(lo, min(lo + size, total)) for lo in range(0, total, size)]
+
+def load_file(conn: psycopg.Connection, path: str) -> int:
+    with open_file(path) as f:
+        columns = parse_header(f.readline())
+        with conn.cursor() as cur:
+            cur.execute(SETUP_SQL)
+            with cur.copy(COPY_LINES_SQL) as copy:
+                while chunk := f.read(COPY_CHUNK):
+                    copy.write(chunk)
+            cur.execute(SPLIT_SQL, {
+                "width": len(columns), "line_re": CSV_LINE_RE, "field_re": CSV_FIELD_RE,
+                **{c: columns.index(c) + 1 if c in columns else None for c in COLUMNS},
+            })
+            cur.execute("DROP TABLE settle_lines")
+            cur.execute(TYPE_SQL, {"statuses": list(TARGET_STATUSES)})
+            cur.execute("ANALYZE settle_rows")
+            cur.execute("SELECT COUNT(*) FROM settle_rows")
+            (lines,) = cur.fetchone()
+    conn.commit()
+    return lines
+
+def apply_batch(conn: psycopg.Connection, lo: int, hi: int, file: str) -> int:
+    for attempt in range(config.SETTLE_MAX_RETRIES + 1):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL lock_timeout = {int(config.SETTLE_LOCK_TIMEOUT_MS)}")
+                cur.execute(APPLY_BATCH_SQL, {"lo": lo, "hi": hi, "file": file})
+                applied = cur.rowcount
+            conn.commit()
+            return applied
+        except errors.LockNotAvailable:
+            conn.rollback()
+            if attempt == config.SETTLE_MAX_RETRIES:
+                raise
+            wait = min(30.0, 0.5 * 2 ** attempt)
+            log.warning("batch (%s, %s] lock timeout, retry %s in %.1fs", lo, hi, attempt + 1, wait)
+            time.sleep(wait)
+    return 0
+
+def apply_round(conn: psycopg.Connection, rnd: int, file: str) -> int:
+    with conn.cursor() as cur:
+        cur.execute(CLASSIFY_SQL, {"round": rnd})
+        cur.execute("TRUNCATE settle_plan")
+        cur.execute(PLAN_SQL, {"round": rnd})
+        total = cur.rowcount
+    conn.commit()
+
+    applied = 0
+    for lo, hi in batch_bounds(total, config.SETTLE_BATCH_SIZE):
+        applied += apply_batch(conn, lo, hi, file)
+        if config.SETTLE_BATCH_PAUSE_SECONDS:
+            time.sleep(config.SETTLE_BATCH_PAUSE_SECONDS)
+
+    with conn.cursor() as cur:
+        # classified as apply, but the transaction moved before its batch ran
+        cur.execute("UPDATE settle_rows SET outcome = 'conflict' WHERE round = %s AND outcome = 'apply'", (rnd,))
+    conn.commit()
+    log.info("round %s: %s planned, %s applied", rnd, total, applied)
+    return applied
+
+def write_report(conn: psycopg.Connection, path: str) -> int:
+    with conn.cursor() as cur, open(path, "w", newline="", encoding="utf-8") as out:
+        cur.execute(EXCEPTIONS_SQL)
+        w = csv.writer(out)
+        w.writerow(["line_no", *COLUMNS, "outcome", "classified_status", "current_status"])
+        n = 0
+        for row in cur:
+            w.writerow(row)
+            n += 1
+    return n
+
+def settle(path: str, report: Optional[str] = None, dsn: str = config.DATABASE_URL) -> dict:
+    report = report or f"{path}.exceptions.csv"
+    started = time.monotonic()
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                raise RuntimeError("another settlement run holds the lock")
+        conn.commit()
+
+        lines = load_file(conn, path)
+        log.info("loaded %s lines from %s in %.1fs", lines, path, time.monotonic() - started)
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(round), 0) FROM settle_rows")
+            (rounds,) = cur.fetchone()
+        conn.commit()
+        for rnd in range(1, rounds + 1):
+            apply_round(conn, rnd, path)
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT outcome, COUNT(*) FROM settle_rows GROUP BY outcome ORDER BY outcome")
+            counts = dict(cur.fetchall())
+        exceptions = write_report(conn, report)
+        conn.commit()
+
+    summary = {"file": path, "lines": lines, "outcomes": counts, "exceptions": exceptions,
+               "report": report, "seconds": round(time.monotonic() - started, 1)}
+    log.info("settlement done: %s", summary)
+    return summary
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("file", help="settlement CSV (optionally .gz)")
+    ap.add_argument("--report", default=None, help="exceptions CSV (default: <file>.exceptions.csv)")
+    args = ap.parse_args()
+    settle(args.file, args.report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from settle import batch_bounds, parse_header  # noqa: E402
+
+def test_header_any_order_and_case():
+    assert parse_header(b"\xef\xbb\xbfStatus,transaction_id, event_at ,amount\r\n") == \
+        ["status", "transaction_id", "event_at", "amount"]
+
+@pytest.mark.parametrize("line", [
+    b"transaction_id,status\n",                       # event_at missing
+    b"transaction_id,status,event_at,fee\n",          # unknown column
+    b"transaction_id,status,event_at,status\n",       # duplicate
+])
+def test_header_rejected(line):
+    with pytest.raises(ValueError):
+        parse_header(line)
+
+def test_batch_bounds_cover_plan_once():
+    assert batch_bounds(0, 5000) == []
+    assert batch_bounds(12, 5) == [(0, 5), (5, 10), (10, 12)]
+    assert batch_bounds(10, 5) == [(0, 5), (5, 10)]
@@ -0,0 +1,137 @@
+"""Settlement runs against the OLTP database (skipped when it is not reachable)."""
+import csv
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import psycopg
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import config  # noqa: E402
+import settle  # noqa: E402
+
+@pytest.fixture(scope="module")
+def db():
+    try:
+        conn = psycopg.connect(config.DATABASE_URL, autocommit=True)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"OLTP database not reachable: {e}")
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def account(db):
+    (cust,) = db.execute(
+        "INSERT INTO customers (email, country) VALUES (%s, 'VN') RETURNING id", (f"settle+{uuid4()}@example.com",)
+    ).fetchone()
+    (acc,) = db.execute("INSERT INTO accounts (customer_id, currency) VALUES (%s, 'VND') RETURNING id", (cust,)).fetchone()
+    return acc
+
+def add_txn(db, account, status="PENDING", amount="100000.00") -> str:
+    (tx,) = db.execute(
+        """
+        INSERT INTO transactions (account_id, type, status, amount, currency, merchant_name, country)
+        VALUES (%s, 'PAYMENT', %s, %s, 'VND', 'Settlement Test', 'VN') RETURNING id
+        """,
+        (account, status, amount),
+    ).fetchone()
+    return str(tx)
+
+def status_of(db, tx):
+    return db.execute("SELECT status::text, settled_at, updated_at FROM transactions WHERE id = %s", (tx,)).fetchone()
+
+def write_file(tmp_path, rows, raw_lines=()) -> str:
+    path = str(tmp_path / "settlement.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["transaction_id", "status", "event_at", "amount"])
+        w.writerows(rows)
+        f.writelines(line + "\r\n" for line in raw_lines)
+    return path
+
+def test_outcomes_rounds_and_outbox(db, account, tmp_path):
+    t0 = datetime(2025, 3, 1, 8, tzinfo=timezone.utc)
+    a, b, c, d = (add_txn(db, account) for _ in range(4))
+    settled = add_txn(db, account, status="SETTLED")
+    path = write_file(tmp_path, [
+        [a, "REVERSED", (t0 + timedelta(hours=2)).isoformat(), ""],   # second round for a
+        [a, "SETTLED", t0.isoformat(), "100000"],
+        [b, "SETTLED", t0.isoformat(), "99999"],                        # mismatch
+        [c, "DECLINED", t0.isoformat(), ""],
+        [d, "CHARGEBACK", t0.isoformat(), ""],                          # PENDING -> CHARGEBACK
+        [settled, "SETTLED", t0.isoformat(), ""],                       # noop
+        [str(uuid4()), "SETTLED", t0.isoformat(), ""],                  # unmatched
+        ["not-a-uuid", "SETTLED", t0.isoformat(), ""],                  # invalid
+    ], raw_lines=[
+        f"{uuid4()},SETTLED",                                           # too few fields: invalid
+        f'{uuid4()},SETTLED,"{t0.isoformat()},',                        # unbalanced quote: invalid
+    ])
+    report = str(tmp_path / "exceptions.csv")
+
+    summary = settle.settle(path, report, dsn=config.DATABASE_URL)
+
+    assert summary["outcomes"] == {"applied": 3, "invalid": 3, "invalid_transition": 1,
+                                   "mismatch": 1, "noop": 1, "unmatched": 1}
+    assert status_of(db, a)[:2] == ("REVERSED", t0 + timedelta(hours=2))
+    assert status_of(db, b)[0] == "PENDING"
+    assert status_of(db, c)[:2] == ("DECLINED", t0)
+    assert status_of(db, d)[0] == "PENDING"
+
+    events = db.execute(
+        """
+        SELECT payload_json->>'from_status', payload_json->>'status', payload_json->>'source'
+        FROM outbox WHERE aggregate_id = %s AND event_type = 'TransactionStatusChanged'
+        ORDER BY created_at
+        """,
+        (a,),
+    ).fetchall()
+    assert events == [("PENDING", "SETTLED", "settlement_file"), ("SETTLED", "REVERSED", "settlement_file")]
+
+    with open(report, newline="", encoding="utf-8") as f:
+        outcomes = sorted(r["outcome"] for r in csv.DictReader(f))
+    assert outcomes == ["invalid"] * 3 + ["invalid_transition", "mismatch", "unmatched"]
+
+    # re-running the file applies nothing new
+    again = settle.settle(path, report, dsn=config.DATABASE_URL)
+    assert "applied" not in again["outcomes"]
+
+def test_row_changed_after_classification_is_a_conflict(db, account, tmp_path, monkeypatch):
+    tx = add_txn(db, account)
+    path = write_file(tmp_path, [[tx, "SETTLED", datetime.now(timezone.utc).isoformat(), ""]])
+    apply_batch = settle.apply_batch
+
+    def declined_meanwhile(conn, lo, hi, file):
+        db.execute("UPDATE transactions SET status = 'DECLINED' WHERE id = %s", (tx,))
+        return apply_batch(conn, lo, hi, file)
+
+    monkeypatch.setattr(settle, "apply_batch", declined_meanwhile)
+    summary = settle.settle(path, str(tmp_path / "exceptions.csv"), dsn=config.DATABASE_URL)
+
+    assert summary["outcomes"] == {"conflict": 1}
+    assert status_of(db, tx)[0] == "DECLINED"
+    assert not db.execute(
+        "SELECT 1 FROM outbox WHERE aggregate_id = %s AND event_type = 'TransactionStatusChanged'", (tx,)
+    ).fetchone()
+
+def test_old_event_time_is_seen_by_the_merge_load(db, account, tmp_path):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "pipelines", "airflow", "dags"))
+    oltp_to_stg = pytest.importorskip("oltp_to_stg")   # needs airflow
+    change_col = oltp_to_stg.CHANGE_COLUMNS["transactions"]
+
+    tx = add_txn(db, account)
+    # the merge load has scanned everything up to now
+    (watermark,) = db.execute("SELECT NOW()").fetchone()
+    event_at = watermark - timedelta(days=2)
+    settle.settle(write_file(tmp_path, [[tx, "SETTLED", event_at.isoformat(), ""]]),
+                  str(tmp_path / "exceptions.csv"), dsn=config.DATABASE_URL)
+
+    status, settled_at, updated_at = status_of(db, tx)
+    assert (status, settled_at) == ("SETTLED", event_at)
+    assert updated_at >= watermark
+    # the keyset predicate of the next merge run (copy_keyset_batch)
+    assert db.execute(
+        f"SELECT 1 FROM transactions WHERE ({change_col}, id) > (%s, %s::uuid) AND id = %s",
+        (watermark, "00000000-0000-0000-0000-000000000000", tx),
+    ).fetchone()
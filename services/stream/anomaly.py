@@ -0,0 +1,203 @@
+"""
+Per-account amount anomaly rule (AMOUNT_ANOMALY).
+
+Each account keeps exponentially weighted mean and variance of log1p(amount)
+(amounts are roughly log-normal) in a three-field record. An event is scored
+against the account's statistics before they are updated with it:
+
+  z = (log1p(amount) - mean) / max(std, ANOMALY_MIN_STD)
+
+and flagged when z >= ANOMALY_Z_THRESHOLD, only upward (unusually large
+amounts) and only once the account has seen ANOMALY_WARMUP_EVENTS events. The
+update weight is max(1/n, ANOMALY_ALPHA): exact Welford mean / variance for
+the first 1/alpha events, exponential decay after that, so the statistics
+follow an account whose spending drifts. Per event this is a dict lookup and a
+handful of float operations.
+
+Statistics are partitioned like the velocity windows (state.py) and persisted
+per account in OLTP stream_amount_stats: changed accounts are saved by the
+checkpoint timer and on revocation, a partition's accounts are loaded on
+assignment. An account first seen by this worker is scored as warming up and
+looked up in the store in the background (rows written elsewhere, or seeded by
+bootstrap_amount_stats.py from stg.transactions); what is found is merged in,
+so established accounts are scored from their history within a second.
+"""
+import math
+import uuid
+from typing import Iterable, Optional, Protocol
+
+from state import PartitionedWindows
+from velocity import NAMESPACE
+from windows import floor_window
+
+# (n, mean, var)
+StatsRow = tuple[int, float, float]
+
+class AmountStats:
+    __slots__ = ("n", "mean", "var")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, var: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.var = var
+
+    def score(self, x: float, min_std: float) -> float:
+        return (x - self.mean) / max(math.sqrt(self.var), min_std)
+
+    def update(self, x: float, alpha: float) -> None:
+        self.n += 1
+        w = max(1.0 / self.n, alpha)
+        diff = x - self.mean
+        incr = w * diff
+        self.mean += incr
+        self.var = (1.0 - w) * (self.var + diff * incr)
+
+    def merge(self, n: int, mean: float, var: float) -> None:
+        """Combine with statistics of other events (Chan et al. parallel update)."""
+        total = self.n + n
+        if not n or not total:
+            return
+        delta = self.mean - mean
+        self.var = (var * n + self.var * self.n + delta * delta * n * self.n / total) / total
+        self.mean = mean + delta * self.n / total
+        self.n = total
+
+    def row(self) -> StatsRow:
+        return (self.n, self.mean, self.var)
+
+class StatsStore(Protocol):
+    def load_partitions(self, topic: str, partitions: list[int]) -> dict[int, dict[str, StatsRow]]: ...
+    def load_accounts(self, accounts: list[str]) -> dict[str, StatsRow]: ...
+    def save(self, topic: str, rows: list[tuple[str, int, int, float, float]]) -> None: ...
+
+class MemoryStatsStore:
+    def __init__(self):
+        self.data: dict[str, tuple[Optional[str], Optional[int], StatsRow]] = {}
+
+    def load_partitions(self, topic, partitions):
+        out: dict[int, dict[str, StatsRow]] = {}
+        for account, (t, p, row) in self.data.items():
+            if t == topic and p in partitions:
+                out.setdefault(p, {})[account] = row
+        return out
+
+    def load_accounts(self, accounts):
+        return {a: self.data[a][2] for a in accounts if a in self.data}
+
+    def save(self, topic, rows):
+        for account, p, n, mean, var in rows:
+            self.data[account] = (topic, p, (n, mean, var))
+
+class AmountAnomalyDetector:
+    def __init__(self, store: StatsStore, topic: str, alpha: float, warmup: int, z_threshold: float,
+                 min_std: float, windows: Optional[PartitionedWindows] = None, window_seconds: int = 300):
+        self.store = store
+        self.topic = topic
+        self.alpha = alpha
+        self.warmup = warmup
+        self.z_threshold = z_threshold
+        self.min_std = min_std
+        self.windows = windows
+        self.window_seconds = window_seconds
+        self.partitions: dict[int, dict[str, AmountStats]] = {}
+        self.dirty: dict[int, set[str]] = {}
+        self.pending: dict[str, int] = {}     # account -> partition, waiting for a store lookup
+
+    # ----- per event -----
+
+    def process(self, partition: int, v: dict, created_at) -> Optional[dict]:
+        account_id = v.get("account_id")
+        if not account_id:
+            return None
+        try:
+            x = math.log1p(float(v.get("amount")))
+        except (TypeError, ValueError):
+            return None
+        key = str(account_id)
+        accounts = self.partitions.setdefault(partition, {})
+        stats = accounts.get(key)
+        if stats is None:
+            stats = accounts[key] = AmountStats()
+            self.pending[key] = partition
+        z = stats.score(x, self.min_std) if stats.n >= self.warmup else None
+        stats.update(x, self.alpha)
+        self.dirty.setdefault(partition, set()).add(key)
+        if z is None or z < self.z_threshold:
+            return None
+
+        w_start, w_end = floor_window(created_at, self.window_seconds)
+        dq = self.windows.partitions.get(partition, {}).get(key) if self.windows else None
+        tx_id = v.get("id")
+        return {
+            "event_id": uuid.uuid5(NAMESPACE, f"{account_id}:{tx_id}:AMOUNT_ANOMALY"),
+            "account_id": account_id,
+            "window_start": w_start,
+            "window_end": w_end,
+            "count_5m": len(dq) if dq else 1,
+            "sum_5m": sum(a for _, a in dq) if dq else v.get("amount"),
+            "reason": "AMOUNT_ANOMALY",
+            "trigger_tx_id": tx_id,
+            "score": round(z, 4),
+        }
+
+    # ----- background: store lookups and checkpoints -----
+
+    def take_pending(self) -> list[str]:
+        accounts, self.pending = list(self.pending), {}
+        return accounts
+
+    def resolve(self, found: dict[str, StatsRow]) -> None:
+        """Merge stored statistics of newly seen accounts (from load_accounts)."""
+        for account, (n, mean, var) in found.items():
+            for p, accounts in self.partitions.items():
+                stats = accounts.get(account)
+                if stats is not None:
+                    stats.merge(n, mean, var)
+                    self.dirty.setdefault(p, set()).add(account)
+                    break
+
+    def unowned(self, partitions: Iterable[int]) -> list[int]:
+        return sorted(set(partitions) - self.partitions.keys())
+
+    def install(self, partitions: list[int], loaded: dict[int, dict[str, StatsRow]]) -> None:
+        for p in partitions:
+            self.partitions[p] = {a: AmountStats(*row) for a, row in loaded.get(p, {}).items()}
+
+    def snapshot(self, partitions: Optional[Iterable[int]] = None) -> list[tuple[str, int, int, float, float]]:
+        """Rows of the accounts changed since the last snapshot (of `partitions`, default all)."""
+        parts = list(self.dirty) if partitions is None else [p for p in partitions if p in self.dirty]
+        rows = []
+        for p in parts:
+            accounts = self.partitions.get(p, {})
+            rows.extend((a, p, *accounts[a].row()) for a in self.dirty.pop(p) if a in accounts)
+        return rows
+
+    def release(self, partitions: Iterable[int]) -> list[tuple[str, int, int, float, float]]:
+        gone = sorted(set(partitions) & self.partitions.keys())
+        rows = self.snapshot(gone)
+        for p in gone:
+            for a in self.partitions.pop(p):
+                self.pending.pop(a, None)
+        return rows
+
+    def save(self, rows: list[tuple[str, int, int, float, float]]) -> None:
+        if rows:
+            self.store.save(self.topic, rows)
+
+    # synchronous conveniences (tests, tools)
+
+    def assign(self, partitions: Iterable[int]) -> list[int]:
+        new = self.unowned(partitions)
+        self.install(new, self.store.load_partitions(self.topic, new) if new else {})
+        return new
+
+    def revoke(self, partitions: Iterable[int]) -> None:
+        self.save(self.release(partitions))
+
+    def checkpoint(self) -> int:
+        pending = self.take_pending()
+        if pending:
+            self.resolve(self.store.load_accounts(pending))
+        rows = self.snapshot()
+        self.save(rows)
+        return len(rows)
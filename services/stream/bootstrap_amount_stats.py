@@ -0,0 +1,59 @@
+"""
+Seed OLTP stream_amount_stats from the warehouse, so accounts with history are
+scored from their first event after the anomaly rule is deployed instead of
+warming up again.
+
+Per account: count, mean and population variance of log1p(amount) over the
+last --days of stg.transactions, the same statistics the stream keeps (see
+anomaly.py). Rows are written with no partition (the stream looks them up by
+account) and never overwrite statistics the stream has already written.
+
+Usage:
+  python bootstrap_amount_stats.py --days 90
+"""
+import argparse
+import logging
+
+import psycopg
+
+from config import DATABASE_URL, DWH_DSN
+
+log = logging.getLogger("lc-stream")
+
+BATCH = 5000
+
+STATS_SQL = """
+SELECT account_id::text, COUNT(*), AVG(ln(1 + amount::float8)), VAR_POP(ln(1 + amount::float8))
+FROM stg.transactions
+WHERE created_at >= NOW() - make_interval(days => %s) AND amount > 0
+GROUP BY account_id
+"""
+
+INSERT_SQL = """
+INSERT INTO stream_amount_stats (account_id, topic, partition, n, mean, var, updated_at)
+VALUES (%s, %s, NULL, %s, %s, %s, NOW())
+ON CONFLICT (account_id) DO NOTHING
+"""
+
+def bootstrap(days: int, topic: str) -> int:
+    written = 0
+    with psycopg.connect(DWH_DSN) as dwh, psycopg.connect(DATABASE_URL) as oltp:
+        with dwh.cursor(name="amount_stats") as src, oltp.cursor() as dst:
+            src.execute(STATS_SQL, (days,))
+            while rows := src.fetchmany(BATCH):
+                dst.executemany(INSERT_SQL, [(a, topic, n, mean, var or 0.0) for a, n, mean, var in rows])
+                written += len(rows)
+        oltp.commit()
+    return written
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--days", type=int, default=90, help="history to summarise (default 90)")
+    ap.add_argument("--topic", default="txn.public.transactions")
+    args = ap.parse_args()
+    n = bootstrap(args.days, args.topic)
+    log.info(f"amount statistics seeded for {n} accounts (existing rows kept)")
+
+if __name__ == "__main__":
+    main()
@@ -20,3 +20,25 @@ WINDOW_SECONDS = int(os.getenv("VELOCITY_WINDOW_SECONDS", "300"))              #
 COUNT_THRESHOLD = int(os.getenv("VELOCITY_COUNT_THRESHOLD", "5"))
 SUM_THRESHOLD_VND = Decimal(os.getenv("VELOCITY_SUM_THRESHOLD_VND", "2000000"))
 SUM_THRESHOLD_USD = Decimal(os.getenv("VELOCITY_SUM_THRESHOLD_USD", "100"))
+
+# Window state handoff between workers (see state.py): "postgres" keeps
+# checkpoints in OLTP stream_window_state, "memory" is single-worker only
+STATE_STORE = os.getenv("STREAM_STATE_STORE", "postgres")
+STATE_CHECKPOINT_SECONDS = float(os.getenv("STREAM_STATE_CHECKPOINT_SECONDS", "10"))
+
+# Amount anomaly rule (see anomaly.py)
+ANOMALY_ENABLED = os.getenv("ANOMALY_ENABLED", "true").lower() == "true"
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))                  # decay weight once warmed up
+ANOMALY_WARMUP_EVENTS = int(os.getenv("ANOMALY_WARMUP_EVENTS", "20"))
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4.0"))
+ANOMALY_MIN_STD = float(os.getenv("ANOMALY_MIN_STD", "0.25"))              # in log1p(amount) units
+ANOMALY_LOOKUP_SECONDS = float(os.getenv("ANOMALY_LOOKUP_SECONDS", "1.0"))
+
+# DWH Postgres (bootstrap_amount_stats.py reads stg.transactions)
+DWH_USER = os.getenv("DWH_USER", "warehouse")
+DWH_PASSWORD = os.getenv("DWH_PASSWORD", "warehouse_password")
+DWH_DB = os.getenv("DWH_DB", "ledgercraft_dwh")
+DWH_PORT = int(os.getenv("DWH_PORT", "5432"))
+DWH_HOST = os.getenv("DWH_HOST", "dwh-postgres")
+
+DWH_DSN = f"postgresql://{DWH_USER}:{DWH_PASSWORD}@{DWH_HOST}:{DWH_PORT}/{DWH_DB}"
@@ -1,4 +1,5 @@
 import psycopg
+from psycopg.types.json import Jsonb
 from typing import Any
 from config import DATABASE_URL
 
@@ -13,14 +14,77 @@ def conn():
 def upsert_risk_flag(row: dict[str, Any]) -> None:
     """
     INSERT risk flag; use ON CONFLICT DO NOTHING for idempotency.
-    row keys: event_id, account_id, window_start, window_end, count_5m, sum_5m, reason
+    row keys: event_id, account_id, window_start, window_end, count_5m, sum_5m, reason,
+              trigger_tx_id, event_committed_at (OLTP commit of the triggering transaction),
+              score (AMOUNT_ANOMALY only)
     """
+    row = {"score": None, **row}
     with conn().cursor() as cur:
         cur.execute(
             """
-            INSERT INTO risk_flags (event_id, account_id, window_start, window_end, count_5m, sum_5m, reason)
-            VALUES (%(event_id)s, %(account_id)s, %(window_start)s, %(window_end)s, %(count_5m)s, %(sum_5m)s, %(reason)s)
+            INSERT INTO risk_flags (event_id, account_id, window_start, window_end, count_5m, sum_5m, reason,
+                                    trigger_tx_id, event_committed_at, score)
+            VALUES (%(event_id)s, %(account_id)s, %(window_start)s, %(window_end)s, %(count_5m)s, %(sum_5m)s, %(reason)s,
+                    %(trigger_tx_id)s, %(event_committed_at)s, %(score)s)
             ON CONFLICT (event_id) DO NOTHING
             """,
             row
         )
+
+class PostgresStateStore:
+    """Window state checkpoints in stream_window_state, one row per topic partition."""
+
+    def load(self, topic: str, partitions: list[int]) -> dict[int, dict]:
+        with conn().cursor() as cur:
+            cur.execute(
+                "SELECT partition, state FROM stream_window_state WHERE topic = %s AND partition = ANY(%s)",
+                (topic, partitions),
+            )
+            return dict(cur.fetchall())
+
+    def save(self, topic: str, partition: int, state: dict) -> None:
+        with conn().cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO stream_window_state (topic, partition, state, updated_at)
+                VALUES (%s, %s, %s, NOW())
+                ON CONFLICT (topic, partition) DO UPDATE SET state = EXCLUDED.state, updated_at = NOW()
+                """,
+                (topic, partition, Jsonb(state)),
+            )
+
+class PostgresStatsStore:
+    """Amount statistics in stream_amount_stats, one row per account."""
+
+    def load_partitions(self, topic: str, partitions: list[int]) -> dict[int, dict]:
+        out: dict[int, dict] = {}
+        with conn().cursor() as cur:
+            cur.execute(
+                "SELECT partition, account_id::text, n, mean, var FROM stream_amount_stats "
+                "WHERE topic = %s AND partition = ANY(%s)",
+                (topic, partitions),
+            )
+            for p, account, n, mean, var in cur:
+                out.setdefault(p, {})[account] = (n, mean, var)
+        return out
+
+    def load_accounts(self, accounts: list[str]) -> dict[str, tuple]:
+        with conn().cursor() as cur:
+            cur.execute(
+                "SELECT account_id::text, n, mean, var FROM stream_amount_stats WHERE account_id = ANY(%s::uuid[])",
+                (accounts,),
+            )
+            return {account: (n, mean, var) for account, n, mean, var in cur}
+
+    def save(self, topic: str, rows: list[tuple]) -> None:
+        with conn().cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO stream_amount_stats (account_id, topic, partition, n, mean, var, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (account_id) DO UPDATE
+                  SET topic = EXCLUDED.topic, partition = EXCLUDED.partition,
+                      n = EXCLUDED.n, mean = EXCLUDED.mean, var = EXCLUDED.var, updated_at = NOW()
+                """,
+                [(account, topic, p, n, mean, var) for account, p, n, mean, var in rows],
+            )
@@ -0,0 +1,62 @@
+"""
+Parsing helpers for Debezium transaction events (no Faust dependency, so they
+can be benchmarked and tested on their own).
+"""
+import json
+from datetime import datetime, timezone
+
+def parse_dt(s: str | None) -> datetime:
+    if not s:
+        return datetime.now(timezone.utc)
+    # Debezium uses ISO with Z; Python expects +00:00
+    return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+def loads(value_bytes):
+    try:
+        return json.loads(value_bytes)
+    except Exception:
+        # In case value is bytes-like already convertible
+        return None
+
+def get_header(event, name: str) -> str | None:
+    # Debezium headers are on the underlying Kafka message. ExtractNewRecordState
+    # names them "__<field>" ("__op", "__source_ts_ms"); the bare name is accepted too.
+    msg = getattr(event, "message", None)
+    headers = getattr(msg, "headers", None)
+    if not headers:
+        return None
+    names = {name.lower(), f"__{name.lower()}"}
+    for k, v in headers:
+        kk = k.decode() if isinstance(k, (bytes, bytearray)) else k
+        if kk.lower() in names:
+            return v.decode() if isinstance(v, (bytes, bytearray)) else v
+    return None
+
+def header_ts(event, name: str) -> datetime | None:
+    """Epoch-millisecond header (e.g. Debezium source_ts_ms) as a UTC datetime."""
+    v = get_header(event, name)
+    try:
+        return datetime.fromtimestamp(int(v) / 1000, tz=timezone.utc) if v else None
+    except ValueError:
+        return None
+
+def received_at_of(v: dict) -> datetime | None:
+    """Ingest API receipt time carried in the transaction metadata (JSON text via CDC)."""
+    meta = v.get("metadata")
+    if isinstance(meta, str):
+        meta = loads(meta)
+    if isinstance(meta, dict) and meta.get("received_at"):
+        return parse_dt(meta["received_at"])
+    return None
+
+def seconds_between(later: datetime | None, earlier: datetime | None) -> float | None:
+    if later is None or earlier is None:
+        return None
+    return (later - earlier).total_seconds()
+
+def payload_of(obj):
+    """Debezium with JsonConverter(schemas=true) produces {'schema':..., 'payload': {...}} after unwrap.
+    If schemas=false, value is already the row dict. Support both."""
+    if isinstance(obj, dict) and "payload" in obj and isinstance(obj["payload"], dict):
+        return obj["payload"]
+    return obj
@@ -1,18 +1,24 @@
 import faust
-import uuid
 from decimal import Decimal
-from datetime import datetime, timedelta, timezone
-from collections import defaultdict, deque
-from typing import Deque, Tuple
-import json
+from datetime import datetime, timezone
 import logging
 import asyncio
 
 from config import (
     KAFKA_BROKER_URL, WINDOW_SECONDS, COUNT_THRESHOLD,
-    SUM_THRESHOLD_VND, SUM_THRESHOLD_USD
+    SUM_THRESHOLD_VND, SUM_THRESHOLD_USD,
+    STATE_STORE, STATE_CHECKPOINT_SECONDS,
+    ANOMALY_ENABLED, ANOMALY_ALPHA, ANOMALY_WARMUP_EVENTS, ANOMALY_Z_THRESHOLD, ANOMALY_MIN_STD,
+    ANOMALY_LOOKUP_SECONDS,
 )
-from db import upsert_risk_flag
+from anomaly import AmountAnomalyDetector, MemoryStatsStore
+from db import PostgresStateStore, PostgresStatsStore, upsert_risk_flag
+from events import (
+    parse_dt, loads, get_header, header_ts, received_at_of, seconds_between, payload_of
+)
+from state import MemoryStateStore, PartitionedWindows
+from velocity import VelocityDetector
+import metrics
 
 import sys
 
@@ -22,45 +28,6 @@ logging.basicConfig(
     stream=sys.stdout,
 )
 
-# ---------- Helpers ----------
-def parse_dt(s: str | None) -> datetime:
-    if not s:
-        return datetime.now(timezone.utc)
-    # Debezium uses ISO with Z; Python expects +00:00
-    return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc)
-
-def loads(value_bytes):
-    try:
-        return json.loads(value_bytes)
-    except Exception:
-        # In case value is bytes-like already convertible
-        return None
-
-def get_header(event, name: str) -> str | None:
-    # Debezium headers are on the underlying Kafka message
-    msg = getattr(event, "message", None)
-    headers = getattr(msg, "headers", None)
-    if not headers:
-        return None
-    lname = name.lower()
-    for k, v in headers:
-        kk = k.decode() if isinstance(k, (bytes, bytearray)) else k
-        if kk.lower() == lname:
-            return v.decode() if isinstance(v, (bytes, bytearray)) else v
-    return None
-
-def payload_of(obj):
-    """Debezium with JsonConverter(schemas=true) produces {'schema':..., 'payload': {...}} after unwrap.
-    If schemas=false, value is already the row dict. Support both."""
-    if isinstance(obj, dict) and "payload" in obj and isinstance(obj["payload"], dict):
-        return obj["payload"]
-    return obj
-
-def floor_window(ts: datetime, seconds: int) -> tuple[datetime, datetime]:
-    start = ts - timedelta(seconds=(ts.timestamp() % seconds))
-    start = start.replace(microsecond=0)
-    return start, start + timedelta(seconds=seconds)
-
 # ---------- App & Topics ----------
 app = faust.App(
     "lc-stream",
@@ -75,16 +42,72 @@ topic_flags = app.topic("risk.flags", value_serializer="json")
 
 log = logging.getLogger("lc-stream")
 
-# ---------- In-memory sliding windows per account ----------
-# For each account_id, keep a deque of (event_time, amount_decimal)
-Window = Deque[Tuple[datetime, Decimal]]
-windows: dict[str, Window] = defaultdict(deque)
-
-NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000001")  # deterministic namespace for uuid5
-
+# ---------- Sliding windows per account, partitioned like the topic ----------
+# Scale out by starting more workers (one per core / node, up to the topic's
+# partition count); each holds only the windows of its assigned partitions.
 def thresholds_for_currency(cur: str) -> Decimal:
     return SUM_THRESHOLD_VND if cur == "VND" else SUM_THRESHOLD_USD
 
+windows = PartitionedWindows(
+    PostgresStateStore() if STATE_STORE == "postgres" else MemoryStateStore(),
+    topic_txns.get_topic_name(), WINDOW_SECONDS,
+)
+detector = VelocityDetector(windows, WINDOW_SECONDS, COUNT_THRESHOLD, thresholds_for_currency)
+
+anomaly = AmountAnomalyDetector(
+    PostgresStatsStore() if STATE_STORE == "postgres" else MemoryStatsStore(),
+    windows.topic, ANOMALY_ALPHA, ANOMALY_WARMUP_EVENTS, ANOMALY_Z_THRESHOLD, ANOMALY_MIN_STD,
+    windows, WINDOW_SECONDS,
+)
+
+def _partitions(tps) -> list[int]:
+    return [tp.partition for tp in tps if tp.topic == windows.topic]
+
+@app.on_partitions_revoked.connect
+async def on_partitions_revoked(app, revoked, **kwargs) -> None:
+    # saved before returning, so the next owner loads this state
+    loop = asyncio.get_running_loop()
+    partitions = _partitions(revoked)
+    states = windows.release(partitions)
+    stats = anomaly.release(partitions)
+    await loop.run_in_executor(None, windows.save, states)
+    await loop.run_in_executor(None, anomaly.save, stats)
+    if states:
+        log.info(f"window state handed off for partitions {sorted(states)}")
+
+@app.on_partitions_assigned.connect
+async def on_partitions_assigned(app, assigned, **kwargs) -> None:
+    loop = asyncio.get_running_loop()
+    new = windows.unowned(_partitions(assigned))
+    if new:
+        loaded = await loop.run_in_executor(None, windows.store.load, windows.topic, new)
+        windows.install(new, loaded)
+        log.info(f"window state loaded for partitions {new} ({windows.accounts()} accounts held)")
+    new = anomaly.unowned(_partitions(assigned))
+    if new:
+        loaded = await loop.run_in_executor(None, anomaly.store.load_partitions, anomaly.topic, new)
+        anomaly.install(new, loaded)
+
+@app.timer(interval=STATE_CHECKPOINT_SECONDS)
+async def checkpoint_windows():
+    states = windows.snapshot()
+    if states:
+        await asyncio.get_running_loop().run_in_executor(None, windows.save, states)
+
+_last_stats_save = 0.0
+
+@app.timer(interval=ANOMALY_LOOKUP_SECONDS)
+async def sync_amount_stats():
+    # one coroutine for lookups and saves: a lookup never sees this worker's own save
+    global _last_stats_save
+    loop = asyncio.get_running_loop()
+    pending = anomaly.take_pending()
+    if pending:
+        anomaly.resolve(await loop.run_in_executor(None, anomaly.store.load_accounts, pending))
+    if loop.time() - _last_stats_save >= STATE_CHECKPOINT_SECONDS:
+        _last_stats_save = loop.time()
+        await loop.run_in_executor(None, anomaly.save, anomaly.snapshot())
+
 # ---------- Agent ----------
 @app.agent(topic_txns)
 async def process_transactions(stream):
@@ -100,79 +123,75 @@ async def process_transactions(stream):
             continue
         v = payload_of(v)
 
+        processed_at = datetime.now(timezone.utc)
         op = get_header(event, "op")
-        log.info(f"txn received op={op}, payload={v}")
+        log.debug(f"txn received op={op}, payload={v}")
 
         if op and op != "c":
-            log.info("op not 'c', skipping")
+            log.debug("op not 'c', skipping")
             continue
 
-        account_id = v.get("account_id")
         tx_id = v.get("id")
-        amount = v.get("amount")
-        currency = v.get("currency", "VND")
         created_at = parse_dt(v.get("created_at"))
 
-        log.info(f"parsed tx id={tx_id} acct={account_id} amt={amount} cur={currency} ts={created_at}")
-
-        if not account_id or not amount:
-            log.info("missing account_id/amount; skipping")
-            continue
-
-        try:
-            amt = Decimal(str(amount))
-        except Exception as e:
-            log.info(f"bad amount {amount}: {e}")
-            continue
-
-        key = str(account_id)
-        dq: Window = windows[key]
-        dq.append((created_at, amt))
-        cutoff = created_at - timedelta(seconds=WINDOW_SECONDS)
-
-        # Expire old
-        while dq and dq[0][0] < cutoff:
-            dropped = dq.popleft()
-            log.info(f"dropped expired tx {dropped} for acct={account_id}")
-
-        total = sum(a for ts, a in dq if ts >= cutoff)
-        count = sum(1 for ts, _ in dq if ts >= cutoff)
-        log.info(f"acct={account_id} window count={count} sum={total} cutoff={cutoff.isoformat()} dq={list(dq)}")
-
-        sum_threshold = thresholds_for_currency(currency)
-        reason = None
-        if count >= COUNT_THRESHOLD:
-            reason = "VELOCITY_COUNT"
-        if total >= sum_threshold:
-            reason = reason or "VELOCITY_SUM"
-
-        if reason:
-            w_start, w_end = floor_window(created_at, WINDOW_SECONDS)
-            eid = uuid.uuid5(NAMESPACE, f"{account_id}:{w_end.isoformat()}:{reason}")
-
-            row = {
-                "event_id": eid,
-                "account_id": account_id,
-                "window_start": w_start,
-                "window_end": w_end,
-                "count_5m": count,
-                "sum_5m": total,
-                "reason": reason,
-            }
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, upsert_risk_flag, row)
-
-            flag_msg = {
-                "event_id": str(eid),
-                "account_id": str(account_id),
-                "window": {"start": w_start.isoformat(), "end": w_end.isoformat()},
-                "count_5m": count,
-                "sum_5m": str(total),
-                "reason": reason,
-                "tx_example": str(tx_id),
-            }
-            await topic_flags.send(key=str(account_id), value=flag_msg)
-
-            log.info(f"FLAG {reason} acct={account_id} count={count} sum={total} window_end={w_end.isoformat()} (op={op})")
-        else:
-            log.info(f"no flag acct={account_id} count={count} sum={total} (op={op})")
+        # per-stage latency of this event
+        committed_at = header_ts(event, "source_ts_ms")
+        received_at = received_at_of(v)
+        record_ts = getattr(getattr(event, "message", None), "timestamp", None)
+        metrics.observe("cdc_capture", seconds_between(header_ts(event, "ts_ms"), committed_at))
+        metrics.observe("kafka_delivery", processed_at.timestamp() - record_ts if record_ts else None)
+        metrics.observe("commit_to_process", seconds_between(processed_at, committed_at))
+        metrics.observe("event_lag", seconds_between(processed_at, created_at))
+        metrics.observe("ingest_to_process", seconds_between(processed_at, received_at))
+
+        partition = event.message.partition
+        row = detector.process(partition, v, created_at)
+        if row is not None:
+            await emit_flag(row, tx_id, committed_at, received_at, processed_at, op)
+        if ANOMALY_ENABLED:
+            row = anomaly.process(partition, v, created_at)
+            if row is not None:
+                await emit_flag(row, tx_id, committed_at, received_at, processed_at, op)
+
+async def emit_flag(row: dict, tx_id, committed_at, received_at, processed_at, op) -> None:
+    """Write the risk_flags row, then publish it on risk.flags."""
+    row["event_committed_at"] = committed_at
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, upsert_risk_flag, row)
+
+    account_id, reason = row["account_id"], row["reason"]
+    flag_msg = {
+        "event_id": str(row["event_id"]),
+        "account_id": str(account_id),
+        "window": {"start": row["window_start"].isoformat(), "end": row["window_end"].isoformat()},
+        "count_5m": row["count_5m"],
+        "sum_5m": str(row["sum_5m"]),
+        "reason": reason,
+        "tx_example": str(tx_id),
+        "committed_at": committed_at.isoformat() if committed_at else None,
+        "received_at": received_at.isoformat() if received_at else None,
+        "processed_at": processed_at.isoformat(),
+    }
+    if "score" in row:
+        flag_msg["score"] = float(row["score"])
+    await topic_flags.send(key=str(account_id), value=flag_msg)
+    flagged_at = datetime.now(timezone.utc)
+    metrics.observe("time_to_flag", seconds_between(flagged_at, committed_at))
+    metrics.observe("ingest_to_flag", seconds_between(flagged_at, received_at))
+
+    log.info(f"FLAG {reason} acct={account_id} count={row['count_5m']} sum={row['sum_5m']} window_end={row['window_end'].isoformat()} (op={op})")
+
+# ---------- Latency metrics ----------
+@app.page("/metrics")
+async def metrics_page(web, request):
+    return web.text(metrics.render(), content_type="text/plain; version=0.0.4")
+
+@app.page("/metrics/summary")
+async def metrics_summary(web, request):
+    return web.json(metrics.summary())
+
+@app.timer(interval=60.0)
+async def log_latency():
+    for stage, s in metrics.summary().items():
+        if s["count"]:
+            log.info(f"latency {stage}: n={s['count']} mean={s['mean']:.3f}s p50<={s['p50']} p95<={s['p95']} p99<={s['p99']}")
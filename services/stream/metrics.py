@@ -0,0 +1,89 @@
+"""
+In-process latency histograms for the stream worker, rendered in the
+Prometheus text format on the worker's web server (/metrics) and as JSON
+percentiles (/metrics/summary).
+
+Stages, for each transaction event (seconds):
+  cdc_capture        Debezium read time (__ts_ms) - OLTP commit (__source_ts_ms)
+  kafka_delivery     processing time - Kafka record timestamp
+  commit_to_process  processing time - OLTP commit
+  event_lag          processing time - created_at (event time)
+  ingest_to_process  processing time - ingest API receipt (metadata.received_at)
+and, for each flag raised:
+  time_to_flag       flag written and published - OLTP commit of the trigger
+  ingest_to_flag     flag written and published - ingest API receipt of the trigger
+"""
+from bisect import bisect_left
+from typing import Optional
+
+# upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: Optional[float]) -> None:
+        if seconds is None:
+            return
+        seconds = max(seconds, 0.0)   # clock skew between hosts
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty or beyond the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return "\n".join(lines)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+STAGES = {
+    "cdc_capture": "Debezium read time minus OLTP commit time",
+    "kafka_delivery": "Stream processing time minus Kafka record timestamp",
+    "commit_to_process": "Stream processing time minus OLTP commit time",
+    "event_lag": "Stream processing time minus transaction created_at",
+    "ingest_to_process": "Stream processing time minus ingest API receipt",
+    "time_to_flag": "Risk flag written and published minus OLTP commit of the triggering transaction",
+    "ingest_to_flag": "Risk flag written and published minus ingest API receipt of the triggering transaction",
+}
+histograms = {stage: Histogram(f"lc_stream_{stage}_seconds", help) for stage, help in STAGES.items()}
+
+def observe(stage: str, seconds: Optional[float]) -> None:
+    histograms[stage].observe(seconds)
+
+def render() -> str:
+    return "\n".join(h.render() for h in histograms.values()) + "\n"
+
+def summary() -> dict:
+    return {stage: h.summary() for stage, h in histograms.items()}
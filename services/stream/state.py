@@ -0,0 +1,130 @@
+"""
+Velocity window state, partitioned like the input topic.
+
+Transactions are keyed by account_id (Debezium message.key.columns), so all
+events of an account arrive on one partition and the account's window lives
+with that partition. A worker only holds the partitions assigned to it:
+
+  assign   load the partitions' last checkpoint from the state store
+  revoke   checkpoint the partitions, then drop them from memory
+  timer    checkpoint partitions changed since the last checkpoint
+
+Kafka revokes a partition from its old owner before assigning it to the new
+one, so the new owner continues from the old owner's windows. After a crash
+the new owner starts from the last periodic checkpoint. Checkpoints only
+keep entries still inside the window ending at the partition's newest event
+and drop accounts left with none, so a partition's state (in memory and in
+the store) stays bounded by its traffic in one window; an idle account does
+not outlive its last window.
+"""
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional, Protocol
+
+from windows import Window
+
+# account_id -> [(created_at ISO-8601, amount)]
+Serialized = dict[str, list[list[str]]]
+
+class StateStore(Protocol):
+    def load(self, topic: str, partitions: list[int]) -> dict[int, Serialized]: ...
+    def save(self, topic: str, partition: int, state: Serialized) -> None: ...
+
+class MemoryStateStore:
+    """Process-local store; stands in for the shared store in tests."""
+    def __init__(self):
+        self.data: dict[tuple[str, int], Serialized] = {}
+
+    def load(self, topic: str, partitions: list[int]) -> dict[int, Serialized]:
+        return {p: self.data[(topic, p)] for p in partitions if (topic, p) in self.data}
+
+    def save(self, topic: str, partition: int, state: Serialized) -> None:
+        self.data[(topic, partition)] = state
+
+def prune(dq: Window, cutoff: datetime) -> None:
+    """Drop entries older than cutoff."""
+    while dq and dq[0][0] < cutoff:
+        dq.popleft()
+
+class PartitionedWindows:
+    def __init__(self, store: StateStore, topic: str, window_seconds: int):
+        self.store = store
+        self.topic = topic
+        self.window_seconds = window_seconds
+        self.partitions: dict[int, dict[str, Window]] = {}
+        self.dirty: set[int] = set()
+
+    # The store I/O is split from the in-memory steps so an event loop can run
+    # the I/O in an executor while windows are only touched on the loop itself.
+
+    def unowned(self, partitions: Iterable[int]) -> list[int]:
+        return sorted(set(partitions) - self.partitions.keys())
+
+    def install(self, partitions: list[int], loaded: dict[int, Serialized]) -> None:
+        for p in partitions:
+            self.partitions[p] = {
+                account: deque((datetime.fromisoformat(ts), Decimal(amt)) for ts, amt in entries)
+                for account, entries in loaded.get(p, {}).items()
+            }
+
+    def release(self, partitions: Iterable[int]) -> dict[int, Serialized]:
+        """Drop partitions from memory; returns their final state to save."""
+        gone = sorted(set(partitions) & self.partitions.keys())
+        states = self.snapshot(gone)
+        for p in gone:
+            del self.partitions[p]
+        return states
+
+    def snapshot(self, partitions: Optional[Iterable[int]] = None) -> dict[int, Serialized]:
+        """Serialized state of `partitions` (default: changed since the last snapshot)."""
+        if partitions is None:
+            partitions, self.dirty = self.dirty, set()
+        else:
+            partitions = list(partitions)
+            self.dirty.difference_update(partitions)
+        return {p: self._serialize(p) for p in sorted(partitions) if p in self.partitions}
+
+    def save(self, states: dict[int, Serialized]) -> None:
+        for p, state in states.items():
+            self.store.save(self.topic, p, state)
+
+    def assign(self, partitions: Iterable[int]) -> list[int]:
+        """Take ownership of partitions not held yet; returns the ones loaded."""
+        new = self.unowned(partitions)
+        self.install(new, self.store.load(self.topic, new) if new else {})
+        return new
+
+    def revoke(self, partitions: Iterable[int]) -> list[int]:
+        """Checkpoint and release partitions; returns the ones released."""
+        states = self.release(partitions)
+        self.save(states)
+        return sorted(states)
+
+    def checkpoint(self) -> int:
+        """Save the partitions changed since the last checkpoint; returns how many."""
+        states = self.snapshot()
+        self.save(states)
+        return len(states)
+
+    def window(self, partition: int, account_id: str) -> Window:
+        accounts = self.partitions.setdefault(partition, {})
+        self.dirty.add(partition)
+        dq = accounts.get(account_id)
+        if dq is None:
+            dq = accounts[account_id] = deque()
+        return dq
+
+    def _serialize(self, partition: int) -> Serialized:
+        accounts = self.partitions[partition]
+        newest = max((dq[-1][0] for dq in accounts.values() if dq), default=None)
+        if newest is not None:
+            cutoff = newest - timedelta(seconds=self.window_seconds)
+            for dq in accounts.values():
+                prune(dq, cutoff)
+        for account in [a for a, dq in accounts.items() if not dq]:
+            del accounts[account]
+        return {account: [[ts.isoformat(), str(amt)] for ts, amt in dq] for account, dq in accounts.items()}
+
+    def accounts(self) -> int:
+        return sum(len(a) for a in self.partitions.values())
@@ -0,0 +1,83 @@
+import math
+import os
+import statistics
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from anomaly import AmountAnomalyDetector, AmountStats, MemoryStatsStore  # noqa: E402
+
+TOPIC = "txn.public.transactions"
+ACCT = "00000000-0000-0000-0000-000000000001"
+T0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+def detector(store=None, **kw):
+    args = {"alpha": 0.05, "warmup": 20, "z_threshold": 4.0, "min_std": 0.25, **kw}
+    return AmountAnomalyDetector(store or MemoryStatsStore(), TOPIC, **args)
+
+def event(i: int, amount: str, account: str = ACCT) -> dict:
+    return {"id": f"tx-{i}", "account_id": account, "amount": amount}
+
+def feed(det, amounts, partition=0, start=0, account=ACCT):
+    return [det.process(partition, event(start + i, a, account), T0 + timedelta(seconds=start + i))
+            for i, a in enumerate(amounts)]
+
+def normal_amounts(n: int) -> list[str]:
+    return [str(100000 + 1000 * (i % 7)) for i in range(n)]
+
+def test_exact_mean_and_variance_before_decay():
+    xs = [math.log1p(a) for a in (120.0, 80.0, 95.0, 300.0, 110.0)]
+    s = AmountStats()
+    for x in xs:
+        s.update(x, alpha=0.0)
+    assert math.isclose(s.mean, statistics.fmean(xs))
+    assert math.isclose(s.var, statistics.pvariance(xs))
+
+def test_merge_matches_combined_sample():
+    a, b = [1.0, 2.0, 4.0], [3.0, 8.0]
+    left, right = AmountStats(), AmountStats()
+    for x in a:
+        left.update(x, 0.0)
+    for x in b:
+        right.update(x, 0.0)
+    left.merge(*right.row())
+    assert left.n == 5
+    assert math.isclose(left.mean, statistics.fmean(a + b))
+    assert math.isclose(left.var, statistics.pvariance(a + b))
+
+def test_spike_flagged_only_after_warmup():
+    det = detector()
+    assert not any(feed(det, ["100000"] * 5 + ["50000000"]))   # still warming up
+    det = detector()
+    assert not any(feed(det, normal_amounts(40)))
+    row = feed(det, ["50000000"], start=40)[0]
+    assert row["reason"] == "AMOUNT_ANOMALY"
+    assert row["score"] >= 4.0
+    assert row["trigger_tx_id"] == "tx-40"
+    # small amounts are never flagged, however unusual
+    assert feed(det, ["1"], start=41) == [None]
+
+def test_stored_history_is_merged_for_new_accounts():
+    store = MemoryStatsStore()
+    warm = detector(store)
+    feed(warm, normal_amounts(40))
+    warm.checkpoint()
+    store.data[ACCT] = (None, None, store.data[ACCT][2])   # as seeded by bootstrap_amount_stats.py
+
+    det = detector(store)
+    feed(det, normal_amounts(1), start=40)
+    assert det.take_pending() == [ACCT]
+    det.resolve(store.load_accounts([ACCT]))
+    assert det.partitions[0][ACCT].n == 41
+    assert feed(det, ["50000000"], start=41)[0]["reason"] == "AMOUNT_ANOMALY"
+
+def test_stats_follow_partition_handoff():
+    store = MemoryStatsStore()
+    first, second = detector(store), detector(store)
+    first.assign([0, 1])
+    feed(first, normal_amounts(40))
+    first.revoke([0])
+    assert ACCT not in first.partitions.get(0, {})
+    assert second.assign([0]) == [0]
+    assert second.partitions[0][ACCT].n == 40
+    assert feed(second, ["50000000"], start=40)[0]["reason"] == "AMOUNT_ANOMALY"
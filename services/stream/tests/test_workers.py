@@ -0,0 +1,125 @@
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from state import MemoryStateStore, PartitionedWindows  # noqa: E402
+from velocity import VelocityDetector  # noqa: E402
+
+TOPIC = "txn.public.transactions"
+PARTITIONS = 6
+WINDOW = 300
+
+class MemoryTopic:
+    """Partitioned log; records keyed by account_id like the Debezium topic."""
+    def __init__(self, partitions: int):
+        self.logs: list[list[dict]] = [[] for _ in range(partitions)]
+
+    def produce(self, value: dict) -> None:
+        self.logs[zlib.crc32(value["account_id"].encode()) % len(self.logs)].append(value)
+
+class Worker:
+    def __init__(self, name: str, store):
+        self.name = name
+        self.windows = PartitionedWindows(store, TOPIC, WINDOW)
+        self.detector = VelocityDetector(self.windows, WINDOW, 5, lambda currency: Decimal("1000000"))
+
+class Group:
+    """Consumer group over a MemoryTopic with eager rebalancing, as Faust does:
+    every member revokes all its partitions, then the new assignment is handed out."""
+    def __init__(self, topic: MemoryTopic):
+        self.topic = topic
+        self.members: list[Worker] = []
+        self.assignment: dict[str, list[int]] = {}
+        self.positions = [0] * len(topic.logs)
+        self.flags: dict[str, list[tuple]] = {}
+
+    def rebalance(self, members: list[Worker]) -> None:
+        for w in self.members:
+            w.windows.revoke(self.assignment[w.name])
+        self.members = members
+        self.assignment = {w.name: list(range(i, len(self.topic.logs), len(members))) for i, w in enumerate(members)}
+        for w in members:
+            w.windows.assign(self.assignment[w.name])
+
+    def poll(self, max_records: int) -> int:
+        """Each member processes up to max_records from each of its partitions."""
+        n = 0
+        for w in self.members:
+            for p in self.assignment[w.name]:
+                log = self.topic.logs[p]
+                for v in log[self.positions[p]:self.positions[p] + max_records]:
+                    row = w.detector.process(p, v)
+                    if row:
+                        self.flags.setdefault(row["account_id"], []).append(
+                            (row["event_id"], row["count_5m"], row["sum_5m"]))
+                    self.positions[p] += 1
+                    n += 1
+        return n
+
+def make_topic() -> MemoryTopic:
+    topic = MemoryTopic(PARTITIONS)
+    t0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    # 30 accounts, one payment every 20 s each: 5 in a 300 s window trips VELOCITY_COUNT
+    for i in range(40):
+        for a in range(30):
+            topic.produce({
+                "id": f"tx-{a}-{i}",
+                "account_id": f"00000000-0000-0000-0000-{a:012d}",
+                "amount": "1000.00",
+                "currency": "VND",
+                "created_at": (t0 + timedelta(seconds=20 * i + a)).isoformat(),
+            })
+    return topic
+
+def run(store_factory, schedule: dict[int, int]) -> dict:
+    """schedule: poll round -> number of workers from that round on."""
+    group = Group(make_topic())
+    workers = []
+    rnd = 0
+    while True:
+        if rnd in schedule:
+            size = schedule[rnd]
+            workers = workers[:size] + [Worker(f"w{i}", store_factory()) for i in range(len(workers), size)]
+            group.rebalance(workers)
+        if not group.poll(max_records=3) and rnd >= max(schedule):
+            break
+        rnd += 1
+    return group.flags
+
+def test_windows_follow_partitions_across_rebalances():
+    store = MemoryStateStore()
+    single = run(lambda: store, {0: 1})
+    store = MemoryStateStore()
+    scaled = run(lambda: store, {0: 1, 3: 3, 8: 2, 12: 4})
+    assert single, "scenario should raise flags"
+    assert scaled == single
+
+def test_state_lost_without_shared_store():
+    single = run(MemoryStateStore, {0: 1})
+    isolated = run(MemoryStateStore, {0: 1, 3: 3})   # every worker has its own store
+    assert isolated != single
+
+def test_checkpoint_prunes_expired_entries():
+    store = MemoryStateStore()
+    windows = PartitionedWindows(store, TOPIC, WINDOW)
+    t0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    dq = windows.window(0, "acct")
+    dq.extend([(t0, Decimal("1")), (t0 + timedelta(seconds=WINDOW + 1), Decimal("2"))])
+    windows.window(0, "idle")
+    assert windows.checkpoint() == 1
+    assert store.data[(TOPIC, 0)] == {"acct": [[(t0 + timedelta(seconds=WINDOW + 1)).isoformat(), "2"]]}
+    assert windows.checkpoint() == 0   # nothing changed since
+
+def test_idle_accounts_are_dropped():
+    store = MemoryStateStore()
+    windows = PartitionedWindows(store, TOPIC, WINDOW)
+    t0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    windows.window(0, "quiet").append((t0, Decimal("5")))
+    windows.window(0, "busy").append((t0 + timedelta(seconds=WINDOW + 1), Decimal("1")))
+    windows.checkpoint()
+    # the quiet account's last event left the partition's window
+    assert set(store.data[(TOPIC, 0)]) == {"busy"}
+    assert windows.accounts() == 1
@@ -0,0 +1,67 @@
+"""
+Velocity rules over the per-account windows: VELOCITY_COUNT when an
+account's window holds COUNT_THRESHOLD transactions, VELOCITY_SUM when their
+total reaches the currency's threshold. Flags are identified by a uuid5 of
+(account, window end, reason), so re-processing an event after a restart or a
+rebalance produces the same flag and the insert is a no-op.
+"""
+import logging
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Optional
+
+from events import parse_dt
+from state import PartitionedWindows
+from windows import floor_window, slide_window
+
+log = logging.getLogger("lc-stream")
+
+NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000001")  # deterministic namespace for uuid5
+
+class VelocityDetector:
+    def __init__(self, windows: PartitionedWindows, window_seconds: int, count_threshold: int,
+                 sum_threshold: Callable[[str], Decimal]):
+        self.windows = windows
+        self.window_seconds = window_seconds
+        self.count_threshold = count_threshold
+        self.sum_threshold = sum_threshold
+
+    def process(self, partition: int, v: dict, created_at: Optional[datetime] = None) -> Optional[dict]:
+        """Add one created transaction to its account's window; the risk_flags row when a rule fires."""
+        account_id = v.get("account_id")
+        amount = v.get("amount")
+        if not account_id or not amount:
+            log.debug("missing account_id/amount; skipping")
+            return None
+        try:
+            amt = Decimal(str(amount))
+        except InvalidOperation as e:
+            log.info(f"bad amount {amount}: {e}")
+            return None
+        currency = v.get("currency", "VND")
+        created_at = created_at or parse_dt(v.get("created_at"))
+
+        dq = self.windows.window(partition, str(account_id))
+        count, total = slide_window(dq, created_at, amt, self.window_seconds)
+        log.debug(f"acct={account_id} window count={count} sum={total}")
+
+        reason = None
+        if count >= self.count_threshold:
+            reason = "VELOCITY_COUNT"
+        if total >= self.sum_threshold(currency):
+            reason = reason or "VELOCITY_SUM"
+        if not reason:
+            return None
+
+        w_start, w_end = floor_window(created_at, self.window_seconds)
+        return {
+            "event_id": uuid.uuid5(NAMESPACE, f"{account_id}:{w_end.isoformat()}:{reason}"),
+            "account_id": account_id,
+            "window_start": w_start,
+            "window_end": w_end,
+            "count_5m": count,
+            "sum_5m": total,
+            "reason": reason,
+            "trigger_tx_id": v.get("id"),
+        }
@@ -0,0 +1,28 @@
+"""
+Per-account sliding windows for the velocity rules.
+"""
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Deque, Tuple
+
+# For each account_id, keep a deque of (event_time, amount_decimal)
+Window = Deque[Tuple[datetime, Decimal]]
+
+def floor_window(ts: datetime, seconds: int) -> tuple[datetime, datetime]:
+    start = ts - timedelta(seconds=(ts.timestamp() % seconds))
+    start = start.replace(microsecond=0)
+    return start, start + timedelta(seconds=seconds)
+
+def slide_window(dq: Window, created_at: datetime, amt: Decimal, seconds: int) -> tuple[int, Decimal]:
+    """Append one event, expire entries older than the window, return (count, sum) inside it."""
+    dq.append((created_at, amt))
+    cutoff = created_at - timedelta(seconds=seconds)
+
+    # Expire old
+    while dq and dq[0][0] < cutoff:
+        dq.popleft()
+
+    total = sum(a for ts, a in dq if ts >= cutoff)
+    count = sum(1 for ts, _ in dq if ts >= cutoff)
+    return count, total
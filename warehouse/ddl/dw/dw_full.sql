@@ -6,6 +6,35 @@ CREATE TABLE IF NOT EXISTS stg.etl_watermarks (
   table_name      TEXT PRIMARY KEY,
   last_loaded_at  TIMESTAMPTZ NOT NULL DEFAULT TIMESTAMPTZ 'epoch'
 );
+-- Composite (created_at, id) keyset watermark: ties on created_at are never skipped
+ALTER TABLE stg.etl_watermarks ADD COLUMN IF NOT EXISTS last_loaded_id UUID;
+
+-- Chunk ledger for parallel backfills (oltp_to_stg_backfill); each chunk keeps
+-- its own keyset checkpoint so a failed chunk resumes where it stopped.
+CREATE TABLE IF NOT EXISTS stg.etl_backfill_chunks (
+  backfill_id      TEXT        NOT NULL,
+  table_name       TEXT        NOT NULL,
+  chunk_start      TIMESTAMPTZ NOT NULL,
+  chunk_end        TIMESTAMPTZ NOT NULL,
+  status           TEXT        NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING','RUNNING','DONE','FAILED')),
+  rows_loaded      BIGINT      NOT NULL DEFAULT 0,
+  last_created_at  TIMESTAMPTZ,
+  last_id          UUID,
+  updated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (backfill_id, table_name, chunk_start)
+);
+
+-- Kafka offsets of the CDC loader (services/cdc_loader). Written in the same
+-- transaction as the staging upserts, so a restart resumes exactly after the
+-- last applied batch.
+CREATE TABLE IF NOT EXISTS stg.cdc_offsets (
+  consumer_group  TEXT        NOT NULL,
+  topic           TEXT        NOT NULL,
+  partition       INT         NOT NULL,
+  next_offset     BIGINT      NOT NULL,
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (consumer_group, topic, partition)
+);
 
 -- Staging tables (append-only, dedupe by PK)
 CREATE TABLE IF NOT EXISTS stg.customers (
@@ -57,10 +86,29 @@ CREATE TABLE IF NOT EXISTS stg.outbox (
   loaded_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Row hash of the staged version (oltp_to_stg merge mode); an upsert only
+-- rewrites a row when the incoming hash differs. NULL = not hashed yet.
+ALTER TABLE stg.customers    ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+ALTER TABLE stg.accounts     ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+ALTER TABLE stg.transactions ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+
+-- Watermarks of the incremental staging validation (gx_validate), one per check:
+-- rows with loaded_at < last_validated_at have passed it.
+CREATE TABLE IF NOT EXISTS stg.validation_watermarks (
+  check_name         TEXT        PRIMARY KEY,
+  last_validated_at  TIMESTAMPTZ NOT NULL,
+  rows_validated     BIGINT      NOT NULL DEFAULT 0,   -- size of the last window
+  validated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_stg_customers_loaded_at    ON stg.customers(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_accounts_loaded_at     ON stg.accounts(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_transactions_loaded_at ON stg.transactions(loaded_at);
+
 
 -- ========= Utility =========
 CREATE EXTENSION IF NOT EXISTS pgcrypto;  -- for UUID helpers if needed
 CREATE EXTENSION IF NOT EXISTS citext;    -- case-insensitive text (email)
+CREATE EXTENSION IF NOT EXISTS btree_gist; -- GiST over (bk, tstzrange) for SK lookups
 
 -- ========= DIMENSIONS (SCD2) =========
 -- Conventions:
@@ -172,32 +220,223 @@ FOR EACH ROW EXECUTE FUNCTION cur.sync_created_date();
 
 -- Helpful indexes on each partition will be added automatically via template (see function below)
 
--- ========= Partition helper: ensure month partition exists =========
+-- ========= Partition lifecycle =========
+-- Single-row settings read by the functions below; change with e.g.
+--   UPDATE cur.fact_partition_config SET granularity = 'day', premake = 14;
+-- Existing partitions keep their bounds: new ones are clamped so they never
+-- overlap partitions created under another granularity.
+CREATE TABLE IF NOT EXISTS cur.fact_partition_config (
+  id                   BOOLEAN     PRIMARY KEY DEFAULT TRUE CHECK (id),
+  granularity          TEXT        NOT NULL DEFAULT 'month' CHECK (granularity IN ('day','week','month')),
+  premake              INTEGER     NOT NULL DEFAULT 2 CHECK (premake >= 0),  -- partitions kept ahead of today's
+  retention            INTERVAL,                                            -- NULL = keep forever
+  brin_pages_per_range INTEGER     NOT NULL DEFAULT 32 CHECK (brin_pages_per_range > 0),
+  archive_detached     BOOLEAN     NOT NULL DEFAULT FALSE,                  -- keep detached tables until archived
+  updated_at           TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+INSERT INTO cur.fact_partition_config DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Partitions detached by the retention policy
+CREATE TABLE IF NOT EXISTS cur.detached_fact_partitions (
+  partition_name TEXT        PRIMARY KEY,
+  range_start    DATE        NOT NULL,
+  range_end      DATE        NOT NULL,
+  detached_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  dropped_at     TIMESTAMPTZ
+);
+-- Cold tier (fact_archive DAG): Parquet file the partition was exported to
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archive_path  TEXT;
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archived_at   TIMESTAMPTZ;
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archived_rows BIGINT;
+
+-- Ensure the partition covering p_date exists. Time-ordered, append-mostly data:
+-- BRIN on (created_at, created_date) for range scans, B-trees only for the
+-- point lookups by account / customer.
 CREATE OR REPLACE FUNCTION cur.ensure_fact_partition(p_date date)
 RETURNS void LANGUAGE plpgsql AS $$
 DECLARE
-  start_date date := date_trunc('month', p_date)::date;
-  end_date   date := (date_trunc('month', p_date) + interval '1 month')::date;
-  part_name  text := format('fact_transactions_y%sm%s', to_char(start_date,'YYYY'), to_char(start_date,'MM'));
+  cfg        cur.fact_partition_config%ROWTYPE;
+  start_date date;
+  end_date   date;
+  part_name  text;
   ddl        text;
 BEGIN
-  IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid=c.relnamespace
-                 WHERE c.relkind = 'r' AND n.nspname='cur' AND c.relname=part_name) THEN
-    ddl := format($f$
-      CREATE TABLE cur.%1$s PARTITION OF cur.fact_transactions
-      FOR VALUES FROM ('%2$s') TO ('%3$s');
-      CREATE INDEX %1$s_account_sk_idx ON cur.%1$s (account_sk, created_at);
-      CREATE INDEX %1$s_customer_sk_idx ON cur.%1$s (customer_sk, created_at);
-      CREATE INDEX %1$s_currency_date_idx ON cur.%1$s (currency, created_date);
-    $f$, part_name, start_date, end_date);
-    EXECUTE ddl;
+  IF EXISTS (SELECT 1 FROM cur.v_fact_partitions WHERE range_start <= p_date AND p_date < range_end) THEN
+    RETURN;
   END IF;
+  -- concurrent loads must not race on the same bounds
+  PERFORM pg_advisory_xact_lock(hashtext('cur.fact_transactions:partitions'));
+  IF EXISTS (SELECT 1 FROM cur.v_fact_partitions WHERE range_start <= p_date AND p_date < range_end) THEN
+    RETURN;
+  END IF;
+
+  SELECT * INTO cfg FROM cur.fact_partition_config;
+  start_date := date_trunc(cfg.granularity, p_date)::date;
+  end_date   := (start_date + ('1 ' || cfg.granularity)::interval)::date;
+  start_date := GREATEST(start_date, (SELECT MAX(range_end) FROM cur.v_fact_partitions WHERE range_end <= p_date));
+  end_date   := LEAST(end_date, (SELECT MIN(range_start) FROM cur.v_fact_partitions WHERE range_start > p_date));
+
+  IF cfg.granularity = 'month' AND start_date = date_trunc('month', start_date)::date
+     AND end_date = (start_date + interval '1 month')::date THEN
+    part_name := format('fact_transactions_y%sm%s', to_char(start_date,'YYYY'), to_char(start_date,'MM'));
+  ELSE
+    part_name := format('fact_transactions_p%s', to_char(start_date,'YYYYMMDD'));
+  END IF;
+
+  ddl := format($f$
+    CREATE TABLE cur.%1$s PARTITION OF cur.fact_transactions
+    FOR VALUES FROM ('%2$s') TO ('%3$s');
+    CREATE INDEX %1$s_account_sk_idx ON cur.%1$s (account_sk, created_at);
+    CREATE INDEX %1$s_customer_sk_idx ON cur.%1$s (customer_sk, created_at);
+    CREATE INDEX %1$s_time_brin ON cur.%1$s USING brin (created_at, created_date)
+      WITH (pages_per_range = %4$s);
+  $f$, part_name, start_date, end_date, cfg.brin_pages_per_range);
+  EXECUTE ddl;
+END$$;
+
+-- ========= Partition catalog: attached fact partitions and their bounds =========
+-- Lets readers (exports, maintenance) target only the partitions covering a range.
+CREATE OR REPLACE VIEW cur.v_fact_partitions AS
+SELECT
+  c.relname AS partition_name,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$FROM \('([^']+)'\)$re$)::date AS range_start,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$TO \('([^']+)'\)$re$)::date   AS range_end
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'cur.fact_transactions'::regclass;
+
+-- Ensure partitions for every date in [p_from, p_to]; one call per partition.
+CREATE OR REPLACE FUNCTION cur.ensure_fact_partitions(p_from date, p_to date)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE d date := p_from;
+BEGIN
+  WHILE d <= p_to LOOP
+    PERFORM cur.ensure_fact_partition(d);
+    SELECT range_end INTO d FROM cur.v_fact_partitions WHERE range_start <= d AND d < range_end;
+  END LOOP;
 END$$;
 
+-- Keep today's partition and the next `premake` ones (config default) in place,
+-- so loads never pay for DDL or take the parent's lock.
+CREATE OR REPLACE FUNCTION cur.premake_fact_partitions(p_ahead integer DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  d date := (NOW() AT TIME ZONE 'UTC')::date;
+  n integer;
+BEGIN
+  SELECT COALESCE(p_ahead, premake) INTO n FROM cur.fact_partition_config;
+  FOR i IN 0..n LOOP
+    PERFORM cur.ensure_fact_partition(d);
+    SELECT range_end INTO d FROM cur.v_fact_partitions WHERE range_start <= d AND d < range_end;
+  END LOOP;
+END$$;
+
+-- Detach partitions that ended before NOW() - retention and record them in
+-- cur.detached_fact_partitions; detached tables are dropped right away unless
+-- archive_detached is set (then the archive job drops them once exported).
+-- Pending facts older than the cutoff are discarded with them.
+CREATE OR REPLACE FUNCTION cur.apply_fact_retention()
+RETURNS TABLE (part_name text, action text) LANGUAGE plpgsql AS $$
+DECLARE
+  cfg    cur.fact_partition_config%ROWTYPE;
+  cutoff date;
+  p      record;
+BEGIN
+  SELECT * INTO cfg FROM cur.fact_partition_config;
+  IF cfg.retention IS NULL THEN
+    RETURN;
+  END IF;
+  cutoff := ((NOW() AT TIME ZONE 'UTC') - cfg.retention)::date;
+
+  FOR p IN
+    SELECT v.partition_name, v.range_start, v.range_end FROM cur.v_fact_partitions v
+    WHERE v.range_end <= cutoff ORDER BY v.range_start
+  LOOP
+    EXECUTE format('ALTER TABLE cur.fact_transactions DETACH PARTITION cur.%I', p.partition_name);
+    INSERT INTO cur.detached_fact_partitions AS d (partition_name, range_start, range_end)
+    VALUES (p.partition_name, p.range_start, p.range_end)
+    ON CONFLICT (partition_name) DO UPDATE SET detached_at = NOW(), dropped_at = NULL;
+    part_name := p.partition_name; action := 'detached';
+    RETURN NEXT;
+  END LOOP;
+
+  DELETE FROM cur.pending_facts pf WHERE pf.created_at < cutoff::timestamp AT TIME ZONE 'UTC';
+
+  IF NOT cfg.archive_detached THEN
+    FOR p IN SELECT d.partition_name FROM cur.detached_fact_partitions d WHERE d.dropped_at IS NULL ORDER BY d.range_start LOOP
+      EXECUTE format('DROP TABLE IF EXISTS cur.%I', p.partition_name);
+      UPDATE cur.detached_fact_partitions d SET dropped_at = NOW() WHERE d.partition_name = p.partition_name;
+      part_name := p.partition_name; action := 'dropped';
+      RETURN NEXT;
+    END LOOP;
+  END IF;
+END$$;
+
+-- Size report per attached partition
+CREATE OR REPLACE VIEW cur.v_fact_partition_sizes AS
+SELECT
+  p.partition_name,
+  p.range_start,
+  p.range_end,
+  c.reltuples::bigint                           AS est_rows,
+  pg_table_size(c.oid)                          AS table_bytes,
+  pg_indexes_size(c.oid)                        AS index_bytes,
+  pg_total_relation_size(c.oid)                 AS total_bytes,
+  pg_size_pretty(pg_total_relation_size(c.oid)) AS total_pretty
+FROM cur.v_fact_partitions p
+JOIN pg_class c ON c.relname = p.partition_name AND c.relnamespace = 'cur'::regnamespace
+ORDER BY p.range_start;
+
+-- ----- pending facts -----
+-- Transactions whose account / customer / merchant version did not resolve
+-- yet (late-arriving dimensions). curated_load retries them every run from
+-- stg.transactions by primary key and removes them once they load.
+CREATE TABLE IF NOT EXISTS cur.pending_facts (
+  transaction_bk   UUID        PRIMARY KEY,
+  created_at       TIMESTAMPTZ NOT NULL,
+  missing          TEXT[]      NOT NULL,   -- subset of {account,customer,merchant}
+  attempts         INTEGER     NOT NULL DEFAULT 1,
+  first_seen_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_attempt_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_pending_facts_created ON cur.pending_facts(created_at);
+
+CREATE OR REPLACE VIEW cur.v_pending_facts_metrics AS
+SELECT
+  COUNT(*)                                             AS pending,
+  COUNT(*) FILTER (WHERE 'account'  = ANY(missing))    AS missing_account,
+  COUNT(*) FILTER (WHERE 'customer' = ANY(missing))    AS missing_customer,
+  COUNT(*) FILTER (WHERE 'merchant' = ANY(missing))    AS missing_merchant,
+  MIN(created_at)                                      AS oldest_created_at,
+  MAX(NOW() - first_seen_at)                           AS max_age,
+  MAX(attempts)                                        AS max_attempts,
+  ROUND(AVG(attempts), 2)                              AS avg_attempts
+FROM cur.pending_facts;
+
+-- ----- chunked fact load checkpoints -----
+-- One row per created_date chunk of a curated_load run in chunked mode
+-- (CURATED_FACT_LOAD_MODE=chunked). Each chunk loads, updates the summaries and
+-- flips to DONE in one transaction, so a retried run skips finished chunks and a
+-- failed chunk leaves the others committed. The fact watermark only moves to
+-- `until` once every chunk of the load is DONE.
+CREATE TABLE IF NOT EXISTS cur.fact_load_chunks (
+  load_id       TEXT        NOT NULL,
+  chunk_date    DATE        NOT NULL,
+  since         TIMESTAMPTZ NOT NULL,   -- watermark the load was planned from (exclusive)
+  until         TIMESTAMPTZ NOT NULL,   -- MAX(stg.transactions.created_at) at planning (inclusive)
+  status        TEXT        NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING','RUNNING','DONE','FAILED')),
+  attempts      INTEGER     NOT NULL DEFAULT 0,
+  rows_loaded   BIGINT      NOT NULL DEFAULT 0,
+  rows_pending  BIGINT      NOT NULL DEFAULT 0,
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (load_id, chunk_date)
+);
+
 -- Create partitions for last month, current month, next month (handy for dev)
 SELECT cur.ensure_fact_partition( (CURRENT_DATE - INTERVAL '1 month')::date );
 SELECT cur.ensure_fact_partition( CURRENT_DATE );
 SELECT cur.ensure_fact_partition( (CURRENT_DATE + INTERVAL '1 month')::date );
+SELECT cur.premake_fact_partitions();
 
 -- ========== SCD2 helper functions in cur schema ==========
 
@@ -317,6 +556,192 @@ BEGIN
 
   RETURN cur_row.merchant_sk;
 END$$ LANGUAGE plpgsql;
+
+-- ========== Set-based SCD2 merges ==========
+-- Same version history as calling cur.upsert_dim_* once per staging row in
+-- as_of order, in a few statements per batch:
+--   1. the key's current version (ord 0) and the batch rows (ord 1..n) are
+--      hashed and each compared with the row before it (LAG); rows that differ
+--      are the new versions
+--   2. the current versions are closed at their key's first new as_of
+--   3. the new versions are inserted, each closed by the next one (LEAD)
+-- Hashes mirror the IS DISTINCT FROM checks of the row functions (citext email
+-- compares case-insensitively, merchant attrs are COALESCEd to '').
+-- Returns the number of versions inserted.
+
+-- DIM CUSTOMER
+CREATE OR REPLACE FUNCTION cur.merge_dim_customer(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_customer;
+  CREATE TEMP TABLE tmp_scd_customer ON COMMIT DROP AS
+  WITH batch AS (
+    SELECT id AS customer_bk, email, country, kyc_level, risk_band,
+           GREATEST(created_at, updated_at) AS as_of,
+           row_number() OVER (ORDER BY GREATEST(created_at, updated_at), id) AS ord
+    FROM stg.customers
+    WHERE GREATEST(created_at, updated_at) > p_since
+  ),
+  seq AS (
+    SELECT d.customer_bk, d.email, d.country, d.kyc_level, d.risk_band,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.customer_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (customer_bk) * FROM cur.dim_customer
+      WHERE is_current AND customer_bk IN (SELECT customer_bk FROM batch)
+      ORDER BY customer_bk, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT customer_bk, email, country, kyc_level, risk_band, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY customer_bk ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY customer_bk) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY customer_bk), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(lower(email::text), country, kyc_level, risk_band)::text) AS h FROM seq
+    ) s
+  )
+  SELECT customer_bk, email, country, kyc_level, risk_band, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY customer_bk ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY customer_bk ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_customer d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (customer_bk) seed_sk, as_of FROM tmp_scd_customer
+    WHERE seed_sk IS NOT NULL ORDER BY customer_bk, ord
+  ) f
+  WHERE d.customer_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_customer (customer_bk,email,country,kyc_level,risk_band,is_current,valid_from,valid_to,version)
+  SELECT customer_bk, email, country, kyc_level, risk_band, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_customer
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
+
+-- DIM ACCOUNT
+CREATE OR REPLACE FUNCTION cur.merge_dim_account(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_account;
+  CREATE TEMP TABLE tmp_scd_account ON COMMIT DROP AS
+  WITH batch AS (
+    SELECT id AS account_bk, customer_id AS customer_bk, currency, country, status,
+           GREATEST(created_at, updated_at) AS as_of,
+           row_number() OVER (ORDER BY GREATEST(created_at, updated_at), id) AS ord
+    FROM stg.accounts
+    WHERE GREATEST(created_at, updated_at) > p_since
+  ),
+  seq AS (
+    SELECT d.account_bk, d.customer_bk, d.currency, d.country, d.status,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.account_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (account_bk) * FROM cur.dim_account
+      WHERE is_current AND account_bk IN (SELECT account_bk FROM batch)
+      ORDER BY account_bk, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT account_bk, customer_bk, currency, country, status, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY account_bk ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY account_bk) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY account_bk), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(customer_bk, currency, country, status)::text) AS h FROM seq
+    ) s
+  )
+  SELECT account_bk, customer_bk, currency, country, status, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY account_bk ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY account_bk ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_account d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (account_bk) seed_sk, as_of FROM tmp_scd_account
+    WHERE seed_sk IS NOT NULL ORDER BY account_bk, ord
+  ) f
+  WHERE d.account_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_account (account_bk,customer_bk,currency,country,status,is_current,valid_from,valid_to,version)
+  SELECT account_bk, customer_bk, currency, country, status, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_account
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
+
+-- DIM MERCHANT (several (name, category, country) rows can share one normalized
+-- name within a batch; they are applied in as_of order)
+CREATE OR REPLACE FUNCTION cur.merge_dim_merchant(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_merchant;
+  CREATE TEMP TABLE tmp_scd_merchant ON COMMIT DROP AS
+  WITH src AS (
+    SELECT lower(btrim(merchant_name)) AS merchant_name_norm, merchant_category, country,
+           MIN(created_at) AS as_of
+    FROM stg.transactions
+    WHERE created_at > p_since
+    GROUP BY merchant_name, merchant_category, country
+  ),
+  batch AS (
+    SELECT src.*,
+           row_number() OVER (ORDER BY as_of, merchant_name_norm, merchant_category, country) AS ord
+    FROM src
+  ),
+  seq AS (
+    SELECT d.merchant_name_norm, d.merchant_category, d.country,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.merchant_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (merchant_name_norm) * FROM cur.dim_merchant
+      WHERE is_current AND merchant_name_norm IN (SELECT merchant_name_norm FROM batch)
+      ORDER BY merchant_name_norm, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT merchant_name_norm, merchant_category, country, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY merchant_name_norm) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY merchant_name_norm), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(COALESCE(merchant_category,''), COALESCE(country,''))::text) AS h FROM seq
+    ) s
+  )
+  SELECT merchant_name_norm, merchant_category, country, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_merchant d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (merchant_name_norm) seed_sk, as_of FROM tmp_scd_merchant
+    WHERE seed_sk IS NOT NULL ORDER BY merchant_name_norm, ord
+  ) f
+  WHERE d.merchant_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_merchant (merchant_name_norm, merchant_category, country, is_current, valid_from, valid_to, version)
+  SELECT merchant_name_norm, merchant_category, country, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_merchant
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
 -- Daily GMV (gross merchandise volume) per currency
 CREATE MATERIALIZED VIEW IF NOT EXISTS cur.mv_gmv_daily_currency AS
 SELECT
@@ -329,19 +754,167 @@ GROUP BY 1,2;
 
 CREATE INDEX IF NOT EXISTS mv_gmv_daily_currency_day_idx
   ON cur.mv_gmv_daily_currency(day_utc, currency);
+-- Unique indexes allow REFRESH MATERIALIZED VIEW CONCURRENTLY (repairs only;
+-- the hourly load maintains cur.gmv_daily instead)
+CREATE UNIQUE INDEX IF NOT EXISTS mv_gmv_daily_currency_uidx
+  ON cur.mv_gmv_daily_currency(day_utc, currency);
 
--- Top merchants (7d) by amount
-CREATE MATERIALIZED VIEW IF NOT EXISTS cur.mv_top_merchants_7d AS
-WITH recent AS (
-  SELECT * FROM cur.fact_transactions
-  WHERE created_at >= NOW() - INTERVAL '7 days'
-)
-SELECT
-  m.merchant_name_norm,
-  COUNT(*)     AS tx_count,
-  SUM(r.amount) AS total_amount
-FROM recent r
-JOIN cur.dim_merchant m ON m.merchant_sk = r.merchant_sk AND m.is_current
-GROUP BY 1
-ORDER BY total_amount DESC
-LIMIT 50;
+-- ========= GMV rollups (hourly / daily / monthly) =========
+-- Pre-aggregated GMV per currency at three granularities.
+-- Maintained incrementally by curated_load: every run adds only the facts it
+-- inserted, so the cost is proportional to new data, not history.
+-- bucket_start is the UTC-aligned start of the bucket (hour / day / month).
+
+CREATE TABLE IF NOT EXISTS cur.gmv_hourly (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.gmv_daily (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.gmv_monthly (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+-- Repairs only rebuild what the attached facts still cover: buckets older than
+-- the oldest attached partition (detached by retention, or archived) are kept,
+-- and a month is only rebuilt when all its days are attached. Returns the first
+-- day to rebuild (p_from, raised to the oldest attached partition), NULL when
+-- no partition is attached.
+CREATE OR REPLACE FUNCTION cur.rollup_rebuild_from(p_from date DEFAULT NULL)
+RETURNS date LANGUAGE sql STABLE AS $$
+  SELECT CASE WHEN p_from IS NULL THEN MIN(range_start) ELSE GREATEST(p_from, MIN(range_start)) END
+  FROM cur.v_fact_partitions
+$$;
+
+-- First UTC month starting on or after p_day.
+CREATE OR REPLACE FUNCTION cur.rollup_month_from(p_day date)
+RETURNS date LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN date_trunc('month', p_day)::date = p_day THEN p_day
+              ELSE (date_trunc('month', p_day) + interval '1 month')::date END
+$$;
+
+-- Rebuild from cur.fact_transactions (initial backfill / repair), from p_from
+-- on (default: the oldest attached partition). The advisory lock serialises it
+-- with the incremental maintenance in curated_load.
+DROP FUNCTION IF EXISTS cur.rebuild_gmv_rollups();
+CREATE OR REPLACE FUNCTION cur.rebuild_gmv_rollups(p_from date DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  v_from  date;
+  v_month date;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('cur.gmv_rollups'));
+  v_from := cur.rollup_rebuild_from(p_from);
+  IF v_from IS NULL THEN
+    RETURN;
+  END IF;
+  v_month := cur.rollup_month_from(v_from);
+
+  DELETE FROM cur.gmv_hourly WHERE bucket_start >= v_from::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_hourly (bucket_start, currency, tx_count, total_amount)
+  SELECT date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_from
+  GROUP BY 1, 2;
+
+  DELETE FROM cur.gmv_daily WHERE bucket_start >= v_from::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_daily (bucket_start, currency, tx_count, total_amount)
+  SELECT created_date::timestamp AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_from
+  GROUP BY 1, 2;
+
+  DELETE FROM cur.gmv_monthly WHERE bucket_start >= v_month::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_monthly (bucket_start, currency, tx_count, total_amount)
+  SELECT date_trunc('month', created_date::timestamp) AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_month
+  GROUP BY 1, 2;
+END$$;
+
+-- ========= Merchant rollups (daily / monthly) =========
+-- Per (UTC day or month, merchant, country, currency) totals, maintained like
+-- the GMV rollups from each fact load's delta. Merchants are keyed by
+-- merchant_name_norm, so facts of every SCD version of a merchant count
+-- towards it; country is the transaction's. /merchants/top reads whole months
+-- from merchant_gmv_monthly and the edges from merchant_gmv_daily, so a 90-day
+-- top-K reads about two months of rows plus at most two partial months of days.
+
+CREATE TABLE IF NOT EXISTS cur.merchant_gmv_daily (
+  day_utc            DATE          NOT NULL,
+  merchant_name_norm TEXT          NOT NULL,
+  country            CHAR(2)       NOT NULL,
+  currency           CHAR(3)       NOT NULL,
+  tx_count           BIGINT        NOT NULL,
+  total_amount       NUMERIC(24,6) NOT NULL,
+  updated_at         TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (day_utc, merchant_name_norm, country, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.merchant_gmv_monthly (
+  month_start        DATE          NOT NULL,   -- first day of the UTC month
+  merchant_name_norm TEXT          NOT NULL,
+  country            CHAR(2)       NOT NULL,
+  currency           CHAR(3)       NOT NULL,
+  tx_count           BIGINT        NOT NULL,
+  total_amount       NUMERIC(24,6) NOT NULL,
+  updated_at         TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (month_start, merchant_name_norm, country, currency)
+);
+
+-- Replaced by the rollups above (fixed 7-day window, current merchant version only)
+DROP MATERIALIZED VIEW IF EXISTS cur.mv_top_merchants_7d;
+DROP FUNCTION IF EXISTS cur.refresh_top_merchants_7d();
+DROP FUNCTION IF EXISTS cur.rebuild_merchant_daily(date);
+DROP TABLE IF EXISTS cur.top_merchants_7d;
+DROP TABLE IF EXISTS cur.merchant_daily;
+
+-- Repair: rebuild the merchant rollups from facts, from p_from on (default:
+-- the oldest attached partition; see cur.rollup_rebuild_from). Runs alongside
+-- readers (MVCC); the advisory lock serialises it with the incremental
+-- maintenance in curated_load so no delta is lost or doubled.
+CREATE OR REPLACE FUNCTION cur.rebuild_merchant_rollups(p_from date DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  v_from  date;
+  v_month date;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('cur.merchant_gmv'));
+  v_from := cur.rollup_rebuild_from(p_from);
+  IF v_from IS NULL THEN
+    RETURN;
+  END IF;
+  v_month := cur.rollup_month_from(v_from);
+
+  DELETE FROM cur.merchant_gmv_daily WHERE day_utc >= v_from;
+  INSERT INTO cur.merchant_gmv_daily (day_utc, merchant_name_norm, country, currency, tx_count, total_amount)
+  SELECT f.created_date, m.merchant_name_norm, f.country, f.currency, COUNT(*), SUM(f.amount)
+  FROM cur.fact_transactions f
+  JOIN cur.dim_merchant m ON m.merchant_sk = f.merchant_sk
+  WHERE f.created_date >= v_from
+  GROUP BY 1, 2, 3, 4;
+
+  DELETE FROM cur.merchant_gmv_monthly WHERE month_start >= v_month;
+  INSERT INTO cur.merchant_gmv_monthly (month_start, merchant_name_norm, country, currency, tx_count, total_amount)
+  SELECT date_trunc('month', day_utc)::date, merchant_name_norm, country, currency, SUM(tx_count), SUM(total_amount)
+  FROM cur.merchant_gmv_daily
+  WHERE day_utc >= v_month
+  GROUP BY 1, 2, 3, 4;
+END$$;
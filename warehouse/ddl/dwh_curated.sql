@@ -5,6 +5,7 @@ CREATE SCHEMA IF NOT EXISTS cur;
 -- ========= Utility =========
 CREATE EXTENSION IF NOT EXISTS pgcrypto;  -- for UUID helpers if needed
 CREATE EXTENSION IF NOT EXISTS citext;    -- case-insensitive text (email)
+CREATE EXTENSION IF NOT EXISTS btree_gist; -- GiST over (bk, tstzrange) for SK lookups
 
 -- ========= DIMENSIONS (SCD2) =========
 -- Conventions:
@@ -116,29 +117,220 @@ FOR EACH ROW EXECUTE FUNCTION cur.sync_created_date();
 
 -- Helpful indexes on each partition will be added automatically via template (see function below)
 
--- ========= Partition helper: ensure month partition exists =========
+-- ========= Partition lifecycle =========
+-- Single-row settings read by the functions below; change with e.g.
+--   UPDATE cur.fact_partition_config SET granularity = 'day', premake = 14;
+-- Existing partitions keep their bounds: new ones are clamped so they never
+-- overlap partitions created under another granularity.
+CREATE TABLE IF NOT EXISTS cur.fact_partition_config (
+  id                   BOOLEAN     PRIMARY KEY DEFAULT TRUE CHECK (id),
+  granularity          TEXT        NOT NULL DEFAULT 'month' CHECK (granularity IN ('day','week','month')),
+  premake              INTEGER     NOT NULL DEFAULT 2 CHECK (premake >= 0),  -- partitions kept ahead of today's
+  retention            INTERVAL,                                            -- NULL = keep forever
+  brin_pages_per_range INTEGER     NOT NULL DEFAULT 32 CHECK (brin_pages_per_range > 0),
+  archive_detached     BOOLEAN     NOT NULL DEFAULT FALSE,                  -- keep detached tables until archived
+  updated_at           TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+INSERT INTO cur.fact_partition_config DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Partitions detached by the retention policy
+CREATE TABLE IF NOT EXISTS cur.detached_fact_partitions (
+  partition_name TEXT        PRIMARY KEY,
+  range_start    DATE        NOT NULL,
+  range_end      DATE        NOT NULL,
+  detached_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  dropped_at     TIMESTAMPTZ
+);
+-- Cold tier (fact_archive DAG): Parquet file the partition was exported to
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archive_path  TEXT;
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archived_at   TIMESTAMPTZ;
+ALTER TABLE cur.detached_fact_partitions ADD COLUMN IF NOT EXISTS archived_rows BIGINT;
+
+-- Ensure the partition covering p_date exists. Time-ordered, append-mostly data:
+-- BRIN on (created_at, created_date) for range scans, B-trees only for the
+-- point lookups by account / customer.
 CREATE OR REPLACE FUNCTION cur.ensure_fact_partition(p_date date)
 RETURNS void LANGUAGE plpgsql AS $$
 DECLARE
-  start_date date := date_trunc('month', p_date)::date;
-  end_date   date := (date_trunc('month', p_date) + interval '1 month')::date;
-  part_name  text := format('fact_transactions_y%sm%s', to_char(start_date,'YYYY'), to_char(start_date,'MM'));
+  cfg        cur.fact_partition_config%ROWTYPE;
+  start_date date;
+  end_date   date;
+  part_name  text;
   ddl        text;
 BEGIN
-  IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid=c.relnamespace
-                 WHERE c.relkind = 'r' AND n.nspname='cur' AND c.relname=part_name) THEN
-    ddl := format($f$
-      CREATE TABLE cur.%1$s PARTITION OF cur.fact_transactions
-      FOR VALUES FROM ('%2$s') TO ('%3$s');
-      CREATE INDEX %1$s_account_sk_idx ON cur.%1$s (account_sk, created_at);
-      CREATE INDEX %1$s_customer_sk_idx ON cur.%1$s (customer_sk, created_at);
-      CREATE INDEX %1$s_currency_date_idx ON cur.%1$s (currency, created_date);
-    $f$, part_name, start_date, end_date);
-    EXECUTE ddl;
+  IF EXISTS (SELECT 1 FROM cur.v_fact_partitions WHERE range_start <= p_date AND p_date < range_end) THEN
+    RETURN;
+  END IF;
+  -- concurrent loads must not race on the same bounds
+  PERFORM pg_advisory_xact_lock(hashtext('cur.fact_transactions:partitions'));
+  IF EXISTS (SELECT 1 FROM cur.v_fact_partitions WHERE range_start <= p_date AND p_date < range_end) THEN
+    RETURN;
+  END IF;
+
+  SELECT * INTO cfg FROM cur.fact_partition_config;
+  start_date := date_trunc(cfg.granularity, p_date)::date;
+  end_date   := (start_date + ('1 ' || cfg.granularity)::interval)::date;
+  start_date := GREATEST(start_date, (SELECT MAX(range_end) FROM cur.v_fact_partitions WHERE range_end <= p_date));
+  end_date   := LEAST(end_date, (SELECT MIN(range_start) FROM cur.v_fact_partitions WHERE range_start > p_date));
+
+  IF cfg.granularity = 'month' AND start_date = date_trunc('month', start_date)::date
+     AND end_date = (start_date + interval '1 month')::date THEN
+    part_name := format('fact_transactions_y%sm%s', to_char(start_date,'YYYY'), to_char(start_date,'MM'));
+  ELSE
+    part_name := format('fact_transactions_p%s', to_char(start_date,'YYYYMMDD'));
+  END IF;
+
+  ddl := format($f$
+    CREATE TABLE cur.%1$s PARTITION OF cur.fact_transactions
+    FOR VALUES FROM ('%2$s') TO ('%3$s');
+    CREATE INDEX %1$s_account_sk_idx ON cur.%1$s (account_sk, created_at);
+    CREATE INDEX %1$s_customer_sk_idx ON cur.%1$s (customer_sk, created_at);
+    CREATE INDEX %1$s_time_brin ON cur.%1$s USING brin (created_at, created_date)
+      WITH (pages_per_range = %4$s);
+  $f$, part_name, start_date, end_date, cfg.brin_pages_per_range);
+  EXECUTE ddl;
+END$$;
+
+-- ========= Partition catalog: attached fact partitions and their bounds =========
+-- Lets readers (exports, maintenance) target only the partitions covering a range.
+CREATE OR REPLACE VIEW cur.v_fact_partitions AS
+SELECT
+  c.relname AS partition_name,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$FROM \('([^']+)'\)$re$)::date AS range_start,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$TO \('([^']+)'\)$re$)::date   AS range_end
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'cur.fact_transactions'::regclass;
+
+-- Ensure partitions for every date in [p_from, p_to]; one call per partition.
+CREATE OR REPLACE FUNCTION cur.ensure_fact_partitions(p_from date, p_to date)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE d date := p_from;
+BEGIN
+  WHILE d <= p_to LOOP
+    PERFORM cur.ensure_fact_partition(d);
+    SELECT range_end INTO d FROM cur.v_fact_partitions WHERE range_start <= d AND d < range_end;
+  END LOOP;
+END$$;
+
+-- Keep today's partition and the next `premake` ones (config default) in place,
+-- so loads never pay for DDL or take the parent's lock.
+CREATE OR REPLACE FUNCTION cur.premake_fact_partitions(p_ahead integer DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  d date := (NOW() AT TIME ZONE 'UTC')::date;
+  n integer;
+BEGIN
+  SELECT COALESCE(p_ahead, premake) INTO n FROM cur.fact_partition_config;
+  FOR i IN 0..n LOOP
+    PERFORM cur.ensure_fact_partition(d);
+    SELECT range_end INTO d FROM cur.v_fact_partitions WHERE range_start <= d AND d < range_end;
+  END LOOP;
+END$$;
+
+-- Detach partitions that ended before NOW() - retention and record them in
+-- cur.detached_fact_partitions; detached tables are dropped right away unless
+-- archive_detached is set (then the archive job drops them once exported).
+-- Pending facts older than the cutoff are discarded with them.
+CREATE OR REPLACE FUNCTION cur.apply_fact_retention()
+RETURNS TABLE (part_name text, action text) LANGUAGE plpgsql AS $$
+DECLARE
+  cfg    cur.fact_partition_config%ROWTYPE;
+  cutoff date;
+  p      record;
+BEGIN
+  SELECT * INTO cfg FROM cur.fact_partition_config;
+  IF cfg.retention IS NULL THEN
+    RETURN;
+  END IF;
+  cutoff := ((NOW() AT TIME ZONE 'UTC') - cfg.retention)::date;
+
+  FOR p IN
+    SELECT v.partition_name, v.range_start, v.range_end FROM cur.v_fact_partitions v
+    WHERE v.range_end <= cutoff ORDER BY v.range_start
+  LOOP
+    EXECUTE format('ALTER TABLE cur.fact_transactions DETACH PARTITION cur.%I', p.partition_name);
+    INSERT INTO cur.detached_fact_partitions AS d (partition_name, range_start, range_end)
+    VALUES (p.partition_name, p.range_start, p.range_end)
+    ON CONFLICT (partition_name) DO UPDATE SET detached_at = NOW(), dropped_at = NULL;
+    part_name := p.partition_name; action := 'detached';
+    RETURN NEXT;
+  END LOOP;
+
+  DELETE FROM cur.pending_facts pf WHERE pf.created_at < cutoff::timestamp AT TIME ZONE 'UTC';
+
+  IF NOT cfg.archive_detached THEN
+    FOR p IN SELECT d.partition_name FROM cur.detached_fact_partitions d WHERE d.dropped_at IS NULL ORDER BY d.range_start LOOP
+      EXECUTE format('DROP TABLE IF EXISTS cur.%I', p.partition_name);
+      UPDATE cur.detached_fact_partitions d SET dropped_at = NOW() WHERE d.partition_name = p.partition_name;
+      part_name := p.partition_name; action := 'dropped';
+      RETURN NEXT;
+    END LOOP;
   END IF;
 END$$;
 
+-- Size report per attached partition
+CREATE OR REPLACE VIEW cur.v_fact_partition_sizes AS
+SELECT
+  p.partition_name,
+  p.range_start,
+  p.range_end,
+  c.reltuples::bigint                           AS est_rows,
+  pg_table_size(c.oid)                          AS table_bytes,
+  pg_indexes_size(c.oid)                        AS index_bytes,
+  pg_total_relation_size(c.oid)                 AS total_bytes,
+  pg_size_pretty(pg_total_relation_size(c.oid)) AS total_pretty
+FROM cur.v_fact_partitions p
+JOIN pg_class c ON c.relname = p.partition_name AND c.relnamespace = 'cur'::regnamespace
+ORDER BY p.range_start;
+
+-- ----- pending facts -----
+-- Transactions whose account / customer / merchant version did not resolve
+-- yet (late-arriving dimensions). curated_load retries them every run from
+-- stg.transactions by primary key and removes them once they load.
+CREATE TABLE IF NOT EXISTS cur.pending_facts (
+  transaction_bk   UUID        PRIMARY KEY,
+  created_at       TIMESTAMPTZ NOT NULL,
+  missing          TEXT[]      NOT NULL,   -- subset of {account,customer,merchant}
+  attempts         INTEGER     NOT NULL DEFAULT 1,
+  first_seen_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_attempt_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_pending_facts_created ON cur.pending_facts(created_at);
+
+CREATE OR REPLACE VIEW cur.v_pending_facts_metrics AS
+SELECT
+  COUNT(*)                                             AS pending,
+  COUNT(*) FILTER (WHERE 'account'  = ANY(missing))    AS missing_account,
+  COUNT(*) FILTER (WHERE 'customer' = ANY(missing))    AS missing_customer,
+  COUNT(*) FILTER (WHERE 'merchant' = ANY(missing))    AS missing_merchant,
+  MIN(created_at)                                      AS oldest_created_at,
+  MAX(NOW() - first_seen_at)                           AS max_age,
+  MAX(attempts)                                        AS max_attempts,
+  ROUND(AVG(attempts), 2)                              AS avg_attempts
+FROM cur.pending_facts;
+
+-- ----- chunked fact load checkpoints -----
+-- One row per created_date chunk of a curated_load run in chunked mode
+-- (CURATED_FACT_LOAD_MODE=chunked). Each chunk loads, updates the summaries and
+-- flips to DONE in one transaction, so a retried run skips finished chunks and a
+-- failed chunk leaves the others committed. The fact watermark only moves to
+-- `until` once every chunk of the load is DONE.
+CREATE TABLE IF NOT EXISTS cur.fact_load_chunks (
+  load_id       TEXT        NOT NULL,
+  chunk_date    DATE        NOT NULL,
+  since         TIMESTAMPTZ NOT NULL,   -- watermark the load was planned from (exclusive)
+  until         TIMESTAMPTZ NOT NULL,   -- MAX(stg.transactions.created_at) at planning (inclusive)
+  status        TEXT        NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING','RUNNING','DONE','FAILED')),
+  attempts      INTEGER     NOT NULL DEFAULT 0,
+  rows_loaded   BIGINT      NOT NULL DEFAULT 0,
+  rows_pending  BIGINT      NOT NULL DEFAULT 0,
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (load_id, chunk_date)
+);
+
 -- Create partitions for last month, current month, next month (handy for dev)
 SELECT cur.ensure_fact_partition( (CURRENT_DATE - INTERVAL '1 month')::date );
 SELECT cur.ensure_fact_partition( CURRENT_DATE );
 SELECT cur.ensure_fact_partition( (CURRENT_DATE + INTERVAL '1 month')::date );
+SELECT cur.premake_fact_partitions();
@@ -116,3 +116,189 @@ BEGIN
 
   RETURN cur_row.merchant_sk;
 END$$ LANGUAGE plpgsql;
+
+-- ========== Set-based SCD2 merges ==========
+-- Same version history as calling cur.upsert_dim_* once per staging row in
+-- as_of order, in a few statements per batch:
+--   1. the key's current version (ord 0) and the batch rows (ord 1..n) are
+--      hashed and each compared with the row before it (LAG); rows that differ
+--      are the new versions
+--   2. the current versions are closed at their key's first new as_of
+--   3. the new versions are inserted, each closed by the next one (LEAD)
+-- Hashes mirror the IS DISTINCT FROM checks of the row functions (citext email
+-- compares case-insensitively, merchant attrs are COALESCEd to '').
+-- Returns the number of versions inserted.
+
+-- DIM CUSTOMER
+CREATE OR REPLACE FUNCTION cur.merge_dim_customer(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_customer;
+  CREATE TEMP TABLE tmp_scd_customer ON COMMIT DROP AS
+  WITH batch AS (
+    SELECT id AS customer_bk, email, country, kyc_level, risk_band,
+           GREATEST(created_at, updated_at) AS as_of,
+           row_number() OVER (ORDER BY GREATEST(created_at, updated_at), id) AS ord
+    FROM stg.customers
+    WHERE GREATEST(created_at, updated_at) > p_since
+  ),
+  seq AS (
+    SELECT d.customer_bk, d.email, d.country, d.kyc_level, d.risk_band,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.customer_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (customer_bk) * FROM cur.dim_customer
+      WHERE is_current AND customer_bk IN (SELECT customer_bk FROM batch)
+      ORDER BY customer_bk, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT customer_bk, email, country, kyc_level, risk_band, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY customer_bk ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY customer_bk) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY customer_bk), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(lower(email::text), country, kyc_level, risk_band)::text) AS h FROM seq
+    ) s
+  )
+  SELECT customer_bk, email, country, kyc_level, risk_band, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY customer_bk ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY customer_bk ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_customer d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (customer_bk) seed_sk, as_of FROM tmp_scd_customer
+    WHERE seed_sk IS NOT NULL ORDER BY customer_bk, ord
+  ) f
+  WHERE d.customer_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_customer (customer_bk,email,country,kyc_level,risk_band,is_current,valid_from,valid_to,version)
+  SELECT customer_bk, email, country, kyc_level, risk_band, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_customer
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
+
+-- DIM ACCOUNT
+CREATE OR REPLACE FUNCTION cur.merge_dim_account(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_account;
+  CREATE TEMP TABLE tmp_scd_account ON COMMIT DROP AS
+  WITH batch AS (
+    SELECT id AS account_bk, customer_id AS customer_bk, currency, country, status,
+           GREATEST(created_at, updated_at) AS as_of,
+           row_number() OVER (ORDER BY GREATEST(created_at, updated_at), id) AS ord
+    FROM stg.accounts
+    WHERE GREATEST(created_at, updated_at) > p_since
+  ),
+  seq AS (
+    SELECT d.account_bk, d.customer_bk, d.currency, d.country, d.status,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.account_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (account_bk) * FROM cur.dim_account
+      WHERE is_current AND account_bk IN (SELECT account_bk FROM batch)
+      ORDER BY account_bk, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT account_bk, customer_bk, currency, country, status, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY account_bk ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY account_bk) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY account_bk), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(customer_bk, currency, country, status)::text) AS h FROM seq
+    ) s
+  )
+  SELECT account_bk, customer_bk, currency, country, status, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY account_bk ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY account_bk ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_account d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (account_bk) seed_sk, as_of FROM tmp_scd_account
+    WHERE seed_sk IS NOT NULL ORDER BY account_bk, ord
+  ) f
+  WHERE d.account_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_account (account_bk,customer_bk,currency,country,status,is_current,valid_from,valid_to,version)
+  SELECT account_bk, customer_bk, currency, country, status, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_account
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
+
+-- DIM MERCHANT (several (name, category, country) rows can share one normalized
+-- name within a batch; they are applied in as_of order)
+CREATE OR REPLACE FUNCTION cur.merge_dim_merchant(p_since timestamptz)
+RETURNS integer AS $$
+DECLARE n integer;
+BEGIN
+  DROP TABLE IF EXISTS tmp_scd_merchant;
+  CREATE TEMP TABLE tmp_scd_merchant ON COMMIT DROP AS
+  WITH src AS (
+    SELECT lower(btrim(merchant_name)) AS merchant_name_norm, merchant_category, country,
+           MIN(created_at) AS as_of
+    FROM stg.transactions
+    WHERE created_at > p_since
+    GROUP BY merchant_name, merchant_category, country
+  ),
+  batch AS (
+    SELECT src.*,
+           row_number() OVER (ORDER BY as_of, merchant_name_norm, merchant_category, country) AS ord
+    FROM src
+  ),
+  seq AS (
+    SELECT d.merchant_name_norm, d.merchant_category, d.country,
+           NULL::timestamptz AS as_of, 0::bigint AS ord, d.merchant_sk AS cur_sk, d.version AS cur_version
+    FROM (
+      SELECT DISTINCT ON (merchant_name_norm) * FROM cur.dim_merchant
+      WHERE is_current AND merchant_name_norm IN (SELECT merchant_name_norm FROM batch)
+      ORDER BY merchant_name_norm, valid_from DESC
+    ) d
+    UNION ALL
+    SELECT merchant_name_norm, merchant_category, country, as_of, ord, NULL, NULL FROM batch
+  ),
+  cmp AS (
+    SELECT s.*,
+           LAG(s.h) OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS prev_h,
+           MAX(cur_sk) OVER (PARTITION BY merchant_name_norm) AS seed_sk,
+           COALESCE(MAX(cur_version) OVER (PARTITION BY merchant_name_norm), 0) AS seed_version
+    FROM (
+      SELECT seq.*, md5(ROW(COALESCE(merchant_category,''), COALESCE(country,''))::text) AS h FROM seq
+    ) s
+  )
+  SELECT merchant_name_norm, merchant_category, country, as_of, ord, seed_sk,
+         seed_version + row_number() OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS version,
+         LEAD(as_of) OVER (PARTITION BY merchant_name_norm ORDER BY ord) AS valid_to
+  FROM cmp
+  WHERE ord > 0 AND h IS DISTINCT FROM prev_h;
+
+  UPDATE cur.dim_merchant d
+  SET is_current = FALSE, valid_to = f.as_of
+  FROM (
+    SELECT DISTINCT ON (merchant_name_norm) seed_sk, as_of FROM tmp_scd_merchant
+    WHERE seed_sk IS NOT NULL ORDER BY merchant_name_norm, ord
+  ) f
+  WHERE d.merchant_sk = f.seed_sk;
+
+  INSERT INTO cur.dim_merchant (merchant_name_norm, merchant_category, country, is_current, valid_from, valid_to, version)
+  SELECT merchant_name_norm, merchant_category, country, valid_to IS NULL, as_of, valid_to, version
+  FROM tmp_scd_merchant
+  ORDER BY ord;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$ LANGUAGE plpgsql;
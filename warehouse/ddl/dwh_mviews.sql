@@ -10,19 +10,7 @@ GROUP BY 1,2;
 
 CREATE INDEX IF NOT EXISTS mv_gmv_daily_currency_day_idx
   ON cur.mv_gmv_daily_currency(day_utc, currency);
-
--- Top merchants (7d) by amount
-CREATE MATERIALIZED VIEW IF NOT EXISTS cur.mv_top_merchants_7d AS
-WITH recent AS (
-  SELECT * FROM cur.fact_transactions
-  WHERE created_at >= NOW() - INTERVAL '7 days'
-)
-SELECT
-  m.merchant_name_norm,
-  COUNT(*)     AS tx_count,
-  SUM(r.amount) AS total_amount
-FROM recent r
-JOIN cur.dim_merchant m ON m.merchant_sk = r.merchant_sk AND m.is_current
-GROUP BY 1
-ORDER BY total_amount DESC
-LIMIT 50;
+-- Unique indexes allow REFRESH MATERIALIZED VIEW CONCURRENTLY (repairs only;
+-- the hourly load maintains cur.gmv_daily instead)
+CREATE UNIQUE INDEX IF NOT EXISTS mv_gmv_daily_currency_uidx
+  ON cur.mv_gmv_daily_currency(day_utc, currency);
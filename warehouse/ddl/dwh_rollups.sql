@@ -0,0 +1,159 @@
+-- ========= GMV rollups (hourly / daily / monthly) =========
+-- Pre-aggregated GMV per currency at three granularities.
+-- Maintained incrementally by curated_load: every run adds only the facts it
+-- inserted, so the cost is proportional to new data, not history.
+-- bucket_start is the UTC-aligned start of the bucket (hour / day / month).
+
+CREATE TABLE IF NOT EXISTS cur.gmv_hourly (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.gmv_daily (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.gmv_monthly (
+  bucket_start  TIMESTAMPTZ   NOT NULL,
+  currency      CHAR(3)       NOT NULL,
+  tx_count      BIGINT        NOT NULL,
+  total_amount  NUMERIC(24,6) NOT NULL,
+  updated_at    TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (bucket_start, currency)
+);
+
+-- Repairs only rebuild what the attached facts still cover: buckets older than
+-- the oldest attached partition (detached by retention, or archived) are kept,
+-- and a month is only rebuilt when all its days are attached. Returns the first
+-- day to rebuild (p_from, raised to the oldest attached partition), NULL when
+-- no partition is attached.
+CREATE OR REPLACE FUNCTION cur.rollup_rebuild_from(p_from date DEFAULT NULL)
+RETURNS date LANGUAGE sql STABLE AS $$
+  SELECT CASE WHEN p_from IS NULL THEN MIN(range_start) ELSE GREATEST(p_from, MIN(range_start)) END
+  FROM cur.v_fact_partitions
+$$;
+
+-- First UTC month starting on or after p_day.
+CREATE OR REPLACE FUNCTION cur.rollup_month_from(p_day date)
+RETURNS date LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN date_trunc('month', p_day)::date = p_day THEN p_day
+              ELSE (date_trunc('month', p_day) + interval '1 month')::date END
+$$;
+
+-- Rebuild from cur.fact_transactions (initial backfill / repair), from p_from
+-- on (default: the oldest attached partition). The advisory lock serialises it
+-- with the incremental maintenance in curated_load.
+DROP FUNCTION IF EXISTS cur.rebuild_gmv_rollups();
+CREATE OR REPLACE FUNCTION cur.rebuild_gmv_rollups(p_from date DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  v_from  date;
+  v_month date;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('cur.gmv_rollups'));
+  v_from := cur.rollup_rebuild_from(p_from);
+  IF v_from IS NULL THEN
+    RETURN;
+  END IF;
+  v_month := cur.rollup_month_from(v_from);
+
+  DELETE FROM cur.gmv_hourly WHERE bucket_start >= v_from::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_hourly (bucket_start, currency, tx_count, total_amount)
+  SELECT date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_from
+  GROUP BY 1, 2;
+
+  DELETE FROM cur.gmv_daily WHERE bucket_start >= v_from::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_daily (bucket_start, currency, tx_count, total_amount)
+  SELECT created_date::timestamp AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_from
+  GROUP BY 1, 2;
+
+  DELETE FROM cur.gmv_monthly WHERE bucket_start >= v_month::timestamp AT TIME ZONE 'UTC';
+  INSERT INTO cur.gmv_monthly (bucket_start, currency, tx_count, total_amount)
+  SELECT date_trunc('month', created_date::timestamp) AT TIME ZONE 'UTC', currency, COUNT(*), SUM(amount)
+  FROM cur.fact_transactions
+  WHERE created_date >= v_month
+  GROUP BY 1, 2;
+END$$;
+
+-- ========= Merchant rollups (daily / monthly) =========
+-- Per (UTC day or month, merchant, country, currency) totals, maintained like
+-- the GMV rollups from each fact load's delta. Merchants are keyed by
+-- merchant_name_norm, so facts of every SCD version of a merchant count
+-- towards it; country is the transaction's. /merchants/top reads whole months
+-- from merchant_gmv_monthly and the edges from merchant_gmv_daily, so a 90-day
+-- top-K reads about two months of rows plus at most two partial months of days.
+
+CREATE TABLE IF NOT EXISTS cur.merchant_gmv_daily (
+  day_utc            DATE          NOT NULL,
+  merchant_name_norm TEXT          NOT NULL,
+  country            CHAR(2)       NOT NULL,
+  currency           CHAR(3)       NOT NULL,
+  tx_count           BIGINT        NOT NULL,
+  total_amount       NUMERIC(24,6) NOT NULL,
+  updated_at         TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (day_utc, merchant_name_norm, country, currency)
+);
+
+CREATE TABLE IF NOT EXISTS cur.merchant_gmv_monthly (
+  month_start        DATE          NOT NULL,   -- first day of the UTC month
+  merchant_name_norm TEXT          NOT NULL,
+  country            CHAR(2)       NOT NULL,
+  currency           CHAR(3)       NOT NULL,
+  tx_count           BIGINT        NOT NULL,
+  total_amount       NUMERIC(24,6) NOT NULL,
+  updated_at         TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (month_start, merchant_name_norm, country, currency)
+);
+
+-- Replaced by the rollups above (fixed 7-day window, current merchant version only)
+DROP MATERIALIZED VIEW IF EXISTS cur.mv_top_merchants_7d;
+DROP FUNCTION IF EXISTS cur.refresh_top_merchants_7d();
+DROP FUNCTION IF EXISTS cur.rebuild_merchant_daily(date);
+DROP TABLE IF EXISTS cur.top_merchants_7d;
+DROP TABLE IF EXISTS cur.merchant_daily;
+
+-- Repair: rebuild the merchant rollups from facts, from p_from on (default:
+-- the oldest attached partition; see cur.rollup_rebuild_from). Runs alongside
+-- readers (MVCC); the advisory lock serialises it with the incremental
+-- maintenance in curated_load so no delta is lost or doubled.
+CREATE OR REPLACE FUNCTION cur.rebuild_merchant_rollups(p_from date DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  v_from  date;
+  v_month date;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('cur.merchant_gmv'));
+  v_from := cur.rollup_rebuild_from(p_from);
+  IF v_from IS NULL THEN
+    RETURN;
+  END IF;
+  v_month := cur.rollup_month_from(v_from);
+
+  DELETE FROM cur.merchant_gmv_daily WHERE day_utc >= v_from;
+  INSERT INTO cur.merchant_gmv_daily (day_utc, merchant_name_norm, country, currency, tx_count, total_amount)
+  SELECT f.created_date, m.merchant_name_norm, f.country, f.currency, COUNT(*), SUM(f.amount)
+  FROM cur.fact_transactions f
+  JOIN cur.dim_merchant m ON m.merchant_sk = f.merchant_sk
+  WHERE f.created_date >= v_from
+  GROUP BY 1, 2, 3, 4;
+
+  DELETE FROM cur.merchant_gmv_monthly WHERE month_start >= v_month;
+  INSERT INTO cur.merchant_gmv_monthly (month_start, merchant_name_norm, country, currency, tx_count, total_amount)
+  SELECT date_trunc('month', day_utc)::date, merchant_name_norm, country, currency, SUM(tx_count), SUM(total_amount)
+  FROM cur.merchant_gmv_daily
+  WHERE day_utc >= v_month
+  GROUP BY 1, 2, 3, 4;
+END$$;
@@ -6,6 +6,35 @@ CREATE TABLE IF NOT EXISTS stg.etl_watermarks (
   table_name      TEXT PRIMARY KEY,
   last_loaded_at  TIMESTAMPTZ NOT NULL DEFAULT TIMESTAMPTZ 'epoch'
 );
+-- Composite (created_at, id) keyset watermark: ties on created_at are never skipped
+ALTER TABLE stg.etl_watermarks ADD COLUMN IF NOT EXISTS last_loaded_id UUID;
+
+-- Chunk ledger for parallel backfills (oltp_to_stg_backfill); each chunk keeps
+-- its own keyset checkpoint so a failed chunk resumes where it stopped.
+CREATE TABLE IF NOT EXISTS stg.etl_backfill_chunks (
+  backfill_id      TEXT        NOT NULL,
+  table_name       TEXT        NOT NULL,
+  chunk_start      TIMESTAMPTZ NOT NULL,
+  chunk_end        TIMESTAMPTZ NOT NULL,
+  status           TEXT        NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING','RUNNING','DONE','FAILED')),
+  rows_loaded      BIGINT      NOT NULL DEFAULT 0,
+  last_created_at  TIMESTAMPTZ,
+  last_id          UUID,
+  updated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (backfill_id, table_name, chunk_start)
+);
+
+-- Kafka offsets of the CDC loader (services/cdc_loader). Written in the same
+-- transaction as the staging upserts, so a restart resumes exactly after the
+-- last applied batch.
+CREATE TABLE IF NOT EXISTS stg.cdc_offsets (
+  consumer_group  TEXT        NOT NULL,
+  topic           TEXT        NOT NULL,
+  partition       INT         NOT NULL,
+  next_offset     BIGINT      NOT NULL,
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (consumer_group, topic, partition)
+);
 
 -- Staging tables (append-only, dedupe by PK)
 CREATE TABLE IF NOT EXISTS stg.customers (
@@ -56,3 +85,21 @@ CREATE TABLE IF NOT EXISTS stg.outbox (
   created_at     TIMESTAMPTZ NOT NULL,
   loaded_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
+
+-- Row hash of the staged version (oltp_to_stg merge mode); an upsert only
+-- rewrites a row when the incoming hash differs. NULL = not hashed yet.
+ALTER TABLE stg.customers    ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+ALTER TABLE stg.accounts     ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+ALTER TABLE stg.transactions ADD COLUMN IF NOT EXISTS row_hash BYTEA;
+
+-- Watermarks of the incremental staging validation (gx_validate), one per check:
+-- rows with loaded_at < last_validated_at have passed it.
+CREATE TABLE IF NOT EXISTS stg.validation_watermarks (
+  check_name         TEXT        PRIMARY KEY,
+  last_validated_at  TIMESTAMPTZ NOT NULL,
+  rows_validated     BIGINT      NOT NULL DEFAULT 0,   -- size of the last window
+  validated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_stg_customers_loaded_at    ON stg.customers(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_accounts_loaded_at     ON stg.accounts(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_transactions_loaded_at ON stg.transactions(loaded_at);
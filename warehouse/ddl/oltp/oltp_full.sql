@@ -62,8 +62,14 @@ CREATE INDEX IF NOT EXISTS idx_accounts_customer ON accounts(customer_id);
 CREATE INDEX IF NOT EXISTS idx_accounts_status   ON accounts(status);
 
 -- ---------- Transactions ----------
+-- Range-partitioned by created_at (monthly, see the partition functions below)
+-- so inserts, account timelines and the created_at scans of the staging load
+-- only touch recent partitions. The primary key has to include the partition
+-- key; id alone is kept unique by transaction_ids below, and every lookup by id
+-- still goes through the per-partition primary key indexes.
+-- Existing single-table installs: warehouse/ddl/oltp_partition_transactions.sql.
 CREATE TABLE IF NOT EXISTS transactions (
-  id                UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  id                UUID NOT NULL DEFAULT gen_random_uuid(),
   account_id        UUID NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
   type              transaction_type NOT NULL,
   status            transaction_status NOT NULL DEFAULT 'PENDING',
@@ -75,8 +81,71 @@ CREATE TABLE IF NOT EXISTS transactions (
   country           CHAR(2) NOT NULL CHECK (country ~ '^[A-Z]{2}$'),
   metadata          JSONB NOT NULL DEFAULT '{}'::jsonb,
   created_at        TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-  settled_at        TIMESTAMPTZ
+  settled_at        TIMESTAMPTZ,
+  updated_at        TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+-- Time of the last write; settled_at is the acquirer's event time and may be
+-- long past. NULL on rows written before the column existed (no table rewrite).
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+ALTER TABLE transactions ALTER COLUMN updated_at SET DEFAULT NOW();
+DROP TRIGGER IF EXISTS trg_txns_updated_at ON transactions;
+CREATE TRIGGER trg_txns_updated_at
+BEFORE UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- id must stay unique on its own: the staging load upserts ON CONFLICT (id),
+-- settlement joins on id and the ORM maps id as the key. The partitioned key
+-- cannot enforce that, so every id is reserved in transaction_ids by statement
+-- triggers on the parent (one index insert per row) and ids are immutable.
+-- Rows written straight into a partition bypass the guard; the default
+-- partition moves in ensure_transactions_partition keep their ids. Ids of
+-- dropped or detached partitions stay reserved.
+CREATE TABLE IF NOT EXISTS transaction_ids (
+  id UUID PRIMARY KEY
 );
+
+CREATE OR REPLACE FUNCTION reserve_transaction_ids() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    -- a duplicate, in this statement or already stored, fails the insert
+    INSERT INTO transaction_ids (id) SELECT id FROM new_rows;
+  ELSE
+    DELETE FROM transaction_ids i USING old_rows o WHERE i.id = o.id;
+  END IF;
+  RETURN NULL;
+END$$;
+
+CREATE OR REPLACE FUNCTION forbid_transaction_id_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  RAISE EXCEPTION 'transactions.id is immutable (% -> %)', OLD.id, NEW.id
+    USING ERRCODE = 'integrity_constraint_violation';
+END$$;
+
+DROP TRIGGER IF EXISTS trg_txns_ids_ins ON transactions;
+CREATE TRIGGER trg_txns_ids_ins
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reserve_transaction_ids();
+
+DROP TRIGGER IF EXISTS trg_txns_ids_del ON transactions;
+CREATE TRIGGER trg_txns_ids_del
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reserve_transaction_ids();
+
+DROP TRIGGER IF EXISTS trg_txns_id_immutable ON transactions;
+CREATE TRIGGER trg_txns_id_immutable
+BEFORE UPDATE OF id ON transactions
+FOR EACH ROW WHEN (NEW.id IS DISTINCT FROM OLD.id)
+EXECUTE FUNCTION forbid_transaction_id_change();
+
+-- Reserve the ids of rows written before the guard existed
+INSERT INTO transaction_ids (id)
+SELECT id FROM transactions
+ON CONFLICT (id) DO NOTHING;
 -- Hot-path indexes for account timelines and settled lookups
 CREATE INDEX IF NOT EXISTS idx_txns_account_created_desc
   ON transactions (account_id, created_at DESC);
@@ -95,6 +164,112 @@ CREATE TABLE IF NOT EXISTS outbox (
 );
 CREATE INDEX IF NOT EXISTS idx_outbox_created ON outbox(created_at);
 
+-- ---------- Keyset scan indexes for incremental loads (created_at, id) ----------
+CREATE INDEX IF NOT EXISTS idx_customers_created_id    ON customers(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_accounts_created_id     ON accounts(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_txns_created_id         ON transactions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_created_id       ON outbox(created_at, id);
+
+-- ---------- Change scan indexes for merge loads (change timestamp, id) ----------
+CREATE INDEX IF NOT EXISTS idx_customers_updated_id    ON customers(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_accounts_updated_id     ON accounts(updated_at, id);
+DROP INDEX IF EXISTS idx_txns_changed_id;   -- was on COALESCE(settled_at, created_at)
+CREATE INDEX IF NOT EXISTS idx_txns_updated_id         ON transactions((COALESCE(updated_at, settled_at, created_at)), id);
+
+-- ---------- Transactions partitions ----------
+-- Attached partitions and their bounds; range_start is NULL for the history
+-- partition (FROM MINVALUE), both bounds are NULL for the default partition.
+CREATE OR REPLACE VIEW v_transactions_partitions AS
+SELECT
+  c.relname AS partition_name,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$FROM \('([^']+)'\)$re$)::timestamptz AS range_start,
+  substring(pg_get_expr(c.relpartbound, c.oid) FROM $re$TO \('([^']+)'\)$re$)::timestamptz   AS range_end,
+  pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS is_default
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass('public.transactions');   -- by name: survives the table swap
+
+-- Ensure the monthly (UTC) partition covering p_ts exists. The partition is
+-- built as a plain table and attached, which only takes SHARE UPDATE EXCLUSIVE
+-- on transactions, so ingest keeps writing meanwhile. Rows that fell into the
+-- default partition for that month are moved over first (their deletes are
+-- decoded by CDC, which consumers skip; the copies are not re-published).
+CREATE OR REPLACE FUNCTION ensure_transactions_partition(p_ts timestamptz)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+  start_ts  timestamptz;
+  end_ts    timestamptz;
+  part_name text;
+BEGIN
+  IF EXISTS (SELECT 1 FROM v_transactions_partitions
+             WHERE NOT is_default AND COALESCE(range_start, '-infinity') <= p_ts AND p_ts < range_end) THEN
+    RETURN;
+  END IF;
+  -- concurrent callers must not race on the same bounds
+  PERFORM pg_advisory_xact_lock(hashtext('public.transactions:partitions'));
+  IF EXISTS (SELECT 1 FROM v_transactions_partitions
+             WHERE NOT is_default AND COALESCE(range_start, '-infinity') <= p_ts AND p_ts < range_end) THEN
+    RETURN;
+  END IF;
+
+  start_ts := date_trunc('month', p_ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+  end_ts   := start_ts + interval '1 month';
+  start_ts := GREATEST(start_ts, (SELECT MAX(range_end) FROM v_transactions_partitions WHERE range_end <= p_ts));
+  end_ts   := LEAST(end_ts, (SELECT MIN(range_start) FROM v_transactions_partitions WHERE range_start > p_ts));
+
+  IF start_ts = date_trunc('month', start_ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+     AND end_ts = start_ts + interval '1 month' THEN
+    part_name := format('transactions_y%sm%s', to_char(start_ts AT TIME ZONE 'UTC', 'YYYY'), to_char(start_ts AT TIME ZONE 'UTC', 'MM'));
+  ELSE
+    part_name := format('transactions_p%s', to_char(start_ts AT TIME ZONE 'UTC', 'YYYYMMDD'));
+  END IF;
+
+  EXECUTE format('CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+  IF to_regclass('transactions_default') IS NOT NULL THEN
+    -- inserts routed to the default partition wait until the attach commits
+    LOCK TABLE transactions_default IN EXCLUSIVE MODE;
+    EXECUTE format(
+      'WITH moved AS (DELETE FROM transactions_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+       INSERT INTO %I SELECT * FROM moved', start_ts, end_ts, part_name);
+  END IF;
+  EXECUTE format('ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part_name, start_ts, end_ts);
+END$$;
+
+-- Ensure partitions for every month in [p_from, p_to] (backfills, seeding)
+CREATE OR REPLACE FUNCTION ensure_transactions_partitions(p_from timestamptz, p_to timestamptz)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE t timestamptz := p_from;
+BEGIN
+  WHILE t <= p_to LOOP
+    PERFORM ensure_transactions_partition(t);
+    SELECT range_end INTO t FROM v_transactions_partitions
+    WHERE NOT is_default AND COALESCE(range_start, '-infinity') <= t AND t < range_end;
+  END LOOP;
+END$$;
+
+-- Keep the current month's partition and the next p_ahead ones in place, so
+-- inserts never land in the default partition (oltp_partition_maintenance DAG).
+CREATE OR REPLACE FUNCTION premake_transactions_partitions(p_ahead integer DEFAULT 2)
+RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM ensure_transactions_partitions(NOW(), NOW() + make_interval(months => p_ahead));
+END$$;
+
+-- Fresh install: one history partition for anything older than this month
+-- (backdated seed data), a default partition as the safety net, then the
+-- monthly partitions. Skipped while transactions is still a plain table.
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'transactions'::regclass) = 'p' THEN
+    IF NOT EXISTS (SELECT 1 FROM v_transactions_partitions WHERE NOT is_default) THEN
+      EXECUTE format('CREATE TABLE transactions_history PARTITION OF transactions FOR VALUES FROM (MINVALUE) TO (%L)',
+                     date_trunc('month', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC');
+    END IF;
+    CREATE TABLE IF NOT EXISTS transactions_default PARTITION OF transactions DEFAULT;
+    PERFORM premake_transactions_partitions();
+  END IF;
+END$$;
+
 -- ---------- Idempotency ----------
 CREATE TABLE IF NOT EXISTS idempotency (
   id             BIGSERIAL PRIMARY KEY,
@@ -107,6 +282,149 @@ CREATE TABLE IF NOT EXISTS idempotency (
   UNIQUE(endpoint, idem_key)
 );
 
+-- ---------- Account balances ----------
+-- Settled balance per account, maintained by statement-level triggers on
+-- transactions in the same transaction as the insert / status change, so a
+-- balance read is one primary-key lookup. A transaction contributes its
+-- signed amount while its status is SETTLED (money in: TRANSFER_IN, REFUND;
+-- money out: PAYMENT, TRANSFER_OUT, FEE); moving to REVERSED / CHARGEBACK
+-- takes the contribution back out.
+CREATE OR REPLACE FUNCTION ledger_signed_amount(p_type transaction_type, p_status transaction_status, p_amount NUMERIC)
+RETURNS NUMERIC LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE
+           WHEN p_status <> 'SETTLED' THEN 0
+           WHEN p_type IN ('TRANSFER_IN','REFUND') THEN p_amount
+           ELSE -p_amount
+         END
+$$;
+
+CREATE TABLE IF NOT EXISTS account_balances (
+  account_id     UUID PRIMARY KEY REFERENCES accounts(id) ON DELETE CASCADE,
+  balance        NUMERIC(20,6) NOT NULL DEFAULT 0,
+  settled_count  BIGINT NOT NULL DEFAULT 0,
+  updated_at     TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- One upsert per touched account per statement; ORDER BY keeps lock order
+-- stable between concurrent multi-account statements.
+CREATE OR REPLACE FUNCTION apply_balance_deltas() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO account_balances AS b (account_id, balance, settled_count)
+    SELECT account_id, SUM(ledger_signed_amount(type, status, amount)), COUNT(*) FILTER (WHERE status = 'SETTLED')
+    FROM new_rows
+    WHERE status = 'SETTLED'
+    GROUP BY account_id
+    ORDER BY account_id
+    ON CONFLICT (account_id) DO UPDATE
+      SET balance = b.balance + EXCLUDED.balance,
+          settled_count = b.settled_count + EXCLUDED.settled_count,
+          updated_at = NOW();
+  ELSIF TG_OP = 'UPDATE' THEN
+    INSERT INTO account_balances AS b (account_id, balance, settled_count)
+    SELECT account_id, SUM(delta), SUM(count_delta)
+    FROM (
+      SELECT n.account_id,
+             ledger_signed_amount(n.type, n.status, n.amount) AS delta,
+             (n.status = 'SETTLED')::int AS count_delta
+      FROM new_rows n
+      UNION ALL
+      SELECT o.account_id,
+             -ledger_signed_amount(o.type, o.status, o.amount),
+             -(o.status = 'SETTLED')::int
+      FROM old_rows o
+    ) d
+    GROUP BY account_id
+    HAVING SUM(delta) <> 0 OR SUM(count_delta) <> 0
+    ORDER BY account_id
+    ON CONFLICT (account_id) DO UPDATE
+      SET balance = b.balance + EXCLUDED.balance,
+          settled_count = b.settled_count + EXCLUDED.settled_count,
+          updated_at = NOW();
+  ELSE
+    UPDATE account_balances b
+    SET balance = b.balance - d.balance,
+        settled_count = b.settled_count - d.settled_count,
+        updated_at = NOW()
+    FROM (
+      SELECT account_id, SUM(ledger_signed_amount(type, status, amount)) AS balance,
+             COUNT(*) FILTER (WHERE status = 'SETTLED') AS settled_count
+      FROM old_rows
+      WHERE status = 'SETTLED'
+      GROUP BY account_id
+    ) d
+    WHERE b.account_id = d.account_id;
+  END IF;
+  RETURN NULL;
+END$$;
+
+-- transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trg_txns_balance_ins ON transactions;
+CREATE TRIGGER trg_txns_balance_ins
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+
+DROP TRIGGER IF EXISTS trg_txns_balance_upd ON transactions;
+CREATE TRIGGER trg_txns_balance_upd
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+
+DROP TRIGGER IF EXISTS trg_txns_balance_del ON transactions;
+CREATE TRIGGER trg_txns_balance_del
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+
+-- Full recompute vs. the stored balances. Both sides are read in one snapshot,
+-- so concurrent writes never show up as drift. With p_repair the table is
+-- locked against balance changes and the drifted rows are corrected.
+CREATE OR REPLACE FUNCTION reconcile_account_balances(p_repair BOOLEAN DEFAULT FALSE)
+RETURNS TABLE(account_id UUID, stored_balance NUMERIC, recomputed_balance NUMERIC,
+              stored_count BIGINT, recomputed_count BIGINT)
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF p_repair THEN
+    LOCK TABLE account_balances IN EXCLUSIVE MODE;
+  END IF;
+
+  CREATE TEMP TABLE tmp_balance_drift ON COMMIT DROP AS
+  WITH recomputed AS (
+    SELECT t.account_id, SUM(ledger_signed_amount(t.type, t.status, t.amount)) AS balance, COUNT(*) AS cnt
+    FROM transactions t
+    WHERE t.status = 'SETTLED'
+    GROUP BY t.account_id
+  )
+  SELECT COALESCE(b.account_id, r.account_id) AS account_id,
+         COALESCE(b.balance, 0) AS stored_balance, COALESCE(r.balance, 0) AS recomputed_balance,
+         COALESCE(b.settled_count, 0) AS stored_count, COALESCE(r.cnt, 0) AS recomputed_count
+  FROM account_balances b
+  FULL JOIN recomputed r ON r.account_id = b.account_id
+  WHERE COALESCE(b.balance, 0) <> COALESCE(r.balance, 0)
+     OR COALESCE(b.settled_count, 0) <> COALESCE(r.cnt, 0);
+
+  IF p_repair THEN
+    INSERT INTO account_balances AS b (account_id, balance, settled_count)
+    SELECT d.account_id, d.recomputed_balance, d.recomputed_count FROM tmp_balance_drift d
+    ORDER BY d.account_id
+    ON CONFLICT ON CONSTRAINT account_balances_pkey DO UPDATE
+      SET balance = EXCLUDED.balance, settled_count = EXCLUDED.settled_count, updated_at = NOW();
+  END IF;
+
+  RETURN QUERY SELECT d.account_id, d.stored_balance, d.recomputed_balance, d.stored_count, d.recomputed_count
+               FROM tmp_balance_drift d ORDER BY d.account_id;
+  DROP TABLE tmp_balance_drift;
+END$$;
+
+-- Seed balances for transactions settled before the triggers existed
+INSERT INTO account_balances (account_id, balance, settled_count)
+SELECT account_id, SUM(ledger_signed_amount(type, status, amount)), COUNT(*)
+FROM transactions
+WHERE status = 'SETTLED'
+GROUP BY account_id
+ON CONFLICT (account_id) DO NOTHING;
+
 
 -- ---------- Create the Debezium DB user & grants ----------
 
@@ -123,6 +441,19 @@ GRANT USAGE ON SCHEMA public TO debezium;
 GRANT SELECT ON ALL TABLES IN SCHEMA public TO debezium;
 ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT ON TABLES TO debezium;
 
+-- 3) Publication used by the connector (publication.autocreate.mode=disabled).
+-- publish_via_partition_root: changes to any transactions partition are
+-- decoded as changes to transactions, so topics and consumers are unchanged.
+DO $$BEGIN
+  IF NOT EXISTS (SELECT FROM pg_publication WHERE pubname = 'dbz_publication') THEN
+    CREATE PUBLICATION dbz_publication FOR TABLE customers, accounts, transactions, outbox
+      WITH (publish_via_partition_root = true);
+  ELSE
+    ALTER PUBLICATION dbz_publication SET TABLE customers, accounts, transactions, outbox;
+    ALTER PUBLICATION dbz_publication SET (publish_via_partition_root = true);
+  END IF;
+END$$;
+
 -- Realtime risk flags generated by the stream processor
 CREATE TABLE IF NOT EXISTS risk_flags (
   event_id     UUID PRIMARY KEY,                            -- deterministic ID (uuid5) to dedupe
@@ -131,9 +462,46 @@ CREATE TABLE IF NOT EXISTS risk_flags (
   window_end   TIMESTAMPTZ NOT NULL,
   count_5m     INTEGER NOT NULL,
   sum_5m       NUMERIC(20,6) NOT NULL,
-  reason       TEXT NOT NULL CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM')),
+  reason       TEXT NOT NULL CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM','AMOUNT_ANOMALY')),
   created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE INDEX IF NOT EXISTS idx_risk_flags_created ON risk_flags(created_at DESC);
-CREATE INDEX IF NOT EXISTS idx_risk_flags_acct_window ON risk_flags(account_id, window_end);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_risk_flags_acct_window ON risk_flags(account_id, window_end);
+
+-- Latency tracing: the transaction that raised the flag and its OLTP commit
+-- time (Debezium source.ts_ms); created_at is when the flag was written.
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS trigger_tx_id UUID;
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS event_committed_at TIMESTAMPTZ;
+
+-- Velocity window checkpoints of the stream workers, one row per input topic
+-- partition (services/stream/state.py); handed over on rebalance
+CREATE TABLE IF NOT EXISTS stream_window_state (
+  topic       TEXT NOT NULL,
+  partition   INTEGER NOT NULL,
+  state       JSONB NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (topic, partition)
+);
+
+-- Amount anomaly rule (services/stream/anomaly.py): new reason and its z-score
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS score NUMERIC(10,4);
+ALTER TABLE risk_flags DROP CONSTRAINT IF EXISTS risk_flags_reason_check;
+ALTER TABLE risk_flags ADD CONSTRAINT risk_flags_reason_check
+  CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM','AMOUNT_ANOMALY')) NOT VALID;
+ALTER TABLE risk_flags VALIDATE CONSTRAINT risk_flags_reason_check;
+
+-- Per-account statistics of log1p(amount) for the anomaly rule. partition is
+-- the input topic partition of the worker that saved the row (NULL for rows
+-- seeded by bootstrap_amount_stats.py); workers load their partitions' rows
+-- on assignment and look up other accounts on first sight.
+CREATE TABLE IF NOT EXISTS stream_amount_stats (
+  account_id  UUID PRIMARY KEY,
+  topic       TEXT,
+  partition   INTEGER,
+  n           BIGINT NOT NULL,
+  mean        DOUBLE PRECISION NOT NULL,
+  var         DOUBLE PRECISION NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_stream_amount_stats_partition ON stream_amount_stats(topic, partition);
\ No newline at end of file
@@ -0,0 +1,106 @@
+-- One-off migration: plain transactions table -> partitioned by created_at.
+--
+-- The existing table becomes the history partition (FROM MINVALUE TO the start
+-- of next month); new months get their own partitions. Nothing is rewritten:
+-- the (id, created_at) key and the range check are built online first, the
+-- swap itself is catalog-only and runs in one short transaction.
+--
+-- Run after oltp.sql (it defines the partition functions), with psql:
+--   make migrate-oltp-partition-transactions
+-- Do not run in the last hour of a month: the cutover is the next month start.
+\set ON_ERROR_STOP on
+
+SELECT relkind = 'p' AS already_partitioned FROM pg_class WHERE oid = 'transactions'::regclass \gset
+\if :already_partitioned
+  \echo transactions is already partitioned, nothing to do
+  \quit
+\endif
+
+SELECT date_trunc('month', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '1 month' AS cutover \gset
+\echo history partition ends at :cutover
+
+-- ---------- Phase 1: online preparation (no blocking locks) ----------
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS transactions_legacy_pkey ON transactions (id, created_at);
+
+-- Proves the range so ATTACH PARTITION skips its validation scan
+ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_legacy_range;
+ALTER TABLE transactions ADD CONSTRAINT transactions_legacy_range CHECK (created_at < :'cutover') NOT VALID;
+ALTER TABLE transactions VALIDATE CONSTRAINT transactions_legacy_range;
+
+-- ---------- Phase 2: swap (catalog only) ----------
+BEGIN;
+SET LOCAL lock_timeout = '5s';
+LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE transactions RENAME TO transactions_legacy;
+ALTER TABLE transactions_legacy DROP CONSTRAINT transactions_pkey;
+ALTER TABLE transactions_legacy ADD CONSTRAINT transactions_legacy_pkey PRIMARY KEY USING INDEX transactions_legacy_pkey;
+ALTER INDEX idx_txns_account_created_desc   RENAME TO transactions_legacy_account_created_desc_idx;
+ALTER INDEX idx_txns_settled_account_created RENAME TO transactions_legacy_settled_account_created_idx;
+ALTER INDEX idx_txns_created_id             RENAME TO transactions_legacy_created_id_idx;
+ALTER INDEX idx_txns_updated_id             RENAME TO transactions_legacy_updated_id_idx;
+-- triggers move to the parent below
+DROP TRIGGER IF EXISTS trg_txns_updated_at ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_ids_ins ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_ids_del ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_id_immutable ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_balance_ins ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_balance_upd ON transactions_legacy;
+DROP TRIGGER IF EXISTS trg_txns_balance_del ON transactions_legacy;
+
+CREATE TABLE transactions (LIKE transactions_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+  PARTITION BY RANGE (created_at);
+ALTER TABLE transactions DROP CONSTRAINT transactions_legacy_range;
+ALTER TABLE transactions ADD PRIMARY KEY (id, created_at);
+ALTER TABLE transactions ADD CONSTRAINT transactions_account_id_fkey
+  FOREIGN KEY (account_id) REFERENCES accounts(id) ON DELETE CASCADE;
+-- matching key, range check and foreign key: attached without scanning
+ALTER TABLE transactions ATTACH PARTITION transactions_legacy FOR VALUES FROM (MINVALUE) TO (:'cutover');
+CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;
+
+-- Parent indexes adopt the renamed legacy indexes instead of rebuilding them
+CREATE INDEX idx_txns_account_created_desc ON transactions (account_id, created_at DESC);
+CREATE INDEX idx_txns_settled_account_created ON transactions (account_id, created_at) WHERE status = 'SETTLED';
+CREATE INDEX idx_txns_created_id ON transactions (created_at, id);
+CREATE INDEX idx_txns_updated_id ON transactions ((COALESCE(updated_at, settled_at, created_at)), id);
+
+CREATE TRIGGER trg_txns_updated_at
+BEFORE UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+-- id stays unique across partitions (transaction_ids was seeded by oltp.sql)
+CREATE TRIGGER trg_txns_ids_ins
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reserve_transaction_ids();
+CREATE TRIGGER trg_txns_ids_del
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reserve_transaction_ids();
+CREATE TRIGGER trg_txns_id_immutable
+BEFORE UPDATE OF id ON transactions
+FOR EACH ROW WHEN (NEW.id IS DISTINCT FROM OLD.id)
+EXECUTE FUNCTION forbid_transaction_id_change();
+CREATE TRIGGER trg_txns_balance_ins
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+CREATE TRIGGER trg_txns_balance_upd
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+CREATE TRIGGER trg_txns_balance_del
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_balance_deltas();
+
+GRANT SELECT ON transactions, transactions_default TO debezium;
+-- the publication still points at the renamed table: switch it to the parent
+-- in this transaction so no insert after the swap is missed by CDC
+ALTER PUBLICATION dbz_publication SET TABLE customers, accounts, transactions, outbox;
+ALTER PUBLICATION dbz_publication SET (publish_via_partition_root = true);
+
+SELECT premake_transactions_partitions();
+COMMIT;
+
+ANALYZE transactions;
+SELECT * FROM v_transactions_partitions ORDER BY range_start NULLS FIRST;
@@ -6,9 +6,46 @@ CREATE TABLE IF NOT EXISTS risk_flags (
   window_end   TIMESTAMPTZ NOT NULL,
   count_5m     INTEGER NOT NULL,
   sum_5m       NUMERIC(20,6) NOT NULL,
-  reason       TEXT NOT NULL CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM')),
+  reason       TEXT NOT NULL CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM','AMOUNT_ANOMALY')),
   created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE INDEX IF NOT EXISTS idx_risk_flags_created ON risk_flags(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_risk_flags_acct_window ON risk_flags(account_id, window_end);
+
+-- Latency tracing: the transaction that raised the flag and its OLTP commit
+-- time (Debezium source.ts_ms); created_at is when the flag was written.
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS trigger_tx_id UUID;
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS event_committed_at TIMESTAMPTZ;
+
+-- Velocity window checkpoints of the stream workers, one row per input topic
+-- partition (services/stream/state.py); handed over on rebalance
+CREATE TABLE IF NOT EXISTS stream_window_state (
+  topic       TEXT NOT NULL,
+  partition   INTEGER NOT NULL,
+  state       JSONB NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (topic, partition)
+);
+
+-- Amount anomaly rule (services/stream/anomaly.py): new reason and its z-score
+ALTER TABLE risk_flags ADD COLUMN IF NOT EXISTS score NUMERIC(10,4);
+ALTER TABLE risk_flags DROP CONSTRAINT IF EXISTS risk_flags_reason_check;
+ALTER TABLE risk_flags ADD CONSTRAINT risk_flags_reason_check
+  CHECK (reason IN ('VELOCITY_COUNT','VELOCITY_SUM','AMOUNT_ANOMALY')) NOT VALID;
+ALTER TABLE risk_flags VALIDATE CONSTRAINT risk_flags_reason_check;
+
+-- Per-account statistics of log1p(amount) for the anomaly rule. partition is
+-- the input topic partition of the worker that saved the row (NULL for rows
+-- seeded by bootstrap_amount_stats.py); workers load their partitions' rows
+-- on assignment and look up other accounts on first sight.
+CREATE TABLE IF NOT EXISTS stream_amount_stats (
+  account_id  UUID PRIMARY KEY,
+  topic       TEXT,
+  partition   INTEGER,
+  n           BIGINT NOT NULL,
+  mean        DOUBLE PRECISION NOT NULL,
+  var         DOUBLE PRECISION NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_stream_amount_stats_partition ON stream_amount_stats(topic, partition);